@@ -0,0 +1,130 @@
+"""
+Cold-start import benchmark for the API.
+
+Imports `src.main` in fresh interpreters with `-X importtime`, records the
+self/cumulative import time of every module and fails when the cold start is
+over budget or when a heavy stack (document parsing, LLM SDKs, ...) is imported
+eagerly instead of on first use.
+
+Run from the engine directory:
+    python benchmarks/import_time.py --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ENGINE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_OUTPUT = os.path.join(ENGINE_DIR, "benchmarks", "results", "import_time.json")
+
+# Packages that must only load on first use, never while importing the app
+LAZY_PACKAGES = (
+    "langchain",
+    "langchain_community",
+    "langchain_openai",
+    "langchain_text_splitters",
+    "unstructured",
+    "pandas",
+    "qdrant_client",
+    "grpc",
+    "google.auth",
+    "google.oauth2",
+    "requests_oauthlib",
+)
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+def run_once(module: str) -> dict:
+    """Imports `module` in a fresh interpreter and parses its -X importtime report."""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ENGINE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        tail = "\n".join(line for line in proc.stderr.splitlines() if not line.startswith("import time:"))[-2000:]
+        raise RuntimeError(f"Importing {module} failed:\n{tail}")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2,
+            })
+    return {"wall_ms": wall_ms, "modules": modules}
+
+
+def summarize(run: dict, module: str, top: int) -> dict:
+    by_package = defaultdict(float)
+    for m in run["modules"]:
+        by_package[m["module"].split(".")[0]] += m["self_ms"]
+    target = next((m for m in run["modules"] if m["module"] == module), None)
+    loaded = {m["module"] for m in run["modules"]}
+    return {
+        "wall_ms": round(run["wall_ms"], 1),
+        "import_ms": round(target["cumulative_ms"], 1) if target else None,
+        "module_count": len(run["modules"]),
+        "top_modules": sorted(run["modules"], key=lambda m: m["cumulative_ms"], reverse=True)[:top],
+        "packages_ms": dict(sorted(((k, round(v, 1)) for k, v in by_package.items()), key=lambda kv: kv[1], reverse=True)[:top]),
+        "eager_heavy_imports": sorted(
+            p for p in LAZY_PACKAGES if p in loaded or any(name.startswith(p + ".") for name in loaded)
+        ),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.main", help="Module to import (default: src.main)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to run; the fastest is reported")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", 1500)),
+                        help="Fail if importing the module takes longer (default 1500, env IMPORT_TIME_BUDGET_MS)")
+    parser.add_argument("--top", type=int, default=25, help="Slowest modules/packages to report")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    runs = [run_once(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda r: r["wall_ms"])
+    result = summarize(best, args.module, args.top)
+    result.update({
+        "module": args.module,
+        "runs": args.runs,
+        "wall_ms_all_runs": [round(r["wall_ms"], 1) for r in runs],
+        "budget_ms": args.budget_ms,
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"import {args.module}: {result['import_ms']} ms (wall {result['wall_ms']} ms, {result['module_count']} modules)")
+    for m in result["top_modules"][:10]:
+        print(f"  {m['cumulative_ms']:9.1f} ms  {m['module']}")
+    print(f"Results written to {args.output}")
+
+    failures = []
+    if result["import_ms"] is not None and result["import_ms"] > args.budget_ms:
+        failures.append(f"cold start {result['import_ms']} ms exceeds the {args.budget_ms} ms budget")
+    if result["eager_heavy_imports"]:
+        failures.append(f"heavy packages imported at startup: {', '.join(result['eager_heavy_imports'])}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Ingestion and query benchmark for the full pipeline.
+
+For every dataset size and format, a generator interpreter writes a synthetic
+sales table (seeded, so identical across runs), then a fresh worker interpreter
+ingests it through FileProcessor.process_and_store into an in-process Qdrant
+(QDRANT_LOCAL_PATH) with the offline fake LLM provider and runs concurrent /ask
+queries against the new collection. Each worker reports rows/s, points/s,
+per-stage ingestion time, p50/p95/p99 query latency and its peak RSS (and the
+RSS before ingestion started); separate interpreters keep the data generator's
+memory and Qdrant memory of earlier sizes out of the measurement.
+
+Results are written as JSON together with the git commit, so runs can be
+compared across commits (--baseline prints the change against an earlier file).
+
+Run from the engine directory:
+    python benchmarks/pipeline.py --rows 10000,100000 --formats csv,xlsx
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ENGINE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_OUTPUT = os.path.join(ENGINE_DIR, "benchmarks", "results", "pipeline.json")
+
+EXCEL_MAX_ROWS = 1_048_575  # Sheet limit minus the header row
+GENERATE_BATCH_ROWS = 1_000_000
+REGIONS = ["North", "South", "East", "West", "Central"]
+PRODUCTS = ["Laptop", "Monitor", "Keyboard", "Mouse", "Dock", "Headset", "Webcam", "Tablet"]
+QUERY_TEMPLATES = [
+    "What was the total revenue in the {region} region?",
+    "Which product sold the most units in {region}?",
+    "How did {product} sales develop over time?",
+    "What is the average price of a {product}?",
+]
+STAGES = ("parse", "chunk", "embed", "upsert", "tables", "recommendations", "catalog")
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ENGINE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# --- Worker (one dataset, fresh interpreter) ---
+def generate_dataset(path: str, rows: int, fmt: str, seed: int):
+    """Writes a seeded synthetic sales table with `rows` rows as CSV or XLSX."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2020-01-01")
+    frames = []
+    for offset in range(0, rows, GENERATE_BATCH_ROWS):
+        n = min(GENERATE_BATCH_ROWS, rows - offset)
+        units = rng.integers(1, 50, n)
+        price = rng.uniform(5, 2500, n).round(2)
+        frame = pd.DataFrame({
+            "order_id": np.arange(offset, offset + n),
+            "order_date": (start + pd.to_timedelta(rng.integers(0, 365 * 4, n), unit="D")).strftime("%Y-%m-%d"),
+            "region": np.array(REGIONS)[rng.integers(0, len(REGIONS), n)],
+            "product": np.array(PRODUCTS)[rng.integers(0, len(PRODUCTS), n)],
+            "units": units,
+            "unit_price": price,
+            "revenue": (units * price).round(2),
+        })
+        if fmt == "csv":
+            frame.to_csv(path, mode="w" if offset == 0 else "a", header=offset == 0, index=False)
+        else:
+            frames.append(frame)
+    if fmt == "xlsx":
+        pd.concat(frames).to_excel(path, index=False, sheet_name="sales")
+
+
+def stage_seconds() -> dict:
+    """
+    Per-stage ingestion time, read back from the Prometheus histograms. Each worker
+    ingests one file, so the stage sums cover all `collection` label values (a new
+    collection is labelled "unknown" until it is catalogued).
+    """
+    from prometheus_client import REGISTRY
+
+    seconds = {}
+    for metric in REGISTRY.collect():
+        if metric.name != "chat4ba_ingest_stage_duration_seconds":
+            continue
+        for sample in metric.samples:
+            stage = sample.labels.get("stage")
+            if sample.name.endswith("_sum") and sample.labels.get("endpoint") == "process_and_store" and stage in STAGES:
+                seconds[stage] = seconds.get(stage, 0.0) + sample.value
+    seconds = {stage: round(seconds[stage], 4) for stage in STAGES if stage in seconds}
+    return seconds
+
+
+async def run_queries(collection: str, count: int, concurrency: int) -> dict:
+    from src.api.routers.query_router import QueryRequest, process_query
+    from src.database.vector_db.qdrant_client import get_qdrant_client
+
+    client = get_qdrant_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        template = QUERY_TEMPLATES[i % len(QUERY_TEMPLATES)]
+        # The index keeps query texts distinct so single-flight coalescing does not flatter the numbers
+        query = template.format(region=REGIONS[i % len(REGIONS)], product=PRODUCTS[i % len(PRODUCTS)]) + f" (#{i})"
+        async with semaphore:
+            started = time.perf_counter()
+            await process_query(collection, QueryRequest(query=query), client)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - started
+    return {
+        "count": count,
+        "concurrency": concurrency,
+        "queries_per_s": round(count / elapsed, 2) if elapsed else None,
+        "mean_ms": round(1000 * sum(latencies) / len(latencies), 2) if latencies else None,
+        "p50_ms": round(1000 * percentile(latencies, 50), 2),
+        "p95_ms": round(1000 * percentile(latencies, 95), 2),
+        "p99_ms": round(1000 * percentile(latencies, 99), 2),
+    }
+
+
+async def run_worker(args) -> dict:
+    overrides = worker_env(args, args.workdir)
+    os.environ.update(overrides)
+    from src.database.relational.init_db import init_database
+    from src.llm.providers.azure_openai import get_azure_provider
+    from src.processing.file_processor import FileProcessor
+    # Importing the provider loads .env with override=True; a developer's .env must not switch to a real provider
+    os.environ.update(overrides)
+
+    path = args.dataset
+    init_database()
+    startup_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    started = time.perf_counter()
+    result = await FileProcessor().process_and_store(path, os.path.basename(path), get_azure_provider())
+    ingest_s = time.perf_counter() - started
+    collection = result["collection_name"]
+
+    queries = await run_queries(collection, args.queries, args.concurrency) if collection and args.queries else None
+    return {
+        "rows": args.rows,
+        "format": args.format,
+        "ingest_s": round(ingest_s, 3),
+        "rows_per_s": round(args.rows / ingest_s, 1),
+        "chunks": result["chunks_processed"],
+        "points": result["points_stored"],
+        "points_per_s": round(result["points_stored"] / ingest_s, 1),
+        "ingest_stages_s": stage_seconds() if collection else {},
+        "query": queries,
+        # ru_maxrss is in KiB on Linux
+        "startup_rss_mb": round(startup_rss_mb, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+# --- Driver ---
+def worker_env(args, workdir: str) -> dict:
+    """Settings for a worker: fake provider, in-process Qdrant and throwaway SQLite files."""
+    return {
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_PROFILE": args.llm_profile,
+        "EMBEDDING_DIMENSION": str(args.dimension),
+        "QDRANT_LOCAL_PATH": ":memory:" if args.qdrant == "memory" else os.path.join(workdir, "qdrant"),
+        "QDRANT_URL": "local",
+        "QDRANT_ENDPOINT": "local",
+        "QDRANT_API_KEY": "",
+        "GOOGLE_CLIENT_ID": "benchmark",
+        "GOOGLE_CLIENT_SECRET": "benchmark",
+        "GOOGLE_REDIRECT_URI": "http://localhost/benchmark",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'main.db')}",
+        "USER_DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'users.db')}",
+        "TABLE_STORE_PATH": os.path.join(workdir, "tables.db"),
+        "TRACING_ENABLED": "false",
+    }
+
+
+def run_case(args, rows: int, fmt: str) -> dict:
+    with tempfile.TemporaryDirectory(prefix="chat4ba-bench-") as workdir:
+        # Generated in its own interpreter, so pandas' peak memory doesn't count towards the worker's peak RSS
+        dataset = os.path.join(workdir, f"bench_{rows}.{fmt}")
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--generate", "--dataset", dataset,
+             "--rows", str(rows), "--format", fmt, "--seed", str(args.seed)],
+            cwd=ENGINE_DIR, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Generating {rows} rows ({fmt}) failed:\n{proc.stderr[-3000:]}")
+        generate_s = time.perf_counter() - started
+
+        output = os.path.join(workdir, "result.json")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--workdir", workdir, "--worker-output", output,
+             "--dataset", dataset, "--rows", str(rows), "--format", fmt, "--queries", str(args.queries),
+             "--concurrency", str(args.concurrency), "--seed", str(args.seed), "--dimension", str(args.dimension),
+             "--llm-profile", args.llm_profile, "--qdrant", args.qdrant],
+            cwd=ENGINE_DIR, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Benchmark worker for {rows} rows ({fmt}) failed:\n{proc.stderr[-3000:]}")
+        with open(output) as f:
+            result = json.load(f)
+        return {**result, "file_bytes": os.path.getsize(dataset), "generate_s": round(generate_s, 3)}
+
+
+def compare(results: list, baseline_path: str):
+    """Prints the relative change of the headline numbers against an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["rows"], r["format"]): r for r in baseline["results"]}
+    print(f"Compared with {baseline_path} (commit {baseline.get('git_commit', 'unknown')[:12]}):")
+    for r in results:
+        old = previous.get((r["rows"], r["format"]))
+        if old is None:
+            continue
+        metrics = [("rows/s", r["rows_per_s"], old["rows_per_s"]), ("points/s", r["points_per_s"], old["points_per_s"]),
+                   ("peak RSS MB", r["peak_rss_mb"], old["peak_rss_mb"])]
+        if r["query"] and old.get("query"):
+            metrics += [("p95 ms", r["query"]["p95_ms"], old["query"]["p95_ms"])]
+        changes = ", ".join(f"{name} {((new - was) / was * 100 if was else 0):+.1f}%" for name, new, was in metrics)
+        print(f"  {r['rows']:>10,} rows {r['format']:<4}  {changes}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,100000",
+                        help="Comma separated dataset sizes (default 10000,100000; sizes up to 10000000 are supported)")
+    parser.add_argument("--formats", default="csv,xlsx", help="Comma separated file formats: csv, xlsx (default both)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to run against each ingested file (0 skips)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent queries")
+    parser.add_argument("--dimension", type=int, default=256, help="Embedding dimension of the fake provider")
+    parser.add_argument("--llm-profile", default="instant", help="Fake provider latency profile: instant, azure, degraded")
+    parser.add_argument("--qdrant", choices=("memory", "path"), default="memory",
+                        help="In-process Qdrant in memory or in local path mode (on disk)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic data")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    # Internal: run one case in this interpreter
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-output", help=argparse.SUPPRESS)
+    parser.add_argument("--format", help=argparse.SUPPRESS)
+    parser.add_argument("--generate", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--dataset", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_dataset(args.dataset, int(args.rows), args.format, args.seed)
+        return 0
+
+    if args.worker:
+        args.rows = int(args.rows)
+        sys.path.insert(0, ENGINE_DIR)
+        result = asyncio.run(run_worker(args))
+        with open(args.worker_output, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    sizes = [int(r) for r in args.rows.split(",") if r.strip()]
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    results = []
+    for fmt in formats:
+        for rows in sizes:
+            if fmt == "xlsx" and rows > EXCEL_MAX_ROWS:
+                print(f"Skipping {rows:,} rows as xlsx: a sheet holds at most {EXCEL_MAX_ROWS:,} rows.")
+                continue
+            print(f"Running {rows:,} rows ({fmt})...", flush=True)
+            r = run_case(args, rows, fmt)
+            results.append(r)
+            query = r["query"] or {}
+            print(f"  ingest {r['ingest_s']:.2f}s  {r['rows_per_s']:,.0f} rows/s  {r['points_per_s']:,.0f} points/s  "
+                  f"p50/p95/p99 {query.get('p50_ms')}/{query.get('p95_ms')}/{query.get('p99_ms')} ms  "
+                  f"peak RSS {r['peak_rss_mb']} MB")
+
+    report = {
+        "suite": "pipeline",
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: getattr(args, k) for k in ("queries", "concurrency", "dimension", "llm_profile", "qdrant", "seed")},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Response serialization microbenchmark.
+
+Encodes thread payloads the way the API returns them (the /api/threads list page
+and /api/threads/{id} with its messages) with each response encoder:
+
+- json:          stdlib json as rendered by Starlette's JSONResponse (the old default)
+- encoder+json:  FastAPI's jsonable_encoder followed by JSONResponse, the path of
+                 endpoints that returned plain dicts
+- orjson:        EngineResponse's default rendering
+- msgpack:       EngineResponse with `Accept: application/msgpack`
+
+Payloads come from the thread store (--from-store, using the configured Qdrant
+and thread database), from captured response bodies (--payload, e.g. saved with
+`curl .../api/threads/<id> > thread.json`) or, by default, from seeded synthetic
+threads with the same shape.
+
+Run from the engine directory:
+    python benchmarks/serialization.py --threads 50 --messages 40
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from pipeline import git_commit
+
+ENGINE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_OUTPUT = os.path.join(ENGINE_DIR, "benchmarks", "results", "serialization.json")
+MIN_SAMPLE_SECONDS = 0.05
+WORDS = ("revenue", "region", "quarter", "growth", "customer", "forecast", "margin", "product",
+         "trend", "segment", "average", "total", "decline", "increase", "report", "sales")
+
+
+# --- Payloads ---
+def synthetic_threads(count: int, messages: int, seed: int):
+    """Thread list page and thread detail payloads shaped like the thread endpoints' responses."""
+    rng = random.Random(seed)
+    started = datetime(2024, 1, 1)
+
+    def text(words: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    def answer() -> str:
+        rows = "\n".join(f"| {rng.choice(WORDS)} | {rng.uniform(0, 1e6):,.2f} | {rng.uniform(-30, 30):.1f}% |" for _ in range(rng.randint(3, 12)))
+        return f"{text(rng.randint(40, 160))}\n\n| Item | Value | Change |\n|---|---|---|\n{rows}\n\n{text(rng.randint(10, 60))}"
+
+    summaries, details = [], []
+    for t in range(count):
+        thread_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        created = started + timedelta(minutes=rng.randint(0, 500_000))
+        thread_messages = []
+        for m in range(messages):
+            thread_messages.append({
+                "id": t * messages + m + 1,
+                "role": "user" if m % 2 == 0 else "assistant",
+                "content": text(rng.randint(6, 25)) + "?" if m % 2 == 0 else answer(),
+                "timestamp": (created + timedelta(minutes=m)).isoformat(),
+            })
+        payload = {
+            "title": text(5).capitalize(),
+            "created_at": created.isoformat(),
+            "updated_at": (created + timedelta(minutes=messages)).isoformat(),
+            "associated_files": [f"{rng.choice(WORDS)}_{i}.xlsx" for i in range(rng.randint(0, 3))],
+        }
+        summaries.append({"id": thread_id, **payload, "message_count": messages,
+                          "last_message": thread_messages[-1]["content"][:200] if thread_messages else None})
+        details.append({"success": True, "thread": {**payload, "messages": thread_messages}})
+    return [("thread_list", {"success": True, "threads": summaries, "next_cursor": None})] + \
+        [(f"thread_{i}", d) for i, d in enumerate(details)]
+
+
+def store_threads(count: int):
+    """The newest `count` threads of the configured thread store."""
+    sys.path.insert(0, ENGINE_DIR)
+    from src.database.vector_db.qdrant_client import get_qdrant_client
+    from src.api.services.thread_service import get_thread_messages, get_thread_point, list_thread_summaries
+
+    client = get_qdrant_client()
+    summaries, next_cursor = list_thread_summaries(client, None, count)
+    payloads = [("thread_list", {"success": True, "threads": summaries, "next_cursor": next_cursor})]
+    for summary in summaries:
+        point = get_thread_point(client, summary["id"])
+        if point:
+            thread = dict(point.payload, messages=get_thread_messages(summary["id"]))
+            payloads.append((f"thread_{summary['id']}", {"success": True, "thread": thread}))
+    return payloads
+
+
+def file_payloads(paths):
+    payloads = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            payloads.append((os.path.basename(path), json.load(f)))
+    return payloads
+
+
+# --- Encoders ---
+def encoders():
+    """Name -> function(content) -> bytes, for the encoders importable here."""
+    def stdlib_json(content) -> bytes:
+        # Identical to starlette.responses.JSONResponse.render
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    available = {"json": stdlib_json}
+    try:
+        from fastapi.encoders import jsonable_encoder
+        available["encoder+json"] = lambda content: stdlib_json(jsonable_encoder(content))
+    except ImportError:
+        print("fastapi is not installed; skipping encoder+json.")
+
+    sys.path.insert(0, ENGINE_DIR)
+    from src.utils.responses import dumps_json, dumps_msgpack
+    available["orjson"] = dumps_json
+    available["msgpack"] = dumps_msgpack
+    return available
+
+
+def measure(encode, content, repeat: int) -> dict:
+    """Median seconds per encode over `repeat` samples of at least MIN_SAMPLE_SECONDS each."""
+    number, started = 1, time.perf_counter()
+    encode(content)
+    while time.perf_counter() - started < MIN_SAMPLE_SECONDS:  # Calibrate loops per sample
+        number *= 2
+        started = time.perf_counter()
+        for _ in range(number):
+            encode(content)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            encode(content)
+        samples.append((time.perf_counter() - started) / number)
+    return {"median_us": statistics.median(samples) * 1e6, "bytes": len(encode(content))}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark response encoders on thread payloads.")
+    parser.add_argument("--threads", type=int, default=50, help="Threads to encode (list page size and thread details)")
+    parser.add_argument("--messages", type=int, default=40, help="Messages per synthetic thread")
+    parser.add_argument("--from-store", action="store_true", help="Encode threads from the configured thread store")
+    parser.add_argument("--payload", action="append", default=[], help="Captured JSON response body to encode (repeatable)")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed samples per payload and encoder")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the synthetic threads")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    if args.payload:
+        payloads, source = file_payloads(args.payload), "files"
+    elif args.from_store:
+        payloads, source = store_threads(args.threads), "store"
+    else:
+        payloads, source = synthetic_threads(args.threads, args.messages, args.seed), "synthetic"
+    available = encoders()
+
+    totals = {name: {"us": 0.0, "bytes": 0} for name in available}
+    results = []
+    for label, content in payloads:
+        row = {"payload": label, "encoders": {}}
+        for name, encode in available.items():
+            m = measure(encode, content, args.repeat)
+            row["encoders"][name] = {"median_us": round(m["median_us"], 2), "bytes": m["bytes"]}
+            totals[name]["us"] += m["median_us"]
+            totals[name]["bytes"] += m["bytes"]
+        results.append(row)
+
+    baseline_us = totals["json"]["us"]
+    print(f"{len(payloads)} {source} payload(s), {totals['json']['bytes'] / 1e6:.2f} MB as JSON")
+    print(f"{'encoder':<14}{'total ms':>10}{'MB/s':>10}{'size':>10}{'speedup':>10}")
+    summary = {}
+    for name, total in totals.items():
+        summary[name] = {
+            "total_ms": round(total["us"] / 1000, 3),
+            "mb_per_s": round(totals["json"]["bytes"] / total["us"], 1) if total["us"] else None,
+            "bytes": total["bytes"],
+            "speedup_vs_json": round(baseline_us / total["us"], 2) if total["us"] else None,
+        }
+        s = summary[name]
+        print(f"{name:<14}{s['total_ms']:>10.2f}{s['mb_per_s']:>10.1f}{total['bytes'] / totals['json']['bytes']:>9.0%}{s['speedup_vs_json']:>9.2f}x")
+
+    report = {
+        "suite": "serialization",
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"source": source, "threads": args.threads, "messages": args.messages, "repeat": args.repeat, "seed": args.seed},
+        "summary": summary,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
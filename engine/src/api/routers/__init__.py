@@ -3,6 +3,7 @@ from .data_router import router as data_router
 from .query_router import router as query_router
 from .data_extraction import router as data_extraction_router
 from .auth_router import router as auth_router
+from .monitoring_router import router as monitoring_router
 
 router = APIRouter()
 
@@ -10,3 +11,4 @@ router.include_router(data_router, prefix="/data", tags=["data"])
 router.include_router(query_router, prefix="/query", tags=["query"])
 router.include_router(data_extraction_router, tags=["data_extraction"])
 router.include_router(auth_router, prefix="/auth", tags=["auth"])
+router.include_router(monitoring_router, prefix="/monitoring", tags=["monitoring"])
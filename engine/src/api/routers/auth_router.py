@@ -2,35 +2,36 @@
 # from fastapi import APIRouter, Request, Depends, HTTPException
 # from fastapi.responses import RedirectResponse, JSONResponse
 # from sqlalchemy.orm import Session
-from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import RedirectResponse, JSONResponse
 from pydantic import BaseModel
-from requests_oauthlib import OAuth2Session
 from urllib.parse import urlparse
 import secrets
 import logging
 import json
 import base64
-from sqlalchemy.orm import Session
-from src.database.relational.dependencies import get_user_db
+from typing import Dict, Optional, Tuple
+from src.database.relational.connection import AsyncUserSessionLocal
 from src.api.services.auth_service import AuthService
 from src.api.services.session_service import SessionService
-from src.database.relational.crud.user import get_user_by_email, update_user_last_login, insert_new_user, get_user_by_id
+from src.api.services.google_oauth import build_authorization_url, exchange_code, fetch_userinfo
+from src.database.relational.crud.user import aget_or_create_user, aget_user_by_id
 from src.config.settings import settings
+from src.utils.helpers import TTLCache
 
 router = APIRouter()  # Note: prefix is now handled in __init__.py 
-auth_service = AuthService(settings.GOOGLE_CLIENT_ID)
+auth_service = AuthService()
 session_service = SessionService()
 logger = logging.getLogger(__name__)
 
-GOOGLE_AUTHORIZATION_URL = "https://accounts.google.com/o/oauth2/v2/auth"
-GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
-GOOGLE_USERINFO_URL = "https://openidconnect.googleapis.com/v1/userinfo"
-SCOPE = [
-    "openid",
-    "https://www.googleapis.com/auth/userinfo.email",
-    "https://www.googleapis.com/auth/userinfo.profile"
-]
+# /auth/me lookups by JWT subject; a login refreshes its entry
+_user_cache = None
+
+def get_user_cache() -> TTLCache:
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = TTLCache("auth_user", settings.AUTH_USER_CACHE_TTL_SECONDS, settings.AUTH_USER_CACHE_SIZE)
+    return _user_cache
 
 def get_frontend_url_from_request(request: Request) -> str:
     """Extract frontend URL from the request's referer"""
@@ -58,26 +59,16 @@ def decode_oauth_state(state: str) -> dict:
         logger.error("Failed to decode state parameter")
         return {'frontend_url': 'http://localhost:7001'}
 
-# Helper to create OAuth2 session
-def get_google_oauth_session(state=None, token=None):
-    if not settings.GOOGLE_CLIENT_ID:
-        logger.error("GOOGLE_CLIENT_ID is not set")
-        raise HTTPException(status_code=500, detail="OAuth configuration error")
-    
-    if not settings.GOOGLE_REDIRECT_URI:
-        logger.error("GOOGLE_REDIRECT_URI is not set")
-        raise HTTPException(status_code=500, detail="OAuth configuration error")
-        
-    return OAuth2Session(
-        client_id=settings.GOOGLE_CLIENT_ID,
-        redirect_uri=settings.GOOGLE_REDIRECT_URI,
-        scope=SCOPE,
-        state=state,
-        token=token,
-    )
+async def record_google_login(user_email: str, google_id: Optional[str]) -> Tuple[int, str]:
+    """Updates or registers the user in the 'users' table (one upsert); returns (user_id, role)."""
+    async with AsyncUserSessionLocal() as db:
+        # New users get the default role 'user'; existing users keep theirs and get last_login updated
+        user = await aget_or_create_user(db, {"email": user_email, "google_id": google_id, "role": "user"})
+        logger.info(f"User {user_email} logged in. Last login updated.")
+        return user.id, user.role
 
 @router.get("/google/login", tags=["auth"])
-def google_login(request: Request):
+async def google_login(request: Request):
     try:
         # Get the frontend URL from the request
         frontend_url = get_frontend_url_from_request(request)
@@ -86,13 +77,7 @@ def google_login(request: Request):
         # Create state with frontend URL
         state = create_oauth_state(frontend_url)
         
-        oauth = get_google_oauth_session(state=state)
-        authorization_url, state = oauth.authorization_url(
-            GOOGLE_AUTHORIZATION_URL,
-            access_type="offline",  # Enable refresh tokens
-            prompt="select_account consent",  # Force consent screen
-            include_granted_scopes="true"  # Enable incremental authorization
-        )
+        authorization_url = build_authorization_url(state)
         logger.info(f"Generated authorization URL: {authorization_url}")
         return RedirectResponse(authorization_url)
     except Exception as e:
@@ -100,9 +85,10 @@ def google_login(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/google/callback", tags=["auth"])
-def google_callback(request: Request, db: Session = Depends(get_user_db)):
+async def google_callback(request: Request):
     """
-    Google SSO callback function that handles user authentication and database operations
+    Google SSO callback function that handles user authentication and database operations.
+    Google calls go through a pooled async client, so login storms don't tie up the threadpool.
     """
     try:
         # 1. Extract authorization code and state from Google
@@ -122,18 +108,11 @@ def google_callback(request: Request, db: Session = Depends(get_user_db)):
         frontend_url = state_data.get('frontend_url', 'http://localhost:7001')
         
         # 2. Exchange code for access token
-        oauth = get_google_oauth_session(state=state)
         logger.info(f"Using redirect URI: {settings.GOOGLE_REDIRECT_URI}")
-        
-        token = oauth.fetch_token(
-            GOOGLE_TOKEN_URL,
-            client_secret=settings.GOOGLE_CLIENT_SECRET,
-            code=code
-        )
+        token = await exchange_code(code)
 
         # 3. Get user info from Google
-        resp = oauth.get(GOOGLE_USERINFO_URL)
-        userinfo = resp.json()
+        userinfo = await fetch_userinfo(token["access_token"])
         
         if not userinfo.get("email"):
             logger.error("No email in userinfo")
@@ -146,23 +125,10 @@ def google_callback(request: Request, db: Session = Depends(get_user_db)):
         logger.info(f"Processing Google SSO for user: {user_email} (google_id: {google_id})")
 
         try:
-            # 5. Check if user already exists in 'users' table
-            existing_user = get_user_by_email(db, user_email)
-
-            if existing_user:
-                # 6a. User exists: Update last_login timestamp
-                update_user_last_login(db, user_email, google_id=google_id)
-                logger.info(f"User {user_email} logged in. Last login updated.")
-                current_user_role = existing_user.role
-                user_id = existing_user.id
-                user_google_id = google_id
-            else:
-                # 6b. New user: Insert into 'users' table with default role 'user'
-                new_user = insert_new_user(db, user_email, 'user', google_id=google_id)
-                logger.info(f"New user {user_email} registered with 'user' role.")
-                current_user_role = 'user'  # Default for new users
-                user_id = new_user.id
-                user_google_id = google_id
+            # 5-6. Update the existing user's last login or register a new one
+            user_id, current_user_role = await record_google_login(user_email, google_id)
+            user_google_id = google_id
+            get_user_cache().pop(str(user_id))  # google_id may have changed
 
             # 7. Establish Application Session
             session_data = session_service.create_user_session(
@@ -228,10 +194,20 @@ def refresh_token(request: RefreshTokenRequest):
         logger.error(f"Token refresh error: {str(e)}")
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
+async def load_user(user_id: int) -> Optional[Dict]:
+    async with AsyncUserSessionLocal() as db:
+        user = await aget_user_by_id(db, user_id)
+        return user and {
+            "user_id": user.id,
+            "email": user.email,
+            "role": user.role,
+            "google_id": user.google_id
+        }
+
 @router.get("/me", tags=["auth"])
-def get_current_user(request: Request, db: Session = Depends(get_user_db)):
+async def get_current_user(request: Request):
     """
-    Get current user information from token
+    Get current user information from token (cached per subject for AUTH_USER_CACHE_TTL_SECONDS)
     """
     try:
         auth_header = request.headers.get("Authorization")
@@ -240,13 +216,15 @@ def get_current_user(request: Request, db: Session = Depends(get_user_db)):
         
         token = auth_header.split(" ")[1]
         user_data = session_service.get_current_user_from_token(token)
-        user = get_user_by_id(db, user_data["user_id"])
-        return {
-            "user_id": user.id,
-            "email": user.email,
-            "role": user.role,
-            "google_id": user.google_id
-        }
+        subject = str(user_data["user_id"])
+        user = get_user_cache().get(subject)
+        if user is None:
+            user = await load_user(user_data["user_id"])
+            if user is None:
+                raise HTTPException(status_code=401, detail="Unknown user")
+            if settings.AUTH_USER_CACHE_TTL_SECONDS > 0:
+                get_user_cache().set(subject, user)
+        return user
     except Exception as e:
         logger.error(f"Get current user error: {str(e)}")
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -10,26 +10,43 @@ This module provides endpoints for:
 import os
 import json
 import uuid
+import base64
+import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Request, Response, BackgroundTasks, UploadFile, File, Depends
-from fastapi.responses import JSONResponse
+from collections import OrderedDict
+from fastapi import APIRouter, HTTPException, Request, Response, BackgroundTasks, UploadFile, File, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import pandas as pd
 import tempfile
 import logging
 from io import BytesIO
-from src.database.vector_db.qdrant_client import get_qdrant_client
+from src.database.vector_db.qdrant_client import get_qdrant_client, count_file_points, delete_file_points
+from src.config.settings import settings
 from src.llm.providers.azure_openai import generate_query_embedding, ask_llm_with_context
+from src.llm.scheduler import Priority
 from src.processing.file_processor import FileProcessor
+from src.processing.recommendations import sample_recommendations
+from src.api.services.thread_service import (
+    THREAD_COLLECTION, append_thread_messages, sync_thread_messages, get_thread_messages,
+    migrate_payload_messages, get_thread_point, list_thread_summaries, index_thread_messages, search_threads
+)
+from src.processing.file_catalog import lookup_file, list_files, catalog_collections, remove_file, remove_collection
+from src.api.services.query_service import generate_followup_suggestions
+from src.database.relational.connection import SessionLocal
+from src.database.relational.crud.recommendation import delete_recommendations_for_collection
+from src.database.relational import table_store
 from src.utils.security import validate_file
+from src.utils.responses import EngineResponse, dumps_ndjson_line
 
 # Initialize router
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Constants
-THREAD_COLLECTION = "chat4ba_threads"
+EXTRACTED_FIELDS = ("id", "filename", "content", "metadata")  # Fields /data/extracted can project
+EXTRACTED_MAX_PAGE_SIZE = 1000  # Max items per JSON page
+EXTRACTED_SCROLL_BATCH = 256  # Points fetched per Qdrant scroll call
 
 # Models
 class ThreadMessage(BaseModel):
@@ -45,6 +62,9 @@ class Thread(BaseModel):
     updated_at: datetime
     associated_files: List[str] = []
     
+class AppendMessagesRequest(BaseModel):
+    messages: List[ThreadMessage]
+
 class RecommendedQuestion(BaseModel):
     question: str
     context: str
@@ -58,6 +78,8 @@ def extract_file_data(file_path: str, filename: str) -> Dict[str, Any]:
         # For CSV and Excel files
         if ext in ['.csv', '.xlsx', '.xls']:
             try:
+                import pandas as pd
+
                 df = pd.read_excel(file_path) if ext in ['.xlsx', '.xls'] else pd.read_csv(file_path)
                 records = df.head(10).to_dict('records')
                 return {
@@ -106,7 +128,7 @@ async def generate_recommended_questions(files: List[str], count: int = 5) -> Li
         Always respond with valid JSON in the format: [{"question": "...", "context": "..."}]"""
         
         # Get response from LLM
-        response_text = await ask_llm_with_context(prompt, context, system_prompt)
+        response_text = await ask_llm_with_context(prompt, context, system_prompt, Priority.RECOMMENDATION)
         
         # Extract JSON from response
         import re
@@ -133,184 +155,299 @@ async def generate_recommended_questions(files: List[str], count: int = 5) -> Li
             for file in files[:count]
         ]
 
-async def generate_followup_suggestions(question: str, answer: str) -> List[str]:
-    """Generate follow-up question suggestions based on the current Q&A"""
-    try:
-        # Create a prompt for the LLM
-        prompt = f"""Based on this question: "{question}" 
-        and this answer: "{answer[:500]}..." (truncated),
-        suggest 3 relevant follow-up questions the user might want to ask next.
-        Format as a JSON array of strings."""
-        
-        context = "Generate follow-up questions for the user based on the conversation."
-        system_prompt = """You are a helpful AI assistant that suggests relevant follow-up questions.
-        Always respond with valid JSON as an array of strings: ["question 1", "question 2", "question 3"]"""
-        
-        # Get response from LLM
-        response_text = await ask_llm_with_context(prompt, context, system_prompt)
-        
-        # Extract JSON from response
-        import re
-        json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group())
-        
-        # Fallback
-        return [
-            "Can you explain more about this topic?",
-            "How does this relate to the rest of my data?",
-            "What actions should I take based on this information?"
-        ]
-    except Exception as e:
-        logger.error(f"Error generating follow-up questions: {e}")
-        return [
-            "Can you elaborate on that?",
-            "What else can you tell me about this?",
-            "How can I use this information?"
-        ]
-
 # Dependency for Qdrant Client
 async def get_db_client():
     return get_qdrant_client()
 
-# Ensure thread collection exists
-@router.on_event("startup")
-async def ensure_thread_collection():
-    client = get_qdrant_client()
+def encode_extracted_cursor(collection: str, offset: Any) -> str:
+    """Encodes a scroll position (collection plus Qdrant point offset) as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps({"collection": collection, "offset": offset}).encode()).decode()
+
+def decode_extracted_cursor(cursor: str) -> Dict[str, Any]:
     try:
-        collections = client.get_collections()
-        if THREAD_COLLECTION not in [c.name for c in collections.collections]:
-            client.create_collection(
-                collection_name=THREAD_COLLECTION,
-                vectors_config={
-                    "size": 1536,  # OpenAI embedding dimension
-                    "distance": "Cosine"
-                }
-            )
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if not isinstance(position, dict) or not isinstance(position.get("collection"), str):
+            raise ValueError("cursor has no collection")
+        return position
     except Exception as e:
-        logger.error(f"Failed to create thread collection: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+def parse_extracted_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return ["filename", "content", "metadata"]
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in EXTRACTED_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}. Choose from: {', '.join(EXTRACTED_FIELDS)}")
+    return selected
+
+async def list_data_collections(client) -> List[str]:
+    """Collections holding file data, from the file catalog (or Qdrant if the catalog is empty)"""
+    collection_names = await asyncio.to_thread(catalog_collections)
+    if not collection_names:
+        collections_response = await asyncio.to_thread(client.get_collections)
+        # System collections (threads) hold no extracted file data
+        collection_names = sorted(c.name for c in collections_response.collections if not c.name.startswith("chat4ba_"))
+    return collection_names
+
+async def scroll_extracted(client, fields: List[str], cursor: Optional[str], limit: Optional[int]):
+    """
+    Walks the data collections in name order with Qdrant scroll offsets, yielding
+    `(item, next_cursor)` pairs. Only one scroll batch is held in memory at a time,
+    and only the payload keys needed for `fields` are fetched. Stops after `limit`
+    items (None for no limit); `next_cursor` is None once everything has been read.
+    """
+    collection_names = await list_data_collections(client)
+
+    position = decode_extracted_cursor(cursor) if cursor else None
+    if position:
+        collection_names = [name for name in collection_names if name >= position["collection"]]
+    payload_keys = [f for f in fields if f in ("content", "metadata")]
+
+    produced = 0
+    for index, collection_name in enumerate(collection_names):
+        offset = position["offset"] if position and collection_name == position["collection"] else None
+        following = collection_names[index + 1] if index + 1 < len(collection_names) else None
+        while True:
+            batch_size = EXTRACTED_SCROLL_BATCH if limit is None else min(EXTRACTED_SCROLL_BATCH, limit - produced)
+            points, next_offset = await asyncio.to_thread(
+                client.scroll,
+                collection_name=collection_name,
+                offset=offset,
+                limit=batch_size,
+                with_payload=payload_keys or False,
+                with_vectors=False,
+            )
+            for i, point in enumerate(points):
+                produced += 1
+                item = {}
+                if "id" in fields:
+                    item["id"] = point.id
+                if "filename" in fields:
+                    item["filename"] = collection_name
+                if "content" in fields:
+                    item["content"] = (point.payload or {}).get("content", "")
+                if "metadata" in fields:
+                    item["metadata"] = (point.payload or {}).get("metadata", {})
+
+                # Resume after this point: the next one in the batch, the batch's
+                # scroll offset, or the start of the following collection
+                if i + 1 < len(points):
+                    next_cursor = encode_extracted_cursor(collection_name, points[i + 1].id)
+                elif next_offset is not None:
+                    next_cursor = encode_extracted_cursor(collection_name, next_offset)
+                else:
+                    next_cursor = encode_extracted_cursor(following, None) if following else None
+                yield item, next_cursor
+                if limit is not None and produced >= limit:
+                    return
+            if next_offset is None:
+                break
+            offset = next_offset
 
 # Endpoints
 @router.get("/data/extracted")
-async def get_extracted_data(client = Depends(get_db_client)):
-    """Get all extracted data from the database"""
-    try:
-        # Get all collection names
-        collections_response = client.get_collections()
-        all_collections = [c.name for c in collections_response.collections]
-        
-        extracted_data = []
-        for collection_name in all_collections:
+async def get_extracted_data(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1),
+    fields: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    client = Depends(get_db_client),
+):
+    """
+    Pages through the extracted data of every collection.
+    `cursor` is the `next_cursor` of the previous page, `fields` a comma-separated
+    projection of id, filename, content and metadata. With `format=ndjson` items are
+    streamed one per line (any `limit`) and the last line holds `next_cursor`.
+    """
+    selected_fields = parse_extracted_fields(fields)
+    if cursor:
+        decode_extracted_cursor(cursor)  # Reject malformed cursors before streaming starts
+
+    if format == "ndjson":
+        async def stream_items():
+            next_cursor = None
             try:
-                # Get points from the collection
-                points = client.scroll(
-                    collection_name=collection_name,
-                    limit=100,
-                    with_payload=True
-                )
-                
-                # Extract relevant data
-                for point in points[0]:
-                    if point.payload:
-                        extracted_data.append({
-                            "filename": collection_name,
-                            "content": point.payload.get("content", ""),
-                            "metadata": point.payload.get("metadata", {})
-                        })
+                async for item, next_cursor in scroll_extracted(client, selected_fields, cursor, limit):
+                    yield dumps_ndjson_line(item)
             except Exception as e:
-                logger.error(f"Error getting data from collection {collection_name}: {e}")
-                continue
-        
-        return JSONResponse(content={"success": True, "data": extracted_data})
+                logger.error(f"Error streaming extracted data: {e}")
+                yield dumps_ndjson_line({"error": str(e), "next_cursor": next_cursor})
+                return
+            yield dumps_ndjson_line({"next_cursor": next_cursor})
+
+        return StreamingResponse(stream_items(), media_type="application/x-ndjson")
+
+    try:
+        extracted_data, next_cursor = [], None
+        async for item, next_cursor in scroll_extracted(client, selected_fields, cursor, min(limit, EXTRACTED_MAX_PAGE_SIZE)):
+            extracted_data.append(item)
+        return EngineResponse(content={"success": True, "data": extracted_data, "next_cursor": next_cursor})
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in get_extracted_data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/data/files")
+async def list_catalogued_files():
+    """List ingested files from the file catalog"""
+    files = await asyncio.to_thread(list_files)
+    return EngineResponse(content={"success": True, "files": files})
+
+# Background delete jobs by id, oldest first
+delete_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def run_delete_job(job_id: str):
+    """Deletes a file's points collection by collection, updating the job status as it goes."""
+    job = delete_jobs[job_id]
+    job["status"] = "running"
+    try:
+        for collection_name in job["collections"]:
+            job["deleted_points"] += delete_file_points(collection_name, job["filename"])
+            table_store.delete_tables(collection_name)  # Or mode="sql" would still answer from the file
+            job["completed_collections"].append(collection_name)
+        remove_file(job["filename"])
+        job["status"] = "completed"
+    except Exception as e:
+        logger.error(f"Delete job {job_id} for '{job['filename']}' failed: {e}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+    finally:
+        job["finished_at"] = datetime.now().isoformat()
+
+def create_delete_job(filename: str, matches: Dict[str, int]) -> Dict[str, Any]:
+    job_id = str(uuid.uuid4())
+    delete_jobs[job_id] = {
+        "job_id": job_id,
+        "filename": filename,
+        "status": "pending",
+        "collections": list(matches),
+        "completed_collections": [],
+        "matched_points": sum(matches.values()),
+        "deleted_points": 0,
+        "error": None,
+        "created_at": datetime.now().isoformat(),
+        "finished_at": None,
+    }
+    # Forget the oldest finished jobs once the history is full
+    for old_id in [i for i, j in delete_jobs.items() if j["finished_at"]][:max(0, len(delete_jobs) - settings.DELETE_JOB_HISTORY)]:
+        del delete_jobs[old_id]
+    return delete_jobs[job_id]
+
 @router.delete("/data/delete")
-async def delete_file(filename: str, client = Depends(get_db_client)):
-    """Delete a file from the vector database"""
+async def delete_file(filename: str, background_tasks: BackgroundTasks, client = Depends(get_db_client)):
+    """
+    Delete a file from the vector database. Deletes matching more than
+    DELETE_BACKGROUND_THRESHOLD points run in the background; their progress is
+    reported by /api/data/delete/status/{job_id}.
+    """
     try:
-        # Get all collection names
-        collections_response = client.get_collections()
-        collection_names = [c.name for c in collections_response.collections]
-        
-        # First, try to find a collection that matches the filename
-        collection_to_delete = None
-        for collection_name in collection_names:
-            if collection_name == filename or collection_name.startswith(f"{filename}_"):
-                collection_to_delete = collection_name
-                break
+        # Catalogued files map straight to their collection
+        entry = await asyncio.to_thread(lookup_file, filename)
+        collection_to_delete = entry["collection_name"] if entry else None
+
+        if not collection_to_delete:
+            # Get all collection names
+            collections_response = client.get_collections()
+            collection_names = [c.name for c in collections_response.collections]
+
+            # First, try to find a collection that matches the filename
+            for collection_name in collection_names:
+                if collection_name == filename or collection_name.startswith(f"{filename}_"):
+                    collection_to_delete = collection_name
+                    break
         
         # If found, delete the entire collection
         if collection_to_delete:
             client.delete_collection(collection_name=collection_to_delete)
-            return JSONResponse(
+            db = SessionLocal()
+            try:
+                delete_recommendations_for_collection(db, collection_to_delete)
+            finally:
+                db.close()
+            await asyncio.to_thread(table_store.delete_tables, collection_to_delete)
+            await asyncio.to_thread(remove_collection, collection_to_delete)
+            return EngineResponse(
                 content={"success": True, "message": f"Collection {collection_to_delete} deleted successfully"},
                 status_code=200
             )
         
-        # Otherwise, find and delete points with this filename
-        deleted_points = 0
+        # Otherwise, count the points with this filename using the indexed payload fields
+        matches = {}
         for collection_name in collection_names:
+            if collection_name.startswith("chat4ba_"):
+                continue  # Skip system collections
             try:
-                if collection_name.startswith("chat4ba_"):
-                    continue  # Skip system collections
-                    
-                # Find points with this filename in metadata
-                filter_condition = {
-                    "should": [
-                        {"key": "metadata.filename", "match": {"value": filename}},
-                        {"key": "metadata.source", "match": {"value": filename}}
-                    ]
-                }
-                
-                # Get points to delete
-                points = client.scroll(
-                    collection_name=collection_name,
-                    filter=filter_condition,
-                    limit=1000,  # Get a large batch
-                    with_payload=False,
-                    with_vectors=False
-                )[0]
-                
-                if points:
-                    # Delete the points
-                    point_ids = [p.id for p in points]
-                    client.delete(
-                        collection_name=collection_name,
-                        points_selector={"points": point_ids}
-                    )
-                    deleted_points += len(point_ids)
+                matched = await asyncio.to_thread(count_file_points, collection_name, filename)
+                if matched:
+                    matches[collection_name] = matched
             except Exception as e:
-                logger.error(f"Error deleting points from {collection_name}: {e}")
-        
-        if deleted_points > 0:
-            return JSONResponse(
-                content={"success": True, "message": f"Deleted {deleted_points} points related to {filename}"},
-                status_code=200
+                logger.error(f"Error counting points for {filename} in {collection_name}: {e}")
+
+        if not matches:
+            return EngineResponse(
+                content={"success": False, "message": f"File {filename} not found in any collection"},
+                status_code=404
             )
-        
-        return JSONResponse(
-            content={"success": False, "message": f"File {filename} not found in any collection"},
-            status_code=404
+
+        job = create_delete_job(filename, matches)
+        if job["matched_points"] > settings.DELETE_BACKGROUND_THRESHOLD:
+            background_tasks.add_task(run_delete_job, job["job_id"])
+            logger.info(f"Queued delete job {job['job_id']} for {job['matched_points']} points of '{filename}'.")
+            return EngineResponse(
+                content={
+                    "success": True,
+                    "message": f"Deleting {job['matched_points']} points related to {filename} in the background",
+                    "job_id": job["job_id"],
+                    "status_url": f"/api/data/delete/status/{job['job_id']}",
+                },
+                status_code=202
+            )
+
+        await asyncio.to_thread(run_delete_job, job["job_id"])
+        if job["status"] == "failed":
+            raise RuntimeError(job["error"])
+        return EngineResponse(
+            content={"success": True, "message": f"Deleted {job['deleted_points']} points related to {filename}"},
+            status_code=200
         )
     except Exception as e:
         logger.error(f"Error in delete_file: {e}")
-        return JSONResponse(
+        return EngineResponse(
             content={"success": False, "error": str(e)},
             status_code=500
         )
 
+@router.get("/data/delete/status/{job_id}")
+async def get_delete_status(job_id: str):
+    """Status of a file delete job"""
+    job = delete_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Delete job {job_id} not found")
+    return EngineResponse(content={"success": True, "job": job})
+
 @router.get("/data/preview/{filename}")
 async def preview_file(filename: str, client = Depends(get_db_client)):
     """Get a preview of file contents"""
     try:
-        # Get all collection names
-        collections_response = client.get_collections()
-        collection_names = [c.name for c in collections_response.collections]
+        # Catalogued files live in a single known collection; read its first points directly
+        entry = await asyncio.to_thread(lookup_file, filename)
+        if entry:
+            found_points = client.scroll(
+                collection_name=entry["collection_name"],
+                limit=5,
+                with_payload=True,
+                with_vectors=False
+            )[0]
+            collection_names = []
+        else:
+            # Get all collection names
+            collections_response = client.get_collections()
+            collection_names = [c.name for c in collections_response.collections]
+            found_points = []
         
         # Find collections that might contain this file
-        found_points = []
         for collection_name in collection_names:
             if collection_name.startswith("chat4ba_"):
                 continue  # Skip system collections
@@ -367,7 +504,7 @@ async def preview_file(filename: str, client = Depends(get_db_client)):
         }
     except Exception as e:
         logger.error(f"Error in preview_file: {e}")
-        return JSONResponse(
+        return EngineResponse(
             content={
                 "files": [{
                     "filename": filename,
@@ -379,12 +516,21 @@ async def preview_file(filename: str, client = Depends(get_db_client)):
             status_code=500
         )
 
+def thread_payload(thread: Thread) -> Dict[str, Any]:
+    """Thread metadata stored on the thread point; messages live in the message table"""
+    return {
+        "title": thread.title,
+        "created_at": thread.created_at.isoformat(),
+        "updated_at": thread.updated_at.isoformat(),
+        "associated_files": thread.associated_files
+    }
+
 @router.post("/api/threads")
-async def create_thread(thread: Thread, client = Depends(get_db_client)):
+async def create_thread(thread: Thread, background_tasks: BackgroundTasks, client = Depends(get_db_client)):
     """Create a new thread"""
     try:
         # Generate embedding for thread title for semantic search
-        title_embedding = await generate_query_embedding(thread.title)
+        title_embedding = await generate_query_embedding(thread.title, Priority.THREAD_TITLE)
         
         # Store thread in Qdrant
         client.upsert(
@@ -392,119 +538,209 @@ async def create_thread(thread: Thread, client = Depends(get_db_client)):
             points=[{
                 "id": thread.id,
                 "vector": title_embedding,
-                "payload": {
-                    "title": thread.title,
-                    "messages": [msg.dict() for msg in thread.messages],
-                    "created_at": thread.created_at.isoformat(),
-                    "updated_at": thread.updated_at.isoformat(),
-                    "associated_files": thread.associated_files
-                }
+                "payload": thread_payload(thread)
             }]
         )
+        appended = await asyncio.to_thread(append_thread_messages, thread.id, [msg.dict() for msg in thread.messages])
+        background_tasks.add_task(index_thread_messages, client, thread.id, appended)
         
-        return JSONResponse(
+        return EngineResponse(
             content={"success": True, "thread_id": thread.id},
             status_code=201
         )
     except Exception as e:
         logger.error(f"Error in create_thread: {e}")
-        return JSONResponse(
+        return EngineResponse(
             content={"success": False, "error": str(e)},
             status_code=500
         )
 
 @router.get("/api/threads")
-async def get_threads(client = Depends(get_db_client)):
-    """Get all threads"""
+async def get_threads(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200), client = Depends(get_db_client)):
+    """
+    List thread summaries (id, title, timestamps, message count and last-message
+    preview), most recently updated first. Pass `next_cursor` back as `cursor`
+    for the next page.
+    """
     try:
-        # Get threads from Qdrant
-        threads = client.scroll(
-            collection_name=THREAD_COLLECTION,
-            limit=100,
-            with_payload=True,
-            with_vectors=False
-        )[0]
-        
-        return JSONResponse(
-            content={"success": True, "threads": [t.payload for t in threads]},
+        threads, next_cursor = await asyncio.to_thread(list_thread_summaries, client, cursor, limit)
+        return EngineResponse(
+            content={"success": True, "threads": threads, "next_cursor": next_cursor},
             status_code=200
         )
+    except ValueError as e:
+        return EngineResponse(
+            content={"success": False, "error": str(e)},
+            status_code=400
+        )
     except Exception as e:
         logger.error(f"Error in get_threads: {e}")
-        return JSONResponse(
+        return EngineResponse(
+            content={"success": False, "error": str(e)},
+            status_code=500
+        )
+
+# Declared before /api/threads/{thread_id} so "search" is not taken as a thread id
+@router.get("/api/threads/search")
+async def search_thread_history(
+    q: str,
+    limit: int = Query(10, ge=1, le=50),
+    matches_per_thread: int = Query(3, ge=1, le=10),
+    client = Depends(get_db_client),
+):
+    """Semantic search over thread messages, grouped by thread"""
+    if not q.strip():
+        return EngineResponse(
+            content={"success": False, "error": "Query cannot be empty"},
+            status_code=400
+        )
+    try:
+        results = await search_threads(client, q, limit, matches_per_thread)
+        return EngineResponse(content={"success": True, "threads": results}, status_code=200)
+    except Exception as e:
+        logger.error(f"Error in search_thread_history: {e}")
+        return EngineResponse(
             content={"success": False, "error": str(e)},
             status_code=500
         )
 
 @router.get("/api/threads/{thread_id}")
-async def get_thread(thread_id: str, client = Depends(get_db_client)):
+async def get_thread(thread_id: str, background_tasks: BackgroundTasks, client = Depends(get_db_client)):
     """Get a thread by ID"""
     try:
         # Get thread from Qdrant
-        thread = client.retrieve(
-            collection_name=THREAD_COLLECTION,
-            ids=[thread_id]
-        )
+        thread = get_thread_point(client, thread_id)
         
         if not thread:
-            return JSONResponse(
+            return EngineResponse(
                 content={"success": False, "error": "Thread not found"},
                 status_code=404
             )
-        
-        return JSONResponse(
-            content={"success": True, "thread": thread[0].payload},
+
+        payload, migrated = await asyncio.to_thread(migrate_payload_messages, client, thread_id, thread.payload)
+        background_tasks.add_task(index_thread_messages, client, thread_id, migrated)
+        payload["messages"] = await asyncio.to_thread(get_thread_messages, thread_id)
+        return EngineResponse(
+            content={"success": True, "thread": payload},
             status_code=200
         )
     except Exception as e:
         logger.error(f"Error in get_thread: {e}")
-        return JSONResponse(
+        return EngineResponse(
+            content={"success": False, "error": str(e)},
+            status_code=500
+        )
+
+@router.get("/api/threads/{thread_id}/messages")
+async def get_thread_messages_page(
+    thread_id: str,
+    after_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    client = Depends(get_db_client),
+):
+    """Page through a thread's messages in order; pass `next_cursor` back as `after_id`"""
+    try:
+        if not get_thread_point(client, thread_id):
+            return EngineResponse(
+                content={"success": False, "error": "Thread not found"},
+                status_code=404
+            )
+        messages = await asyncio.to_thread(get_thread_messages, thread_id, after_id, limit + 1)
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        return EngineResponse(
+            content={
+                "success": True,
+                "messages": messages,
+                "next_cursor": messages[-1]["id"] if has_more else None
+            },
+            status_code=200
+        )
+    except Exception as e:
+        logger.error(f"Error in get_thread_messages_page: {e}")
+        return EngineResponse(
             content={"success": False, "error": str(e)},
             status_code=500
         )
 
 @router.put("/api/threads/{thread_id}")
-async def update_thread(thread_id: str, thread: Thread, client = Depends(get_db_client)):
-    """Update a thread"""
+async def update_thread(thread_id: str, thread: Thread, background_tasks: BackgroundTasks, client = Depends(get_db_client)):
+    """
+    Update a thread. `messages` is treated as the full history: only messages
+    beyond those already stored are appended, so repeated or concurrent PUTs of
+    the same history store each message once. The title is re-embedded only
+    when it changes.
+    """
     try:
         # Check if thread exists
-        existing_thread = client.retrieve(
-            collection_name=THREAD_COLLECTION,
-            ids=[thread_id]
-        )
+        existing_thread = get_thread_point(client, thread_id)
         
         if not existing_thread:
-            return JSONResponse(
+            return EngineResponse(
                 content={"success": False, "error": "Thread not found"},
                 status_code=404
             )
+
+        existing_payload, migrated = await asyncio.to_thread(migrate_payload_messages, client, thread_id, existing_thread.payload)
+        appended = await asyncio.to_thread(sync_thread_messages, thread_id, [msg.dict() for msg in thread.messages])
+        background_tasks.add_task(index_thread_messages, client, thread_id, migrated + appended)
+
+        payload = thread_payload(thread)
+        if thread.title != existing_payload.get("title"):
+            # Generate new embedding for thread title
+            title_embedding = await generate_query_embedding(thread.title, Priority.THREAD_TITLE)
+            client.upsert(
+                collection_name=THREAD_COLLECTION,
+                points=[{"id": thread_id, "vector": title_embedding, "payload": {**existing_payload, **payload}}]
+            )
+        else:
+            # Metadata-only change: update the payload in place, keep the vector
+            client.set_payload(collection_name=THREAD_COLLECTION, payload=payload, points=[thread_id])
         
-        # Generate new embedding for thread title
-        title_embedding = await generate_query_embedding(thread.title)
-        
-        # Update thread in Qdrant
-        client.upsert(
-            collection_name=THREAD_COLLECTION,
-            points=[{
-                "id": thread_id,
-                "vector": title_embedding,
-                "payload": {
-                    "title": thread.title,
-                    "messages": [msg.dict() for msg in thread.messages],
-                    "created_at": thread.created_at.isoformat(),
-                    "updated_at": thread.updated_at.isoformat(),
-                    "associated_files": thread.associated_files
-                }
-            }]
-        )
-        
-        return JSONResponse(
+        return EngineResponse(
             content={"success": True, "thread_id": thread_id},
             status_code=200
         )
     except Exception as e:
         logger.error(f"Error in update_thread: {e}")
-        return JSONResponse(
+        return EngineResponse(
+            content={"success": False, "error": str(e)},
+            status_code=500
+        )
+
+@router.post("/api/threads/{thread_id}/messages")
+async def append_messages_to_thread(thread_id: str, request: AppendMessagesRequest, background_tasks: BackgroundTasks,
+                                    client = Depends(get_db_client)):
+    """Append messages to a thread without rewriting the thread"""
+    try:
+        existing_thread = get_thread_point(client, thread_id)
+        if not existing_thread:
+            return EngineResponse(
+                content={"success": False, "error": "Thread not found"},
+                status_code=404
+            )
+        if not request.messages:
+            return EngineResponse(
+                content={"success": False, "error": "Messages cannot be empty"},
+                status_code=400
+            )
+
+        _, migrated = await asyncio.to_thread(migrate_payload_messages, client, thread_id, existing_thread.payload)
+        appended = await asyncio.to_thread(append_thread_messages, thread_id, [msg.dict() for msg in request.messages])
+        background_tasks.add_task(index_thread_messages, client, thread_id, migrated + appended)
+        client.set_payload(
+            collection_name=THREAD_COLLECTION,
+            payload={"updated_at": datetime.now().isoformat()},
+            points=[thread_id]
+        )
+
+        return EngineResponse(
+            content={"success": True, "thread_id": thread_id, "messages": appended},
+            status_code=201
+        )
+    except Exception as e:
+        logger.error(f"Error in append_messages_to_thread: {e}")
+        return EngineResponse(
             content={"success": False, "error": str(e)},
             status_code=500
         )
@@ -513,18 +749,30 @@ async def update_thread(thread_id: str, thread: Thread, client = Depends(get_db_
 async def get_recommended_questions(count: int = 5, client = Depends(get_db_client)):
     """Get recommended questions based on uploaded files"""
     try:
-        # Get all collection names
-        collections_response = client.get_collections()
-        collection_names = [c.name for c in collections_response.collections if not c.name.startswith("chat4ba_")]
-        
-        if not collection_names:
-            return JSONResponse(
+        # Questions are precomputed per file at ingest time; just sample and merge them
+        stored_recommendations = await asyncio.to_thread(sample_recommendations, count)
+        if stored_recommendations:
+            return EngineResponse(
+                content={"success": True, "recommendations": stored_recommendations},
+                status_code=200
+            )
+
+        # Fallback for files ingested before recommendations were precomputed
+        catalogued_files = await asyncio.to_thread(list_files)
+        filenames = [f["filename"] for f in catalogued_files]
+        collection_names = []
+        if not filenames:
+            # Get all collection names
+            collections_response = client.get_collections()
+            collection_names = [c.name for c in collections_response.collections if not c.name.startswith("chat4ba_")]
+        
+        if not filenames and not collection_names:
+            return EngineResponse(
                 content={"success": True, "recommendations": []},
                 status_code=200
             )
         
         # Get filenames from collections
-        filenames = []
         for collection_name in collection_names:
             try:
                 # Get a sample point to extract filename
@@ -549,7 +797,7 @@ async def get_recommended_questions(count: int = 5, client = Depends(get_db_clie
         # Generate recommendations
         recommendations = await generate_recommended_questions(filenames, count)
         
-        return JSONResponse(
+        return EngineResponse(
             content={
                 "success": True, 
                 "recommendations": [{"question": r.question, "context": r.context} for r in recommendations]
@@ -558,7 +806,7 @@ async def get_recommended_questions(count: int = 5, client = Depends(get_db_clie
         )
     except Exception as e:
         logger.error(f"Error in get_recommended_questions: {e}")
-        return JSONResponse(
+        return EngineResponse(
             content={"success": False, "error": str(e)},
             status_code=500
         )
@@ -571,20 +819,20 @@ async def suggest_followup_questions(request: Dict[str, str]):
         answer = request.get("answer", "")
         
         if not question or not answer:
-            return JSONResponse(
+            return EngineResponse(
                 content={"success": False, "error": "Question and answer are required"},
                 status_code=400
             )
         
         suggestions = await generate_followup_suggestions(question, answer)
         
-        return JSONResponse(
+        return EngineResponse(
             content={"success": True, "suggestions": suggestions},
             status_code=200
         )
     except Exception as e:
         logger.error(f"Error in suggest_followup_questions: {e}")
-        return JSONResponse(
+        return EngineResponse(
             content={"success": False, "error": str(e)},
             status_code=500
         ) 
\ No newline at end of file
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request
 from src.processing.file_processor import FileProcessor
 from src.llm.providers.azure_openai import get_azure_provider, AzureOpenAIProvider  # Add this import
 from src.utils.security import validate_file
+from src.utils.profiling import require_profiling_admin
+from src.utils.tracing import traced
+from src.utils.responses import EngineResponse
 import tempfile
 import os
 import logging
@@ -12,14 +14,19 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/process")
+@traced("process_files")
 async def process_files(
+    request: Request,
     files: List[UploadFile] = File(...),
+    memory_profile: bool = Query(False, description="Store tracemalloc snapshots per stage (admins only)"),
     azure_provider: AzureOpenAIProvider = Depends(get_azure_provider)  # Add dependency injection
 ):
     """
     Process the uploaded files, convert to embeddings, and store in Qdrant.
     Returns the collection names and processing information.
     """
+    if memory_profile:
+        require_profiling_admin(request)
     results = []
     for file in files:
         temp_path = None  # Initialize temp_path outside try block
@@ -37,13 +44,14 @@ async def process_files(
             # Process and store in vector database
             processor = FileProcessor()
             # Add await and azure_provider parameter
-            processing_result = await processor.process_and_store(temp_path, file.filename, azure_provider)
+            processing_result = await processor.process_and_store(temp_path, file.filename, azure_provider, memory_profile)
             
             results.append({
                 "filename": file.filename,
                 "collection_name": processing_result["collection_name"],
                 "chunks_processed": processing_result["chunks_processed"],
-                "status": "success"
+                "status": "success",
+                **({"memory_profile_id": processing_result["memory_profile_id"]} if memory_profile else {})
             })
         except Exception as e:
             results.append({
@@ -55,4 +63,4 @@ async def process_files(
             if temp_path and os.path.exists(temp_path):
                 os.unlink(temp_path)
     
-    return JSONResponse(content={"files": results})
+    return EngineResponse(content={"files": results})
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from src.llm.scheduler import get_scheduler
+from src.llm.llm_service import get_llm_service
+from src.api.services.session_service import get_admin_user
+from src.utils.profiling import list_profiles, get_profile_path
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/scheduler")
+async def get_scheduler_stats():
+    """Returns LLM scheduler queue depth and wait-time metrics per deployment and priority lane."""
+    return {"deployments": get_scheduler().stats()}
+
+@router.get("/llm-router")
+async def get_llm_router_stats():
+    """Returns per-backend time-to-first-token percentiles and hedging counters."""
+    llm_router = get_llm_service().router
+    return llm_router.stats() if llm_router else {"backends": {}}
+
+@router.get("/profiles")
+async def get_profiles(admin = Depends(get_admin_user)):
+    """Lists stored CPU (request) and memory (ingestion) profiles, newest first. Admins only."""
+    return {"profiles": list_profiles()}
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, admin = Depends(get_admin_user)):
+    """Returns a stored profile: the pyinstrument HTML report or the tracemalloc JSON report. Admins only."""
+    path = get_profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found.")
+    return FileResponse(path)
@@ -1,22 +1,51 @@
 from fastapi import APIRouter, HTTPException, Body, Depends
-from src.llm.providers.azure_openai import generate_query_embedding, ask_llm_with_context
+from fastapi.responses import StreamingResponse
+from src.llm.providers.azure_openai import generate_query_embedding, generate_document_embeddings, ask_llm_with_context
 from src.database.vector_db.qdrant_client import get_qdrant_client
-from src.prompts.system.system_prompt import SYSTEM_PROMPT
-from typing import List, Dict, Optional
+from src.database.relational import table_store
+from src.prompts.system.system_prompt import SYSTEM_PROMPT, SQL_GENERATION_PROMPT, SQL_ANSWER_PROMPT
+from src.config.settings import settings
+from src.utils.helpers import SingleFlight
+from src.utils.metrics import IN_FLIGHT, observe_stage
+from src.utils.tracing import span
+from src.utils.responses import dumps_ndjson_line
+from src.llm.scheduler import Priority
+from src.api.services.query_service import answer_with_followups
+from src.api.services.thread_memory import get_thread_memory
+from src.processing.file_catalog import catalog_collections
+from typing import List, Dict, Literal, Optional
 from pydantic import BaseModel
+import asyncio
 import logging
+import re
+
+# Query modes: "vector" retrieves chunks for the LLM, "sql" lets the LLM query the stored tables
+QueryMode = Literal["vector", "sql"]
 
 # Define request models
 class QueryRequest(BaseModel):
     query: str
+    mode: QueryMode = "vector"
+    include_followups: bool = False # Return follow-up questions from the same LLM call
+    thread_id: Optional[str] = None # Answer with the thread's conversation memory
 
 class MultiCollectionRequest(BaseModel):
     query: str
     collections: List[str]
+    mode: QueryMode = "vector"
+    include_followups: bool = False
+    thread_id: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    collections: List[str]
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Concurrent identical queries (same text, collections and mode) share one computation
+query_single_flight = SingleFlight("query")
+
 def build_context(results: List) -> str:
     """Builds a context string from Qdrant search results."""
     context_parts = []
@@ -26,6 +55,49 @@ def build_context(results: List) -> str:
         context_parts.append(f"Source: {source}\nContent: {content}")
     return "\n\n---\n\n".join(context_parts) # Separator for clarity
 
+def extract_sql(llm_output: str) -> str:
+    """Extracts the SQL statement from an LLM response, dropping markdown fences."""
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", llm_output, re.DOTALL | re.IGNORECASE)
+    return (fenced.group(1) if fenced else llm_output).strip()
+
+async def answer_with_sql(query: str, table_names: Optional[List[str]] = None, include_followups: bool = False,
+                          thread_id: Optional[str] = None) -> Dict:
+    """
+    Answers a query by having the LLM write one read-only SQL statement against
+    the stored table schemas, running it locally and answering from the result.
+    """
+    schemas = await asyncio.to_thread(table_store.get_table_schemas, table_names)
+    if not schemas:
+        raise HTTPException(status_code=404, detail="No stored tables found for SQL mode.")
+
+    schema_context = table_store.format_schema_for_prompt(schemas)
+    # Loaded once for both LLM calls; follow-up questions ("and by month?") need it to write the right SQL
+    memory = await get_thread_memory(thread_id) if thread_id else ""
+    if memory:
+        schema_context = f"{memory}\n\n---\n\n{schema_context}"
+    with span("sql.generate", tables=len(schemas), characters=len(schema_context)):
+        sql = extract_sql(await ask_llm_with_context(query, schema_context, SQL_GENERATION_PROMPT))
+    logger.info(f"Generated SQL for query '{query}': {sql}")
+
+    try:
+        with span("sql.execute") as execute_span:
+            result = await asyncio.to_thread(table_store.run_read_only_query, sql)
+            execute_span.set(rows=len(result["rows"]), truncated=result["truncated"])
+    except ValueError as e:
+        logger.warning(f"Generated SQL could not be executed: {e}")
+        raise HTTPException(status_code=400, detail={"message": str(e), "sql": sql})
+    logger.info(f"SQL returned {len(result['rows'])} rows (truncated={result['truncated']}).")
+
+    answer_context = f"SQL:\n{sql}\n\nResult:\n{table_store.format_result_for_prompt(result)}"
+    with span("sql.answer", characters=len(answer_context)):
+        answer = await answer_with_followups(query, answer_context, SQL_ANSWER_PROMPT, include_followups, memory=memory)
+    return {
+        **answer,
+        "sources": [s["table"] for s in schemas],
+        "sql": sql,
+        "result": result,
+    }
+
 # Dependency for Qdrant Client
 async def get_db_client():
     return get_qdrant_client()
@@ -33,21 +105,36 @@ async def get_db_client():
 @router.post("/ask")
 async def process_query(collection_name: str, data: QueryRequest, client = Depends(get_db_client)):
     """Processes a query against a single specified collection."""
-    query = data.query
-    logger.info(f"Received query for collection '{collection_name}': {query}")
-    if not query.strip():
+    logger.info(f"Received query for collection '{collection_name}': {data.query}")
+    query = data.query.strip()
+    if not query:
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
+    # The computation must see exactly what the key describes, or joined callers get another query's answer
+    data = data.model_copy(update={"query": query})
+    key = ("single", query, collection_name, data.mode, data.include_followups, data.thread_id)
+    with IN_FLIGHT.labels(endpoint="process_query").track_inprogress():
+        return await query_single_flight.do(key, lambda: _process_query(collection_name, data, client))
+
+async def _process_query(collection_name: str, data: QueryRequest, client):
+    query = data.query
+    if data.mode == "sql":
+        with observe_stage("process_query", "sql", collection_name):
+            return await answer_with_sql(query, [collection_name], data.include_followups, data.thread_id)
+
     try:
-        query_vector = await generate_query_embedding(query)
+        with observe_stage("process_query", "embed", collection_name):
+            query_vector = await generate_query_embedding(query)
 
         logger.info(f"Searching collection '{collection_name}'...")
-        search_results = client.search(
-            collection_name=collection_name,
-            query_vector=query_vector,
-            limit=5, # Number of results to fetch for context
-            with_payload=True
-        )
+        with observe_stage("process_query", "search", collection_name) as search_span:
+            search_results = client.search(
+                collection_name=collection_name,
+                query_vector=query_vector,
+                limit=5, # Number of results to fetch for context
+                with_payload=True
+            )
+            search_span.set(results=len(search_results))
         logger.info(f"Found {len(search_results)} results from '{collection_name}'.")
 
         if not search_results:
@@ -57,17 +144,21 @@ async def process_query(collection_name: str, data: QueryRequest, client = Depen
             logger.warning(f"No relevant documents found in {collection_name} for query. Asking LLM without context.")
             context = "No specific documents found." # Provide minimal context
             # Or comment out below and use return above if you prefer not to ask LLM
-            llm_answer = await ask_llm_with_context(query, context, SYSTEM_PROMPT)
-            return {"answer": llm_answer, "sources": []}
+            with observe_stage("process_query", "llm", collection_name):
+                answer = await answer_with_followups(query, context, SYSTEM_PROMPT, data.include_followups, data.thread_id)
+            return {**answer, "sources": []}
 
 
-        context = build_context(search_results)
+        with observe_stage("process_query", "context", collection_name) as context_span:
+            context = build_context(search_results)
+            context_span.set(characters=len(context))
         logger.debug(f"Built context for LLM: {context[:500]}...") # Log truncated context
 
-        llm_answer = await ask_llm_with_context(query, context, SYSTEM_PROMPT)
+        with observe_stage("process_query", "llm", collection_name):
+            answer = await answer_with_followups(query, context, SYSTEM_PROMPT, data.include_followups, data.thread_id)
         sources = list(set(res.payload.get('metadata', {}).get('source', 'Unknown') for res in search_results)) # Extract unique sources
 
-        return {"answer": llm_answer, "sources": sources}
+        return {**answer, "sources": sources}
 
     except Exception as e:
         logger.error(f"Error processing query for collection '{collection_name}': {e}", exc_info=True)
@@ -77,28 +168,44 @@ async def process_query(collection_name: str, data: QueryRequest, client = Depen
 @router.post("/ask/multi-collection")
 async def cross_collection_query(data: MultiCollectionRequest, client = Depends(get_db_client)):
     """Processes a query across multiple specified collections."""
-    query = data.query
-    collections_to_search = data.collections
-    logger.info(f"Received multi-collection query for {collections_to_search}: {query}")
-    if not query.strip():
+    logger.info(f"Received multi-collection query for {data.collections}: {data.query}")
+    query = data.query.strip()
+    if not query:
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
-    if not collections_to_search:
+    if not data.collections:
          raise HTTPException(status_code=400, detail="Collections list cannot be empty.")
 
+    # The computation must see exactly what the key describes, or joined callers get another query's answer
+    collections = sorted(set(data.collections))
+    data = data.model_copy(update={"query": query, "collections": collections})
+    key = ("multi", query, tuple(collections), data.mode, data.include_followups, data.thread_id)
+    with IN_FLIGHT.labels(endpoint="cross_collection_query").track_inprogress():
+        return await query_single_flight.do(key, lambda: _cross_collection_query(data, client))
+
+async def _cross_collection_query(data: MultiCollectionRequest, client):
+    query = data.query
+    collections_to_search = data.collections
+    if data.mode == "sql":
+        with observe_stage("cross_collection_query", "sql"):
+            return await answer_with_sql(query, collections_to_search, data.include_followups, data.thread_id)
+
     try:
-        query_vector = await generate_query_embedding(query)
+        with observe_stage("cross_collection_query", "embed"):
+            query_vector = await generate_query_embedding(query)
         all_results = []
         unique_sources = set()
 
         for collection_name in collections_to_search:
             try:
                 logger.info(f"Searching collection '{collection_name}'...")
-                results = client.search(
-                    collection_name=collection_name,
-                    query_vector=query_vector,
-                    limit=3, # Limit per collection
-                    with_payload=True
-                )
+                with observe_stage("cross_collection_query", "search", collection_name) as search_span:
+                    results = client.search(
+                        collection_name=collection_name,
+                        query_vector=query_vector,
+                        limit=3, # Limit per collection
+                        with_payload=True
+                    )
+                    search_span.set(results=len(results))
                 all_results.extend(results)
                 logger.info(f"Found {len(results)} results from '{collection_name}'.")
                 for res in results:
@@ -110,17 +217,21 @@ async def cross_collection_query(data: MultiCollectionRequest, client = Depends(
         if not all_results:
             logger.warning(f"No relevant documents found across specified collections. Asking LLM without context.")
             context = "No specific documents found in the requested collections."
-            llm_answer = await ask_llm_with_context(query, context, SYSTEM_PROMPT)
-            return {"answer": llm_answer, "sources": list(collections_to_search)} # Indicate searched collections
+            with observe_stage("cross_collection_query", "llm"):
+                answer = await answer_with_followups(query, context, SYSTEM_PROMPT, data.include_followups, data.thread_id)
+            return {**answer, "sources": list(collections_to_search)} # Indicate searched collections
 
         # Optional: Add reranking/sorting logic here if needed across collections
         # For now, just combine context
-        context = build_context(all_results)
+        with observe_stage("cross_collection_query", "context") as context_span:
+            context = build_context(all_results)
+            context_span.set(characters=len(context), results=len(all_results))
         logger.debug(f"Built context for LLM from multi-collection: {context[:500]}...")
 
-        llm_answer = await ask_llm_with_context(query, context, SYSTEM_PROMPT)
+        with observe_stage("cross_collection_query", "llm"):
+            answer = await answer_with_followups(query, context, SYSTEM_PROMPT, data.include_followups, data.thread_id)
 
-        return {"answer": llm_answer, "sources": list(unique_sources)}
+        return {**answer, "sources": list(unique_sources)}
 
     except Exception as e:
         logger.error(f"Error processing multi-collection query: {e}", exc_info=True)
@@ -134,11 +245,16 @@ async def query_all_collections(data: QueryRequest, client = Depends(get_db_clie
     if not query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
+    if data.mode == "sql":
+        return await answer_with_sql(query, include_followups=data.include_followups, thread_id=data.thread_id)
+
     try:
-        # Get all collection names
+        # Get all collection names (from the file catalog when it has entries)
         try:
-             collections_response = client.get_collections()
-             all_collection_names = [c.name for c in collections_response.collections]
+             all_collection_names = await asyncio.to_thread(catalog_collections)
+             if not all_collection_names:
+                 collections_response = client.get_collections()
+                 all_collection_names = [c.name for c in collections_response.collections if not c.name.startswith("chat4ba_")]
              logger.info(f"Found collections: {all_collection_names}")
         except Exception as e:
              logger.error(f"Failed to retrieve collection list from Qdrant: {e}")
@@ -148,7 +264,10 @@ async def query_all_collections(data: QueryRequest, client = Depends(get_db_clie
              raise HTTPException(status_code=404, detail="No collections found in Qdrant.")
 
         # Use the multi-collection logic
-        multi_request_data = MultiCollectionRequest(query=query, collections=all_collection_names)
+        multi_request_data = MultiCollectionRequest(
+            query=query, collections=all_collection_names,
+            include_followups=data.include_followups, thread_id=data.thread_id
+        )
         return await cross_collection_query(multi_request_data, client)
 
     except HTTPException as he:
@@ -158,3 +277,85 @@ async def query_all_collections(data: QueryRequest, client = Depends(get_db_clie
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
+async def _answer_batch_item(index: int, query: str, query_vector: List[float], collections: List[str],
+                             client, llm_semaphore: asyncio.Semaphore) -> Dict:
+    """Searches all collections concurrently for one batch question, then answers it under the LLM semaphore."""
+    limit = 5 if len(collections) == 1 else 3 # Same per-collection limits as the single/multi endpoints
+    with span("batch_query.search", index=index, collections=len(collections)):
+        searches = await asyncio.gather(*(
+            asyncio.to_thread(client.search, collection_name=name, query_vector=query_vector, limit=limit, with_payload=True)
+            for name in collections
+        ), return_exceptions=True)
+
+    all_results = []
+    for name, results in zip(collections, searches):
+        if isinstance(results, Exception):
+            logger.warning(f"Could not search collection '{name}' for batch item {index}: {results}")
+            continue
+        all_results.extend(results)
+
+    context = build_context(all_results) if all_results else "No specific documents found in the requested collections."
+    async with llm_semaphore:
+        with span("batch_query.llm", index=index, characters=len(context)):
+            llm_answer = await ask_llm_with_context(query, context, SYSTEM_PROMPT)
+    sources = list(set(res.payload.get('metadata', {}).get('source', 'Unknown') for res in all_results))
+    return {"index": index, "query": query, "answer": llm_answer, "sources": sources}
+
+@router.post("/ask/batch")
+async def batch_query(data: BatchQueryRequest, client = Depends(get_db_client)):
+    """
+    Answers many queries in one request. All queries are embedded in a single
+    batched call, searches run concurrently and LLM calls are bounded by
+    BATCH_LLM_CONCURRENCY. Results stream back as NDJSON in completion order.
+    """
+    queries = data.queries
+    logger.info(f"Received batch of {len(queries)} queries for collections {data.collections}")
+    if not queries:
+        raise HTTPException(status_code=400, detail="Queries list cannot be empty.")
+    if any(not q.strip() for q in queries):
+        raise HTTPException(status_code=400, detail="Queries cannot be empty.")
+    if not data.collections:
+        raise HTTPException(status_code=400, detail="Collections list cannot be empty.")
+    if len(queries) > settings.BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {settings.BATCH_MAX_QUERIES} queries.")
+
+    try:
+        # One embeddings round trip for the whole batch
+        with span("batch_query.embed", queries=len(queries)):
+            query_vectors = await generate_document_embeddings(queries, Priority.INTERACTIVE)
+    except Exception as e:
+        logger.error(f"Error embedding batch queries: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    if len(query_vectors) != len(queries):
+        raise HTTPException(status_code=500, detail="Embedding count mismatch for batch queries.")
+
+    llm_semaphore = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+
+    async def stream_results():
+        tasks = {
+            asyncio.create_task(_answer_batch_item(i, q, v, data.collections, client, llm_semaphore)): (i, q)
+            for i, (q, v) in enumerate(zip(queries, query_vectors))
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, query = tasks[task]
+                    try:
+                        item = task.result()
+                    except Exception as e:
+                        logger.error(f"Error answering batch item {index}: {e}", exc_info=True)
+                        item = {"index": index, "query": query, "error": str(e)}
+                    yield dumps_ndjson_line(item)
+        finally:
+            # Client disconnected or generator closed early: stop remaining work
+            for task in pending:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.get("/stats")
+async def get_query_stats():
+    """Returns query coalescing counters (executed, coalesced and in-flight computations)."""
+    return {"single_flight": query_single_flight.stats()}
@@ -2,11 +2,13 @@
 import os
 import shutil
 import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Query, Request
 from typing import List
 import logging
 from src.processing.file_processor import FileProcessor
 from src.llm.providers.azure_openai import AzureOpenAIProvider, get_azure_provider
+from src.utils.tracing import traced
+from src.utils.profiling import require_profiling_admin
 
 UPLOAD_DIR = "./uploaded_files_temp"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -15,11 +17,13 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 file_processor = FileProcessor()
 
-async def process_file_background(file_path: str, original_file_name: str, provider: AzureOpenAIProvider):
+@traced("process_file_background")
+async def process_file_background(file_path: str, original_file_name: str, provider: AzureOpenAIProvider,
+                                  memory_snapshots: bool = False):
     """Task to process a single file in the background."""
     logger.info(f"[Background] Starting processing for '{original_file_name}' from path {file_path}")
     try:
-        result = await file_processor.process_and_store(file_path, original_file_name, provider)
+        result = await file_processor.process_and_store(file_path, original_file_name, provider, memory_snapshots)
         logger.info(f"[Background] Finished processing for '{original_file_name}'. Result: {result}")
     except Exception as e:
         logger.error(f"[Background] Processing failed for '{original_file_name}': {str(e)}", exc_info=True)
@@ -32,15 +36,21 @@ async def process_file_background(file_path: str, original_file_name: str, provi
                 logger.error(f"[Background] Error deleting temporary file {file_path}: {e_del}")
 
 @router.post("/upload/")
+@traced("upload_and_process_files")
 async def upload_and_process_files(
+    request: Request,
     background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
+    memory_profile: bool = Query(False, description="Store tracemalloc snapshots per stage (admins only)"),
     azure_provider: AzureOpenAIProvider = Depends(get_azure_provider)
 ):
     """
     Handles multiple file uploads, validates them, and queues background
-    processing for each valid file.
+    processing for each valid file. With `memory_profile`, the memory profile
+    ID of each file is logged when its processing finishes.
     """
+    if memory_profile:
+        require_profiling_admin(request)
     allowed_extensions = {".csv", ".xlsx", ".xls"}
     files_queued_for_processing = []
     file_errors = []
@@ -73,7 +83,8 @@ async def upload_and_process_files(
                 process_file_background,
                 file_path,
                 original_filename,
-                azure_provider
+                azure_provider,
+                memory_profile
             )
             files_queued_for_processing.append(original_filename)
             logger.info(f"Queued background processing for '{original_filename}'.")
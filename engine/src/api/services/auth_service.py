@@ -1,19 +1,22 @@
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from typing import Optional
 from src.database.relational.crud.user import get_or_create_user
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from src.config.settings import settings
+from src.api.services.google_oauth import verify_id_token
 
 class AuthService:
-    def __init__(self, client_id: str = settings.GOOGLE_CLIENT_ID):
-        self.client_id = client_id
+    def __init__(self, client_id: Optional[str] = None):
+        self._client_id = client_id
+
+    @property
+    def client_id(self) -> str:
+        return self._client_id or settings.GOOGLE_CLIENT_ID
 
     def verify_google_token(self, token: str, db: Session) -> dict:
         try:
-            idinfo = id_token.verify_oauth2_token(token, requests.Request(), self.client_id)
-            if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
-                raise ValueError('Wrong issuer.')
+            # Signing certificates are cached per their Cache-Control header
+            idinfo = verify_id_token(token, self.client_id)
             user_data = {
                 'sub': idinfo['sub'],
                 'email': idinfo['email'],
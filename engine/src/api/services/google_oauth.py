@@ -0,0 +1,164 @@
+"""
+Google OAuth helpers on pooled HTTP clients.
+
+The authorization-code exchange and userinfo lookup use one shared
+httpx.AsyncClient, so logins do not block FastAPI's threadpool. ID token
+verification uses Google's signing certificates, cached for as long as their
+Cache-Control header allows and refetched early only when a token is signed by
+a key that is not in the cache (key rotation), at most once per
+CERT_REFETCH_MIN_INTERVAL_SECONDS so forged key IDs cannot trigger a fetch each.
+"""
+import logging
+import re
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlencode
+import httpx
+from src.config.settings import settings
+from src.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_AUTHORIZATION_URL = "https://accounts.google.com/o/oauth2/v2/auth"
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+GOOGLE_USERINFO_URL = "https://openidconnect.googleapis.com/v1/userinfo"
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+SCOPE = [
+    "openid",
+    "https://www.googleapis.com/auth/userinfo.email",
+    "https://www.googleapis.com/auth/userinfo.profile"
+]
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+CERT_REFETCH_MIN_INTERVAL_SECONDS = 60.0
+
+
+def cache_ttl(headers) -> float:
+    """Seconds a response may be reused for, from Cache-Control max-age minus Age (0 if not cacheable)."""
+    cache_control = headers.get("cache-control", "").lower()
+    match = _MAX_AGE_RE.search(cache_control)
+    if not match or "no-store" in cache_control or "no-cache" in cache_control:
+        return 0.0
+    try:
+        age = int(headers.get("age", 0))
+    except ValueError:
+        age = 0
+    return max(0.0, float(match.group(1)) - age)
+
+
+# --- Shared clients ---
+_async_client: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[httpx.Client] = None
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(timeout=settings.GOOGLE_HTTP_TIMEOUT_SECONDS)
+    return _async_client
+
+def get_sync_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = httpx.Client(timeout=settings.GOOGLE_HTTP_TIMEOUT_SECONDS)
+    return _sync_client
+
+async def close_google_clients():
+    """Closes the pooled clients (on application shutdown)."""
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+
+
+# --- Authorization code flow ---
+def check_oauth_config():
+    for name in ("GOOGLE_CLIENT_ID", "GOOGLE_REDIRECT_URI"):
+        if not getattr(settings, name):
+            raise ValueError(f"{name} is not set")
+
+
+def build_authorization_url(state: str) -> str:
+    check_oauth_config()
+    params = {
+        "response_type": "code",
+        "client_id": settings.GOOGLE_CLIENT_ID,
+        "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+        "scope": " ".join(SCOPE),
+        "state": state,
+        "access_type": "offline",  # Enable refresh tokens
+        "prompt": "select_account consent",  # Force consent screen
+        "include_granted_scopes": "true",  # Enable incremental authorization
+    }
+    return f"{GOOGLE_AUTHORIZATION_URL}?{urlencode(params)}"
+
+
+async def exchange_code(code: str) -> Dict:
+    """Exchanges an authorization code for Google tokens."""
+    check_oauth_config()
+    response = await get_async_client().post(GOOGLE_TOKEN_URL, data={
+        "grant_type": "authorization_code",
+        "code": code,
+        "client_id": settings.GOOGLE_CLIENT_ID,
+        "client_secret": settings.GOOGLE_CLIENT_SECRET,
+        "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+async def fetch_userinfo(access_token: str) -> Dict:
+    response = await get_async_client().get(GOOGLE_USERINFO_URL, headers={"Authorization": f"Bearer {access_token}"})
+    response.raise_for_status()
+    return response.json()
+
+
+# --- ID token verification ---
+class GoogleCertCache:
+    """Google's ID token signing certificates, reused until their Cache-Control expiry."""
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL):
+        self.url = url
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self, key_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        Returns the certificates, refetching when expired or when `key_id` is
+        unknown. Unknown key IDs trigger at most one early refetch per
+        CERT_REFETCH_MIN_INTERVAL_SECONDS; in between, the cached certificates are
+        returned and the token fails verification.
+        """
+        with self._lock:
+            now = time.monotonic()
+            expired = now >= self._expires_at
+            unknown_key = key_id is not None and key_id not in self._certs
+            refetch_allowed = self._fetched_at is None or now - self._fetched_at >= CERT_REFETCH_MIN_INTERVAL_SECONDS
+            fetch = expired or (unknown_key and refetch_allowed)
+            record_cache("google_certs", hit=not fetch)
+            if fetch:
+                response = get_sync_client().get(self.url)
+                response.raise_for_status()
+                self._certs = response.json()
+                self._fetched_at = time.monotonic()
+                self._expires_at = self._fetched_at + cache_ttl(response.headers)
+                logger.info(f"Fetched {len(self._certs)} Google certificates (cached for {self._expires_at - time.monotonic():.0f}s).")
+            return self._certs
+
+
+_cert_cache = GoogleCertCache()
+
+def verify_id_token(token: str, audience: str) -> Dict:
+    """Verifies a Google ID token's signature, audience, expiry and issuer; returns its claims."""
+    from google.auth import jwt
+
+    key_id = jwt.decode_header(token).get("kid")
+    claims = jwt.decode(token, certs=_cert_cache.get(key_id), audience=audience)
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError("Wrong issuer.")
+    return claims
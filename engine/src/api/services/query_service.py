@@ -0,0 +1,88 @@
+"""
+Shared helpers for answering queries and suggesting follow-up questions
+"""
+import re
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+from src.llm.providers.azure_openai import ask_llm_with_context
+from src.prompts.system.system_prompt import FOLLOWUP_MARKER, FOLLOWUP_INSTRUCTIONS
+from src.api.services.thread_memory import get_thread_memory
+
+logger = logging.getLogger(__name__)
+
+def split_answer_and_followups(text: str) -> Tuple[str, Optional[List[str]]]:
+    """
+    Splits a fused LLM response into the answer and its follow-up questions.
+    Returns None for the follow-ups if the marker or a JSON array is missing.
+    """
+    answer, marker, tail = text.partition(FOLLOWUP_MARKER)
+    if not marker:
+        return text.strip(), None
+    json_match = re.search(r'\[.*\]', tail, re.DOTALL)
+    if not json_match:
+        return answer.strip(), None
+    try:
+        followups = [str(q) for q in json.loads(json_match.group()) if str(q).strip()]
+    except json.JSONDecodeError:
+        return answer.strip(), None
+    return answer.strip(), followups or None
+
+async def answer_with_followups(query: str, context: str, system_prompt: str, include_followups: bool = False,
+                                thread_id: Optional[str] = None, memory: Optional[str] = None) -> Dict:
+    """
+    Answers a query from context. With `include_followups`, follow-up questions
+    are requested in the same LLM call; only if the response does not contain
+    them is a separate follow-up call made. With `thread_id`, the thread's
+    bounded conversation memory is prepended to the context; callers that
+    already loaded it pass it as `memory` instead.
+    """
+    if memory is None and thread_id:
+        memory = await get_thread_memory(thread_id)
+    if memory:
+        context = f"{memory}\n\n---\n\n{context}"
+
+    if not include_followups:
+        return {"answer": await ask_llm_with_context(query, context, system_prompt)}
+
+    response_text = await ask_llm_with_context(query, context, system_prompt + FOLLOWUP_INSTRUCTIONS)
+    answer, followups = split_answer_and_followups(response_text)
+    if followups is None:
+        logger.warning("Fused response did not contain follow-ups; generating them separately.")
+        followups = await generate_followup_suggestions(query, answer)
+    return {"answer": answer, "followups": followups}
+
+async def generate_followup_suggestions(question: str, answer: str) -> List[str]:
+    """Generate follow-up question suggestions based on the current Q&A"""
+    try:
+        # Create a prompt for the LLM
+        prompt = f"""Based on this question: "{question}" 
+        and this answer: "{answer[:500]}..." (truncated),
+        suggest 3 relevant follow-up questions the user might want to ask next.
+        Format as a JSON array of strings."""
+        
+        context = "Generate follow-up questions for the user based on the conversation."
+        system_prompt = """You are a helpful AI assistant that suggests relevant follow-up questions.
+        Always respond with valid JSON as an array of strings: ["question 1", "question 2", "question 3"]"""
+        
+        # Get response from LLM
+        response_text = await ask_llm_with_context(prompt, context, system_prompt)
+        
+        # Extract JSON from response
+        json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group())
+        
+        # Fallback
+        return [
+            "Can you explain more about this topic?",
+            "How does this relate to the rest of my data?",
+            "What actions should I take based on this information?"
+        ]
+    except Exception as e:
+        logger.error(f"Error generating follow-up questions: {e}")
+        return [
+            "Can you elaborate on that?",
+            "What else can you tell me about this?",
+            "How can I use this information?"
+        ]
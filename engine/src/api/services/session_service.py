@@ -2,16 +2,19 @@ import jwt
 import secrets
 from datetime import datetime, timedelta
 from typing import Dict, Optional
-from fastapi import HTTPException
+from fastapi import HTTPException, Request
 from src.config.settings import settings
 
 class SessionService:
     def __init__(self):
-        # In production, use a proper secret key from environment variables
-        self.secret_key = getattr(settings, 'JWT_SECRET_KEY', 'your-secret-key-change-in-production')
         self.algorithm = "HS256"
         self.access_token_expire_minutes = 30
 
+    @property
+    def secret_key(self) -> str:
+        # In production, use a proper secret key from environment variables
+        return getattr(settings, 'JWT_SECRET_KEY', 'your-secret-key-change-in-production')
+
     def create_user_session(self, user_id: int, email: str, role: str) -> Dict[str, str]:
         """
         Create a secure session for the user after successful authentication
@@ -92,3 +95,12 @@ class SessionService:
             "role": role
         }
 
+def get_admin_user(request: Request) -> Dict:
+    """FastAPI dependency: the user of the bearer token, which must have the admin role."""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
+    user = SessionService().get_current_user_from_token(auth_header.split(" ")[1])
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return user
@@ -0,0 +1,155 @@
+"""
+Bounded conversation memory for thread-aware questions.
+
+Each prompt gets the thread's rolling summary plus its last
+THREAD_MEMORY_RECENT_MESSAGES messages verbatim (each capped), so prompt size
+stays bounded however long the thread grows. Older messages are folded into the
+summary incrementally, in the background, once enough of them have accumulated;
+until then the newest of them are included as well, within
+THREAD_MEMORY_UNSUMMARIZED_CHARS.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Set
+from src.config.settings import settings
+from src.database.relational.connection import SessionLocal
+from src.database.relational.crud.thread import (
+    get_recent_messages, count_messages_between, get_messages_between, get_summary, save_summary, get_messages
+)
+from src.llm.providers.azure_openai import ask_llm_with_context
+from src.llm.scheduler import Priority
+from src.prompts.system.system_prompt import THREAD_SUMMARY_PROMPT
+from src.utils.helpers import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# At most one summary refresh runs per thread at a time
+summary_single_flight = SingleFlight("thread-summary")
+_background_refreshes: Set[asyncio.Task] = set()
+
+
+def _format_message(role: str, content: str, max_chars: int) -> str:
+    if len(content) > max_chars:
+        content = content[:max_chars] + " [...]"
+    return f"{role.capitalize()}: {content}"
+
+
+def _fit_to_budget(messages: List[str], max_chars: int) -> List[str]:
+    """The newest messages whose combined length fits in `max_chars`, oldest first."""
+    kept, used = [], 0
+    for message in reversed(messages):
+        if used + len(message) > max_chars:
+            break
+        kept.append(message)
+        used += len(message) + 1
+    return kept[::-1]
+
+
+def _load_memory(thread_id: str) -> Dict:
+    """
+    Reads the summary, the recent messages and the older messages the summary
+    does not cover yet (the gap), with the size of that gap.
+    """
+    db = SessionLocal()
+    try:
+        summary = get_summary(db, thread_id)
+        recent = get_recent_messages(db, thread_id, settings.THREAD_MEMORY_RECENT_MESSAGES)
+        summarized_through = summary.summarized_through_id if summary else 0
+        unsummarized = count_messages_between(db, thread_id, summarized_through, recent[0].id) if recent else 0
+        gap = []
+        if unsummarized:
+            # Newest first up to the batch size; the budget below trims further
+            gap = [
+                _format_message(m.role, m.content, settings.THREAD_MEMORY_MESSAGE_CHARS)
+                for m in get_messages_between(db, thread_id, summarized_through, recent[0].id,
+                                              settings.THREAD_SUMMARY_BATCH_MESSAGES)
+            ]
+        return {
+            "summary": summary.summary if summary else "",
+            "unsummarized_messages": _fit_to_budget(gap, settings.THREAD_MEMORY_UNSUMMARIZED_CHARS),
+            "recent": [
+                _format_message(m.role, m.content, settings.THREAD_MEMORY_MESSAGE_CHARS)
+                for m in recent
+            ],
+            "unsummarized": unsummarized,
+        }
+    finally:
+        db.close()
+
+
+async def get_thread_memory(thread_id: str) -> str:
+    """
+    Returns the conversation memory for a prompt and schedules a summary
+    refresh when older messages are waiting to be summarized.
+    """
+    memory = await asyncio.to_thread(_load_memory, thread_id)
+    if memory["unsummarized"] >= settings.THREAD_SUMMARY_REFRESH_MESSAGES:
+        schedule_summary_refresh(thread_id)
+
+    parts = []
+    if memory["summary"]:
+        parts.append(f"Summary of the earlier conversation:\n{memory['summary']}")
+    if memory["unsummarized_messages"]:
+        omitted = memory["unsummarized"] - len(memory["unsummarized_messages"])
+        header = "Earlier messages" + (f" ({omitted} older ones omitted)" if omitted else "")
+        parts.append(f"{header}:\n" + "\n".join(memory["unsummarized_messages"]))
+    if memory["recent"]:
+        parts.append("Most recent messages:\n" + "\n".join(memory["recent"]))
+    return "\n\n".join(parts)
+
+
+def schedule_summary_refresh(thread_id: str):
+    task = asyncio.ensure_future(summary_single_flight.do(thread_id, lambda: refresh_thread_summary(thread_id)))
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
+
+
+def _next_batch(thread_id: str) -> Dict:
+    """The current summary and the next batch of older messages it does not cover yet."""
+    db = SessionLocal()
+    try:
+        summary = get_summary(db, thread_id)
+        recent = get_recent_messages(db, thread_id, settings.THREAD_MEMORY_RECENT_MESSAGES)
+        summarized_through = summary.summarized_through_id if summary else 0
+        batch = get_messages(db, thread_id, after_id=summarized_through, limit=settings.THREAD_SUMMARY_BATCH_MESSAGES)
+        # Messages still in the verbatim window are summarized later, once they leave it
+        first_recent_id = recent[0].id if recent else None
+        batch = [m for m in batch if first_recent_id is None or m.id < first_recent_id]
+        return {
+            "summary": summary.summary if summary else "",
+            "messages": [(m.id, _format_message(m.role, m.content, settings.THREAD_MEMORY_MESSAGE_CHARS)) for m in batch],
+        }
+    finally:
+        db.close()
+
+
+def _save(thread_id: str, summary: str, through_id: int):
+    db = SessionLocal()
+    try:
+        save_summary(db, thread_id, summary, through_id)
+    finally:
+        db.close()
+
+
+async def refresh_thread_summary(thread_id: str):
+    """Folds the older messages not yet covered into the rolling summary, one batch per LLM call."""
+    try:
+        while True:
+            batch = await asyncio.to_thread(_next_batch, thread_id)
+            if not batch["messages"]:
+                return
+            context = (
+                f"Current summary:\n{batch['summary'] or '(none)'}\n\n"
+                "New messages:\n" + "\n".join(text for _, text in batch["messages"])
+            )
+            summary = await ask_llm_with_context(
+                "Update the conversation summary.",
+                context,
+                THREAD_SUMMARY_PROMPT.format(max_chars=settings.THREAD_SUMMARY_MAX_CHARS),
+                Priority.THREAD_SUMMARY
+            )
+            through_id = batch["messages"][-1][0]
+            await asyncio.to_thread(_save, thread_id, summary.strip()[:settings.THREAD_SUMMARY_MAX_CHARS], through_id)
+            logger.info(f"Summarized {len(batch['messages'])} messages of thread {thread_id} (through message {through_id}).")
+    except Exception as e:
+        logger.error(f"Failed to refresh summary of thread {thread_id}: {e}")
@@ -0,0 +1,365 @@
+"""
+Thread storage: thread metadata lives in the Qdrant thread collection (one point
+per thread, vector = title embedding) and messages in an append-only SQL table.
+"""
+import json
+import base64
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from src.database.relational.connection import SessionLocal
+from src.database.relational.crud.thread import append_messages, append_missing_messages, get_messages, count_messages, get_message_stats
+from src.config.settings import settings
+from src.llm.providers.azure_openai import generate_document_embeddings, generate_query_embedding
+from src.llm.scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+THREAD_COLLECTION = "chat4ba_threads"
+THREAD_MESSAGE_COLLECTION = "chat4ba_thread_messages"  # One point per message, for semantic thread search
+MAX_EMBEDDED_MESSAGE_CHARS = 8000
+THREAD_SUMMARY_FIELDS = ["title", "created_at", "updated_at", "associated_files"]  # Payload keys listed per thread
+LAST_MESSAGE_PREVIEW_CHARS = 200
+
+
+def message_to_dict(record) -> Dict[str, Any]:
+    return {
+        "id": record.id,
+        "role": record.role,
+        "content": record.content,
+        "timestamp": record.timestamp.isoformat() if record.timestamp else None,
+    }
+
+
+def append_thread_messages(thread_id: str, messages: List[Dict]) -> List[Dict]:
+    if not messages:
+        return []
+    db = SessionLocal()
+    try:
+        return [message_to_dict(r) for r in append_messages(db, thread_id, messages)]
+    finally:
+        db.close()
+
+
+def sync_thread_messages(thread_id: str, messages: List[Dict]) -> List[Dict]:
+    """Appends the messages of a full thread history that are not stored yet (idempotent)."""
+    db = SessionLocal()
+    try:
+        return [message_to_dict(r) for r in append_missing_messages(db, thread_id, messages)]
+    finally:
+        db.close()
+
+
+def get_thread_messages(thread_id: str, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Dict]:
+    db = SessionLocal()
+    try:
+        return [message_to_dict(r) for r in get_messages(db, thread_id, after_id, limit)]
+    finally:
+        db.close()
+
+
+def count_thread_messages(thread_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return count_messages(db, thread_id)
+    finally:
+        db.close()
+
+
+def migrate_payload_messages(client, thread_id: str, payload: Dict) -> Tuple[Dict, List[Dict]]:
+    """
+    Moves messages still embedded in a thread point's payload (threads created
+    before messages moved to SQL) into the message table. Returns the payload
+    without them and the messages it stored, which still need indexing for search.
+    """
+    if "messages" not in payload:
+        return payload, []
+    payload = dict(payload)
+    legacy_messages = payload.pop("messages") or []
+    migrated = sync_thread_messages(thread_id, legacy_messages) if legacy_messages else []
+    if migrated:
+        logger.info(f"Migrated {len(migrated)} messages of thread {thread_id} to the message table.")
+    client.delete_payload(collection_name=THREAD_COLLECTION, keys=["messages"], points=[thread_id])
+    return payload, migrated
+
+
+def get_thread_point(client, thread_id: str):
+    points = client.retrieve(collection_name=THREAD_COLLECTION, ids=[thread_id], with_payload=True, with_vectors=False)
+    return points[0] if points else None
+
+
+def ensure_thread_collections(client):
+    """Creates the thread and thread message collections and their payload indexes if missing."""
+    if THREAD_COLLECTION not in [c.name for c in client.get_collections().collections]:
+        client.create_collection(
+            collection_name=THREAD_COLLECTION,
+            vectors_config={
+                "size": settings.EMBEDDING_DIMENSION,  # Thread vectors are title embeddings
+                "distance": "Cosine"
+            }
+        )
+    ensure_thread_indexes(client)
+    ensure_thread_message_collection(client)
+
+
+def ensure_thread_indexes(client):
+    """Datetime index on updated_at, required to list threads with order_by."""
+    from qdrant_client import models
+
+    client.create_payload_index(
+        collection_name=THREAD_COLLECTION,
+        field_name="updated_at",
+        field_schema=models.PayloadSchemaType.DATETIME,
+        wait=True
+    )
+
+
+def encode_thread_cursor(updated_at: str, seen_ids: List[str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"updated_at": updated_at, "seen_ids": seen_ids}).encode()).decode()
+
+
+def decode_thread_cursor(cursor: str) -> Dict[str, Any]:
+    """Raises ValueError for malformed cursors."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return {"updated_at": str(position["updated_at"]), "seen_ids": list(position.get("seen_ids", []))}
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+
+def get_thread_stats(thread_ids: List[str]) -> Dict[str, Dict]:
+    db = SessionLocal()
+    try:
+        stats = get_message_stats(db, thread_ids)
+    finally:
+        db.close()
+    return {
+        thread_id: {
+            "message_count": s["message_count"],
+            "last_message": {
+                "role": s["last_message"].role,
+                "content": s["last_message"].content[:LAST_MESSAGE_PREVIEW_CHARS],
+                "timestamp": s["last_message"].timestamp.isoformat() if s["last_message"].timestamp else None,
+            },
+        }
+        for thread_id, s in stats.items()
+    }
+
+
+def get_legacy_thread_stats(client, thread_ids: List[str]) -> Dict[str, Dict]:
+    """Stats of threads whose messages are still in the Qdrant payload (not migrated to SQL yet)."""
+    if not thread_ids:
+        return {}
+    points = client.retrieve(collection_name=THREAD_COLLECTION, ids=thread_ids, with_payload=["messages"], with_vectors=False)
+    stats = {}
+    for p in points:
+        messages = (p.payload or {}).get("messages")
+        if not messages:
+            continue
+        last = messages[-1]
+        stats[str(p.id)] = {
+            "message_count": len(messages),
+            "last_message": {
+                "role": last.get("role"),
+                "content": (last.get("content") or "")[:LAST_MESSAGE_PREVIEW_CHARS],
+                "timestamp": last.get("timestamp"),
+            },
+        }
+    return stats
+
+
+def list_thread_summaries(client, cursor: Optional[str], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Lists threads newest-first by updated_at using keyset pagination: the cursor
+    holds the last updated_at returned plus the ids already returned at exactly
+    that timestamp, so ties are neither skipped nor repeated.
+    Returns the thread summaries and the cursor of the next page (None at the end).
+    """
+    from qdrant_client import models
+
+    conditions, excluded = [], []
+    if cursor:
+        position = decode_thread_cursor(cursor)
+        conditions.append(models.FieldCondition(key="updated_at", range=models.DatetimeRange(lte=position["updated_at"])))
+        excluded = position["seen_ids"]
+
+    points, _ = client.scroll(
+        collection_name=THREAD_COLLECTION,
+        scroll_filter=models.Filter(
+            must=conditions or None,
+            must_not=[models.HasIdCondition(has_id=excluded)] if excluded else None
+        ),
+        order_by=models.OrderBy(key="updated_at", direction=models.Direction.DESC),
+        limit=limit + 1,  # One extra point tells whether another page exists
+        with_payload=THREAD_SUMMARY_FIELDS,
+        with_vectors=False
+    )
+    has_more = len(points) > limit
+    points = points[:limit]
+
+    stats = get_thread_stats([str(p.id) for p in points])
+    stats.update(get_legacy_thread_stats(client, [str(p.id) for p in points if str(p.id) not in stats]))
+    summaries = [
+        {
+            "id": str(p.id),
+            **{field: p.payload.get(field) for field in THREAD_SUMMARY_FIELDS},
+            "message_count": stats.get(str(p.id), {}).get("message_count", 0),
+            "last_message": stats.get(str(p.id), {}).get("last_message"),
+        }
+        for p in points
+    ]
+
+    next_cursor = None
+    if has_more and summaries:
+        last_updated_at = summaries[-1]["updated_at"]
+        # Carry over ids seen at the same timestamp on earlier pages
+        carried = excluded if cursor and position["updated_at"] == last_updated_at else []
+        next_cursor = encode_thread_cursor(
+            last_updated_at,
+            carried + [s["id"] for s in summaries if s["updated_at"] == last_updated_at]
+        )
+    return summaries, next_cursor
+
+
+def ensure_thread_message_collection(client):
+    """Creates the message embedding collection with a keyword index on thread_id for group-by."""
+    from qdrant_client import models
+
+    if THREAD_MESSAGE_COLLECTION not in [c.name for c in client.get_collections().collections]:
+        client.create_collection(
+            collection_name=THREAD_MESSAGE_COLLECTION,
+            vectors_config=models.VectorParams(size=settings.EMBEDDING_DIMENSION, distance=models.Distance.COSINE)
+        )
+    client.create_payload_index(
+        collection_name=THREAD_MESSAGE_COLLECTION,
+        field_name="thread_id",
+        field_schema=models.PayloadSchemaType.KEYWORD,
+        wait=True
+    )
+
+
+async def index_thread_messages(client, thread_id: str, messages: List[Dict]):
+    """
+    Embeds newly appended messages in one batched call and upserts one point per
+    message (point id = message id). Runs in the background after an append, so
+    existing messages are never re-embedded.
+    """
+    from qdrant_client import models
+
+    messages = [m for m in messages if m["content"].strip()]
+    if not messages:
+        return
+    try:
+        vectors = await generate_document_embeddings(
+            [m["content"][:MAX_EMBEDDED_MESSAGE_CHARS] for m in messages], Priority.INGESTION
+        )
+        client.upsert(
+            collection_name=THREAD_MESSAGE_COLLECTION,
+            points=[
+                models.PointStruct(
+                    id=m["id"],
+                    vector=vector,
+                    payload={"thread_id": thread_id, "message_id": m["id"], "role": m["role"],
+                             "content": m["content"], "timestamp": m["timestamp"]}
+                )
+                for m, vector in zip(messages, vectors)
+            ],
+            wait=False
+        )
+        logger.info(f"Indexed {len(messages)} messages of thread {thread_id} for search.")
+    except Exception as e:
+        logger.error(f"Failed to index messages of thread {thread_id}: {e}")
+
+
+async def search_threads(client, query: str, limit: int, matches_per_thread: int) -> List[Dict]:
+    """
+    Finds the threads whose messages best match `query`, using Qdrant group-by on
+    thread_id so each thread appears once with its best matching messages.
+    """
+    query_vector = await generate_query_embedding(query)
+    groups = client.query_points_groups(
+        collection_name=THREAD_MESSAGE_COLLECTION,
+        query=query_vector,
+        group_by="thread_id",
+        limit=limit,
+        group_size=matches_per_thread,
+        with_payload=True
+    ).groups
+    if not groups:
+        return []
+
+    threads = client.retrieve(
+        collection_name=THREAD_COLLECTION,
+        ids=[g.id for g in groups],
+        with_payload=["title", "updated_at"],
+        with_vectors=False
+    )
+    thread_payloads = {str(t.id): t.payload for t in threads}
+    return [
+        {
+            "thread_id": str(g.id),
+            "title": thread_payloads.get(str(g.id), {}).get("title"),
+            "updated_at": thread_payloads.get(str(g.id), {}).get("updated_at"),
+            "score": g.hits[0].score if g.hits else None,
+            "matches": [
+                {
+                    "message_id": hit.payload.get("message_id"),
+                    "role": hit.payload.get("role"),
+                    "content": hit.payload.get("content", "")[:LAST_MESSAGE_PREVIEW_CHARS],
+                    "timestamp": hit.payload.get("timestamp"),
+                    "score": hit.score,
+                }
+                for hit in g.hits
+            ],
+        }
+        for g in groups
+        if str(g.id) in thread_payloads  # Skip messages of deleted threads
+    ]
+
+
+def _unindexed_messages(client, thread_id: str) -> List[Dict]:
+    """Stored messages of a thread that have no point in the message collection yet."""
+    from qdrant_client import models
+
+    stored = count_thread_messages(thread_id)
+    indexed = client.count(
+        collection_name=THREAD_MESSAGE_COLLECTION,
+        count_filter=models.Filter(must=[models.FieldCondition(key="thread_id", match=models.MatchValue(value=thread_id))]),
+        exact=True
+    ).count
+    if indexed >= stored:
+        return []
+    messages = get_thread_messages(thread_id)
+    present = {p.id for p in client.retrieve(collection_name=THREAD_MESSAGE_COLLECTION, ids=[m["id"] for m in messages],
+                                             with_payload=False, with_vectors=False)}
+    return [m for m in messages if m["id"] not in present]
+
+
+async def backfill_thread_messages(client) -> int:
+    """
+    Migrates the payload messages of threads created before the message table and
+    indexes every stored message that isn't searchable yet, so existing history
+    shows up in thread search without waiting for each thread to be opened.
+    Returns the number of messages sent for indexing.
+    """
+    indexed, offset = 0, None
+    while True:
+        points, offset = await asyncio.to_thread(
+            client.scroll, collection_name=THREAD_COLLECTION, limit=100, offset=offset,
+            with_payload=["messages"], with_vectors=False
+        )
+        for point in points:
+            thread_id = str(point.id)
+            try:
+                _, migrated = await asyncio.to_thread(migrate_payload_messages, client, thread_id, point.payload or {})
+                pending = migrated or await asyncio.to_thread(_unindexed_messages, client, thread_id)
+                if pending:
+                    await index_thread_messages(client, thread_id, pending)
+                    indexed += len(pending)
+            except Exception as e:
+                logger.warning(f"Could not backfill messages of thread {thread_id}: {e}")
+        if offset is None:
+            break
+    if indexed:
+        logger.info(f"Backfilled {indexed} thread messages into thread search.")
+    return indexed
@@ -1,27 +1,76 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Settings(BaseSettings):
-    # Azure OpenAI Settings
-    AZURE_OPENAI_API_KEY: str
-    AZURE_OPENAI_ENDPOINT: str
-    OPENAI_DEPLOYMENT_NAME: str
-    EMBEDDINGS_DEPLOYMENT_NAME: str
+    # LLM Provider Selection: "azure", or "fake" for the offline deterministic provider
+    LLM_PROVIDER: str = "azure"
+    EMBEDDING_DIMENSION: int = 3072
+
+    # Azure OpenAI Settings (required when LLM_PROVIDER=azure)
+    AZURE_OPENAI_API_KEY: Optional[str] = None
+    AZURE_OPENAI_ENDPOINT: Optional[str] = None
+    OPENAI_DEPLOYMENT_NAME: Optional[str] = None
+    EMBEDDINGS_DEPLOYMENT_NAME: Optional[str] = None
+
+    # Fake Provider Settings (profiles: instant, azure, degraded; set values override the profile)
+    FAKE_LLM_PROFILE: str = "instant"
+    FAKE_LLM_EMBEDDING_LATENCY_SECONDS: Optional[float] = None
+    FAKE_LLM_CHAT_LATENCY_SECONDS: Optional[float] = None
+    FAKE_LLM_JITTER_SECONDS: Optional[float] = None
+    FAKE_LLM_ERROR_RATE: Optional[float] = None
+    FAKE_LLM_RATE_LIMIT_RATE: Optional[float] = None
+    FAKE_LLM_TPM_QUOTA: int = 0  # Simulated tokens-per-minute quota that triggers 429s (0 = none)
+    FAKE_LLM_SEED: int = 0
+
+    # LLM Client Settings (pooled HTTP clients, timeouts, retries)
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+
+    # LLM Quota Scheduler Settings (per deployment; 0 disables a limit)
+    LLM_CHAT_RPM: int = 0
+    LLM_CHAT_TPM: int = 0
+    LLM_EMBEDDINGS_RPM: int = 0
+    LLM_EMBEDDINGS_TPM: int = 0
+    LLM_RATE_LIMIT_BURST_SECONDS: float = 10.0
+    LLM_ESTIMATED_COMPLETION_TOKENS: int = 512
+    EMBEDDING_BATCH_SIZE: int = 512 # Texts per separately admitted call, only used when embedding limits are set
+    EMBEDDING_CONCURRENCY: int = 4 # Embedding batches of one call in flight at once
+
+    # LLM Routing Settings
+    # Comma separated, in preference order: azure, azure:<deployment>, anthropic, gemini
+    LLM_PROVIDERS: str = "azure"
+    LLM_HEDGING_ENABLED: bool = True
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS: float = 2.0
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 0.25
+    LLM_LATENCY_WINDOW: int = 200
+    ANTHROPIC_API_KEY: Optional[str] = None
+    ANTHROPIC_MODEL: str = "claude-3-5-sonnet-latest"
+    GEMINI_API_KEY: Optional[str] = None
+    GEMINI_MODEL: str = "gemini-1.5-pro"
 
     # Qdrant Settings
     QDRANT_API_KEY: str
     QDRANT_URL: str
     QDRANT_ENDPOINT: str
+    QDRANT_LOCAL_PATH: Optional[str] = None # In-process Qdrant instead of the server: ":memory:" or a directory
 
     # Google SSO Settings
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_REDIRECT_URI: str
+    GOOGLE_HTTP_TIMEOUT_SECONDS: float = 10.0 # Token exchange, userinfo and cert fetches
 
     # JWT Settings
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
+    AUTH_USER_CACHE_TTL_SECONDS: float = 30.0 # /auth/me user lookups cached per JWT subject (0 disables)
+    AUTH_USER_CACHE_SIZE: int = 10000
 
     # Database Settings
     USER_DATABASE_URL: str
@@ -30,8 +79,71 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 10
     USER_DB_POOL_SIZE: int = 5
     USER_DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True # Test connections on checkout (drops ones the server closed)
+    DB_POOL_RECYCLE_SECONDS: int = 1800 # Replace connections older than this (below MySQL's wait_timeout)
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    SQLITE_BUSY_TIMEOUT_SECONDS: float = 30.0
+
+    # Structured (SQL) Query Settings
+    TABLE_STORE_PATH: str = "./tables.db"
+    SQL_QUERY_TIMEOUT_SECONDS: float = 5.0
+    SQL_QUERY_MAX_ROWS: int = 200
+
+    # Batch Query Settings
+    BATCH_MAX_QUERIES: int = 500
+    BATCH_LLM_CONCURRENCY: int = 8
+
+    # Thread Memory Settings (thread-aware ask)
+    THREAD_MEMORY_RECENT_MESSAGES: int = 6 # Latest messages sent verbatim
+    THREAD_MEMORY_MESSAGE_CHARS: int = 2000 # Per-message cap for the verbatim messages
+    THREAD_SUMMARY_MAX_CHARS: int = 3000 # Cap on the rolling summary of older messages
+    THREAD_MEMORY_UNSUMMARIZED_CHARS: int = 4000 # Budget for older messages the summary doesn't cover yet
+    THREAD_SUMMARY_REFRESH_MESSAGES: int = 4 # Unsummarized older messages that trigger a refresh
+    THREAD_SUMMARY_BATCH_MESSAGES: int = 30 # Older messages folded into the summary per LLM call
+
+    # File Deletion Settings
+    DELETE_BACKGROUND_THRESHOLD: int = 10000 # Deletes matching more points run as background jobs
+    DELETE_JOB_HISTORY: int = 100 # Finished delete jobs kept for status lookups
+
+    # Tracing Settings (spans go to the JSON-lines file unless an OTLP/HTTP collector is configured)
+    TRACING_ENABLED: bool = False
+    TRACE_SAMPLE_RATE: float = 1.0 # Fraction of new traces recorded (continued traces follow the caller's decision)
+    TRACE_JSONL_PATH: str = "./traces/spans.jsonl"
+    TRACE_JSONL_MAX_BYTES: int = 100 * 1024 * 1024 # Rotate the span file at this size
+    TRACE_JSONL_BACKUPS: int = 3 # Rotated span files kept
+    TRACE_OTLP_ENDPOINT: Optional[str] = None # e.g. http://localhost:4318
+    TRACE_SERVICE_NAME: str = "chat4ba-engine"
+
+    # Profiling Settings (admin-only, per request or per ingestion)
+    PROFILING_ENABLED: bool = False
+    PROFILE_DIR: str = "./profiles"
+    PROFILE_HISTORY: int = 50 # Stored reports kept; older ones are deleted
+    PROFILE_SAMPLE_INTERVAL_SECONDS: float = 0.001
 
     class Config:
         env_file = ".env"
 
-settings = Settings()
+class LazySettings:
+    """
+    Proxy that builds Settings on first attribute access, so importing a module
+    that uses `settings` does not read and validate the environment.
+    """
+
+    def __init__(self):
+        object.__setattr__(self, "_settings", None)
+
+    def _load(self) -> Settings:
+        if self._settings is None:
+            object.__setattr__(self, "_settings", Settings())
+        return self._settings
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+def get_settings() -> Settings:
+    return settings._load()
+
+settings = LazySettings()
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from src.config.settings import settings
@@ -6,16 +7,123 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Async drivers used for the async engines, by sync dialect
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# Engines are created on first use so importing models and routers stays cheap
+_engine = None
+_user_engine = None
+_async_engine = None
+_async_user_engine = None
+
+def _is_in_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def _enable_sqlite_wal(engine):
+    """Puts every new SQLite connection in WAL mode, so readers don't block the writer (and vice versa)."""
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; the usual pairing with WAL
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_SECONDS * 1000)}")
+        cursor.close()
+
+def _engine_options(url, pool_size: int, max_overflow: int) -> dict:
+    """Pool settings from Settings; in-memory SQLite keeps SQLAlchemy's single-connection pool."""
+    options = {}
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+    if not _is_in_memory_sqlite(url):
+        options.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        )
+    return options
+
+def _create_engine(database_url: str, pool_size: int, max_overflow: int):
+    url = make_url(database_url)
+    engine = create_engine(url, **_engine_options(url, pool_size, max_overflow))
+    if url.get_backend_name() == "sqlite" and not _is_in_memory_sqlite(url):
+        _enable_sqlite_wal(engine)
+    return engine
+
+def _create_async_engine(database_url: str, pool_size: int, max_overflow: int):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(database_url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+    engine = create_async_engine(url, **_engine_options(url, pool_size, max_overflow))
+    if url.get_backend_name() == "sqlite" and not _is_in_memory_sqlite(url):
+        _enable_sqlite_wal(engine.sync_engine)
+    return engine
+
 # For chat threads (SQLite)
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}  # SQLite-specific
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+    return _engine
 
 # For users (MySQL)
-logger.info(f"Connecting to user database: {settings.USER_DATABASE_URL}")
-user_engine = create_engine(settings.USER_DATABASE_URL)
-UserSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=user_engine)
+def get_user_engine():
+    global _user_engine
+    if _user_engine is None:
+        logger.info(f"Connecting to user database: {settings.USER_DATABASE_URL}")
+        _user_engine = _create_engine(settings.USER_DATABASE_URL, settings.USER_DB_POOL_SIZE, settings.USER_DB_MAX_OVERFLOW)
+    return _user_engine
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = _create_async_engine(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+    return _async_engine
+
+def get_async_user_engine():
+    global _async_user_engine
+    if _async_user_engine is None:
+        _async_user_engine = _create_async_engine(settings.USER_DATABASE_URL, settings.USER_DB_POOL_SIZE, settings.USER_DB_MAX_OVERFLOW)
+    return _async_user_engine
+
+def dispose_engines():
+    """Closes pooled connections of the engines created so far (on application shutdown)."""
+    for created in (_engine, _user_engine):
+        if created is not None:
+            created.dispose()
+
+async def dispose_async_engines():
+    for created in (_async_engine, _async_user_engine):
+        if created is not None:
+            await created.dispose()
+
+class LazySessionmaker:
+    """sessionmaker that binds to its engine the first time a session is opened."""
+
+    def __init__(self, engine_factory, is_async: bool = False):
+        self._engine_factory = engine_factory
+        self._is_async = is_async
+        self._maker = None
+
+    def __call__(self, **kwargs):
+        if self._maker is None:
+            if self._is_async:
+                from sqlalchemy.ext.asyncio import async_sessionmaker
+                # Objects stay usable after commit without an implicit (awaitable) refresh
+                self._maker = async_sessionmaker(bind=self._engine_factory(), autoflush=False, expire_on_commit=False)
+            else:
+                self._maker = sessionmaker(autocommit=False, autoflush=False, bind=self._engine_factory())
+        return self._maker(**kwargs)
+
+SessionLocal = LazySessionmaker(get_engine)
+UserSessionLocal = LazySessionmaker(get_user_engine)
+AsyncSessionLocal = LazySessionmaker(get_async_engine, is_async=True)
+AsyncUserSessionLocal = LazySessionmaker(get_async_user_engine, is_async=True)
 
-Base = declarative_base() 
\ No newline at end of file
+Base = declarative_base()
@@ -0,0 +1,45 @@
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional
+from ..models.file_catalog import FileCatalogEntry
+
+def upsert_file_entry(db: Session, filename: str, collection_name: str, **fields) -> FileCatalogEntry:
+    """
+    Creates or replaces the catalog entry for a file. Other files that were stored
+    in the same collection are dropped, since (re-)ingestion recreates the collection.
+    """
+    db.query(FileCatalogEntry).filter(
+        FileCatalogEntry.collection_name == collection_name,
+        FileCatalogEntry.filename != filename
+    ).delete(synchronize_session=False)
+    entry = db.query(FileCatalogEntry).filter(FileCatalogEntry.filename == filename).first()
+    if entry is None:
+        entry = FileCatalogEntry(filename=filename)
+        db.add(entry)
+    entry.collection_name = collection_name
+    entry.ingested_at = datetime.utcnow()  # Re-ingestion replaces the entry's data, so it counts as a new ingest
+    for key, value in fields.items():
+        setattr(entry, key, value)
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+def get_file_entry(db: Session, name: str) -> Optional[FileCatalogEntry]:
+    """Looks a file up by its filename, falling back to its collection name."""
+    entry = db.query(FileCatalogEntry).filter(FileCatalogEntry.filename == name).first()
+    if entry is None:
+        entry = db.query(FileCatalogEntry).filter(FileCatalogEntry.collection_name == name).first()
+    return entry
+
+def get_file_entries(db: Session) -> List[FileCatalogEntry]:
+    return db.query(FileCatalogEntry).order_by(FileCatalogEntry.filename).all()
+
+def delete_file_entry(db: Session, filename: str) -> int:
+    deleted = db.query(FileCatalogEntry).filter(FileCatalogEntry.filename == filename).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def delete_entries_for_collection(db: Session, collection_name: str) -> int:
+    deleted = db.query(FileCatalogEntry).filter(FileCatalogEntry.collection_name == collection_name).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,28 @@
+from sqlalchemy.orm import Session
+from typing import Dict, List
+from ..models.recommendation import FileRecommendation
+
+def replace_file_recommendations(db: Session, filename: str, collection_name: str, questions: List[Dict]) -> int:
+    """
+    Replaces the stored recommendations for a file (used when it is (re-)ingested)
+    """
+    db.query(FileRecommendation).filter(FileRecommendation.filename == filename).delete(synchronize_session=False)
+    db.add_all([
+        FileRecommendation(
+            filename=filename,
+            collection_name=collection_name,
+            question=q['question'],
+            context=q.get('context')
+        )
+        for q in questions
+    ])
+    db.commit()
+    return len(questions)
+
+def get_all_recommendations(db: Session) -> List[FileRecommendation]:
+    return db.query(FileRecommendation).order_by(FileRecommendation.id).all()
+
+def delete_recommendations_for_collection(db: Session, collection_name: str) -> int:
+    deleted = db.query(FileRecommendation).filter(FileRecommendation.collection_name == collection_name).delete(synchronize_session=False)
+    db.commit()
+    return deleted
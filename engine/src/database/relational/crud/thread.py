@@ -0,0 +1,130 @@
+from sqlalchemy import false, func, update
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from datetime import datetime
+from ..models.thread import ThreadMessageRecord, ThreadSummaryRecord
+
+def _parse_timestamp(value) -> datetime:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value or datetime.utcnow()
+
+def append_messages(db: Session, thread_id: str, messages: List[Dict]) -> List[ThreadMessageRecord]:
+    """
+    Appends messages to a thread in one transaction. Existing rows are never
+    rewritten, so concurrent writers cannot overwrite each other's messages.
+    """
+    records = [
+        ThreadMessageRecord(
+            thread_id=thread_id,
+            role=m['role'],
+            content=m['content'],
+            timestamp=_parse_timestamp(m.get('timestamp'))
+        )
+        for m in messages
+    ]
+    db.add_all(records)
+    db.commit()
+    for record in records:
+        db.refresh(record)
+    return records
+
+def _lock_thread_messages(db: Session, thread_id: str):
+    """Holds the message write lock until the transaction ends, so counts read next stay valid."""
+    if db.get_bind().dialect.name == "sqlite":
+        # Any write statement takes SQLite's database write lock until commit, even one matching no rows
+        db.execute(update(ThreadMessageRecord).where(false()).values(role=ThreadMessageRecord.role))
+    else:
+        db.query(ThreadMessageRecord.id).filter(ThreadMessageRecord.thread_id == thread_id).order_by(
+            ThreadMessageRecord.id.desc()).limit(1).with_for_update().all()
+
+def append_missing_messages(db: Session, thread_id: str, messages: List[Dict]) -> List[ThreadMessageRecord]:
+    """
+    Treats `messages` as the thread's full history and appends only those beyond
+    the stored ones. Count and insert run in one locked transaction, so concurrent
+    or retried calls with the same history store each message once.
+    """
+    _lock_thread_messages(db, thread_id)
+    stored = count_messages(db, thread_id)
+    return append_messages(db, thread_id, messages[stored:])  # Commits, releasing the lock
+
+def get_messages(db: Session, thread_id: str, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[ThreadMessageRecord]:
+    query = db.query(ThreadMessageRecord).filter(ThreadMessageRecord.thread_id == thread_id)
+    if after_id is not None:
+        query = query.filter(ThreadMessageRecord.id > after_id)
+    query = query.order_by(ThreadMessageRecord.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def count_messages(db: Session, thread_id: str) -> int:
+    return db.query(ThreadMessageRecord).filter(ThreadMessageRecord.thread_id == thread_id).count()
+
+def get_message_stats(db: Session, thread_ids: List[str]) -> Dict[str, Dict]:
+    """Message count and last message for each thread, in one grouped query."""
+    if not thread_ids:
+        return {}
+    grouped = (
+        db.query(
+            ThreadMessageRecord.thread_id,
+            func.count(ThreadMessageRecord.id).label('message_count'),
+            func.max(ThreadMessageRecord.id).label('last_id')
+        )
+        .filter(ThreadMessageRecord.thread_id.in_(thread_ids))
+        .group_by(ThreadMessageRecord.thread_id)
+        .subquery()
+    )
+    rows = (
+        db.query(grouped.c.thread_id, grouped.c.message_count, ThreadMessageRecord)
+        .join(ThreadMessageRecord, ThreadMessageRecord.id == grouped.c.last_id)
+        .all()
+    )
+    return {thread_id: {"message_count": count, "last_message": last} for thread_id, count, last in rows}
+
+def get_recent_messages(db: Session, thread_id: str, limit: int) -> List[ThreadMessageRecord]:
+    """The last `limit` messages of a thread, oldest first."""
+    records = (
+        db.query(ThreadMessageRecord)
+        .filter(ThreadMessageRecord.thread_id == thread_id)
+        .order_by(ThreadMessageRecord.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return list(reversed(records))
+
+def count_messages_between(db: Session, thread_id: str, after_id: int, before_id: int) -> int:
+    """Messages with after_id < id < before_id."""
+    return db.query(ThreadMessageRecord).filter(
+        ThreadMessageRecord.thread_id == thread_id,
+        ThreadMessageRecord.id > after_id,
+        ThreadMessageRecord.id < before_id
+    ).count()
+
+def get_messages_between(db: Session, thread_id: str, after_id: int, before_id: int, limit: int) -> List[ThreadMessageRecord]:
+    """The last `limit` messages with after_id < id < before_id, oldest first."""
+    records = (
+        db.query(ThreadMessageRecord)
+        .filter(
+            ThreadMessageRecord.thread_id == thread_id,
+            ThreadMessageRecord.id > after_id,
+            ThreadMessageRecord.id < before_id
+        )
+        .order_by(ThreadMessageRecord.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return list(reversed(records))
+
+def get_summary(db: Session, thread_id: str) -> Optional[ThreadSummaryRecord]:
+    return db.query(ThreadSummaryRecord).filter(ThreadSummaryRecord.thread_id == thread_id).first()
+
+def save_summary(db: Session, thread_id: str, summary: str, summarized_through_id: int) -> ThreadSummaryRecord:
+    record = get_summary(db, thread_id)
+    if record is None:
+        record = ThreadSummaryRecord(thread_id=thread_id)
+        db.add(record)
+    record.summary = summary
+    record.summarized_through_id = summarized_through_id
+    db.commit()
+    db.refresh(record)
+    return record
@@ -1,8 +1,56 @@
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, Optional
 from datetime import datetime
 from ..models.user import User
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# --- Upsert statements ---
+def _upsert_user_statement(dialect_name: str, user_data: Dict):
+    """
+    INSERT that creates the user or, when the email (on MySQL: any unique key) exists,
+    refreshes last_login and sets google_id if one is given.
+    """
+    now = datetime.utcnow()
+    values = {
+        "email": user_data['email'],
+        "role": user_data.get('role', 'user'),
+        "last_login": now,
+        "created_at": now,
+        "google_id": user_data.get('google_id') or None,
+    }
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(User).values(**values)
+        return stmt.on_duplicate_key_update(
+            last_login=stmt.inserted.last_login,
+            google_id=func.coalesce(stmt.inserted.google_id, User.google_id),
+        )
+    if dialect_name in ("sqlite", "postgresql"):
+        if dialect_name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(User).values(**values)
+        return stmt.on_conflict_do_update(
+            index_elements=[User.email],
+            set_={"last_login": stmt.excluded.last_login, "google_id": func.coalesce(stmt.excluded.google_id, User.google_id)},
+        )
+    raise ValueError(f"User upsert is not supported for the '{dialect_name}' dialect")
+
+def _touch_by_google_id(user_data: Dict):
+    return update(User).where(User.google_id == user_data.get('google_id')).values(last_login=datetime.utcnow())
+
+def _select_upserted_user(user_data: Dict):
+    # google_id takes precedence over email, as in the lookup order before the upsert existed
+    condition = User.google_id == user_data['google_id'] if user_data.get('google_id') else User.email == user_data['email']
+    return select(User).where(condition).execution_options(populate_existing=True)
+
+# --- Sync CRUD ---
+
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     return db.query(User).filter(User.email == email).first()
 
@@ -14,32 +62,17 @@ def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
 
 def get_or_create_user(db: Session, user_data: Dict) -> User:
     """
-    Get existing user or create a new one based on email or google_id
+    Get existing user or create a new one based on email or google_id, with one upsert statement
     """
-    user = None
-    if 'google_id' in user_data and user_data['google_id']:
-        user = get_user_by_google_id(db, user_data['google_id'])
-    if not user:
-        user = get_user_by_email(db, user_data['email'])
-    if user:
-        # Update last_login and google_id if needed
-        user.last_login = datetime.utcnow()
-        if 'google_id' in user_data and user_data['google_id']:
-            user.google_id = user_data['google_id']
+    try:
+        db.execute(_upsert_user_statement(db.get_bind().dialect.name, user_data))
         db.commit()
-        db.refresh(user)
-    else:
-        # Create new user
-        user = User(
-            email=user_data['email'],
-            role=user_data.get('role', 'user'),
-            last_login=datetime.utcnow(),
-            google_id=user_data.get('google_id')
-        )
-        db.add(user)
+    except IntegrityError:
+        # ON CONFLICT targets email; a google_id already linked to another email updates that user instead
+        db.rollback()
+        db.execute(_touch_by_google_id(user_data))
         db.commit()
-        db.refresh(user)
-    return user
+    return db.execute(_select_upserted_user(user_data)).scalar_one()
 
 def update_user_last_login(db: Session, email: str, google_id: Optional[str] = None) -> Optional[User]:
     user = get_user_by_email(db, email)
@@ -79,4 +112,58 @@ def delete_user(db: Session, user_id: int) -> bool:
         db.delete(user)
         db.commit()
         return True
-    return False 
\ No newline at end of file
+    return False
+
+# --- Async CRUD (AsyncSession from AsyncUserSessionLocal / get_async_user_db) ---
+async def aget_user_by_email(db: "AsyncSession", email: str) -> Optional[User]:
+    return (await db.execute(select(User).where(User.email == email))).scalars().first()
+
+async def aget_user_by_google_id(db: "AsyncSession", google_id: str) -> Optional[User]:
+    return (await db.execute(select(User).where(User.google_id == google_id))).scalars().first()
+
+async def aget_user_by_id(db: "AsyncSession", user_id: int) -> Optional[User]:
+    return await db.get(User, user_id)
+
+async def aget_or_create_user(db: "AsyncSession", user_data: Dict) -> User:
+    """Async get_or_create_user: one upsert statement, then the resulting row."""
+    try:
+        await db.execute(_upsert_user_statement(db.get_bind().dialect.name, user_data))
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        await db.execute(_touch_by_google_id(user_data))
+        await db.commit()
+    return (await db.execute(_select_upserted_user(user_data))).scalar_one()
+
+async def aupdate_user_last_login(db: "AsyncSession", email: str, google_id: Optional[str] = None) -> Optional[User]:
+    values = {"last_login": datetime.utcnow()}
+    if google_id:
+        values["google_id"] = google_id
+    await db.execute(update(User).where(User.email == email).values(**values))
+    await db.commit()
+    return (await db.execute(select(User).where(User.email == email).execution_options(populate_existing=True))).scalars().first()
+
+async def ainsert_new_user(db: "AsyncSession", email: str, role: str = 'user', google_id: Optional[str] = None) -> User:
+    user = User(
+        email=email,
+        role=role,
+        last_login=datetime.utcnow(),
+        google_id=google_id
+    )
+    db.add(user)
+    await db.commit()
+    return user
+
+async def aupdate_user(db: "AsyncSession", user_id: int, update_data: Dict) -> Optional[User]:
+    user = await aget_user_by_id(db, user_id)
+    if user:
+        for key, value in update_data.items():
+            if hasattr(user, key):
+                setattr(user, key, value)
+        await db.commit()
+    return user
+
+async def adelete_user(db: "AsyncSession", user_id: int) -> bool:
+    result = await db.execute(delete(User).where(User.id == user_id))
+    await db.commit()
+    return result.rowcount > 0
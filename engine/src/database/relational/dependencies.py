@@ -1,6 +1,9 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator, TYPE_CHECKING
 from sqlalchemy.orm import Session
-from .connection import SessionLocal, UserSessionLocal
+from .connection import SessionLocal, UserSessionLocal, AsyncSessionLocal, AsyncUserSessionLocal
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -20,4 +23,18 @@ def get_user_db() -> Generator[Session, None, None]:
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncGenerator["AsyncSession", None]:
+    """
+    Dependency for an async SQLite database session.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_user_db() -> AsyncGenerator["AsyncSession", None]:
+    """
+    Dependency for an async MySQL user database session.
+    """
+    async with AsyncUserSessionLocal() as db:
+        yield db
@@ -1,15 +1,21 @@
 """
 Database initialization script to create tables
 """
-from src.database.relational.connection import Base, user_engine
+from src.database.relational.connection import Base, get_engine, get_user_engine
 from src.database.relational.models.user import User
+from src.database.relational.models.recommendation import FileRecommendation  # Registers table on Base
+from src.database.relational.models.file_catalog import FileCatalogEntry  # Registers table on Base
+from src.database.relational.models.thread import ThreadMessageRecord, ThreadSummaryRecord  # Registers tables on Base
 
 def init_database():
-    """Initialize the user database by creating all tables"""
+    """Initialize the user and application databases by creating all tables"""
     try:
-        # Create tables for the user database (MySQL)
-        Base.metadata.create_all(bind=user_engine)
+        # Create tables for the user database (MySQL); User has its own declarative base
+        User.metadata.create_all(bind=get_user_engine())
         print("User database tables created successfully")
+        # Create application tables (recommendations, file catalog, thread messages, ...) in the main database
+        Base.metadata.create_all(bind=get_engine())
+        print("Application database tables created successfully")
     except Exception as e:
         print(f"Error creating database tables: {e}")
         raise
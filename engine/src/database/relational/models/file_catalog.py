@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from datetime import datetime
+from ..connection import Base
+
+class FileCatalogEntry(Base):
+    """An ingested file and the collection/tables it was stored in."""
+    __tablename__ = 'file_catalog'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    filename = Column(String(255), unique=True, index=True, nullable=False)
+    collection_name = Column(String(255), index=True, nullable=False)
+    point_count = Column(Integer, default=0, nullable=False)
+    row_count = Column(Integer, nullable=True)  # None when the file could not be stored as a table
+    table_schema = Column('schema', Text, nullable=True)  # JSON list of stored table schemas
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of the uploaded file
+    ingested_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from datetime import datetime
+from ..connection import Base
+
+class FileRecommendation(Base):
+    """A recommended question generated once per file at ingest time."""
+    __tablename__ = 'file_recommendations'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    filename = Column(String(255), index=True, nullable=False)
+    collection_name = Column(String(255), index=True, nullable=False)
+    question = Column(Text, nullable=False)
+    context = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
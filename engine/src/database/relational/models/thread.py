@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from datetime import datetime
+from ..connection import Base
+
+class ThreadMessageRecord(Base):
+    """A single chat message; rows are only ever appended, in id order per thread."""
+    __tablename__ = 'thread_messages'
+    __table_args__ = (Index('ix_thread_messages_thread_id_id', 'thread_id', 'id'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    thread_id = Column(String(64), nullable=False)
+    role = Column(String(32), nullable=False)
+    content = Column(Text, nullable=False)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+
+class ThreadSummaryRecord(Base):
+    """Rolling summary of a thread's older messages, up to and including `summarized_through_id`."""
+    __tablename__ = 'thread_summaries'
+
+    thread_id = Column(String(64), primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    summarized_through_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
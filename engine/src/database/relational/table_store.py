@@ -0,0 +1,204 @@
+"""
+Local SQLite store for uploaded tables.
+
+Every ingested file is also kept as a plain SQL table so aggregate questions
+("total revenue by region") can be answered with one read-only query instead
+of depending on which chunks vector search happens to return.
+"""
+import os
+import time
+import sqlite3
+import logging
+from typing import Any, Dict, List, Optional
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Authorizer actions a read-only query is allowed to perform
+_READ_ONLY_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),  # WITH RECURSIVE ...
+}
+_PROGRESS_HANDLER_OPCODES = 10_000  # How often the timeout check runs
+_REGISTRY_TABLE = "_stored_tables"  # Maps each file's table name to its (per-sheet) tables
+
+
+def clean_identifier(name: str) -> str:
+    """Normalizes a file, sheet or column name into a safe lowercase SQL identifier."""
+    cleaned = "".join(c if c.isalnum() else '_' for c in str(name)).lower().strip('_')
+    if not cleaned:
+        cleaned = "col"
+    if cleaned[0].isdigit():
+        cleaned = f"_{cleaned}"
+    return cleaned
+
+
+def _connect(read_only: bool = False) -> sqlite3.Connection:
+    path = os.path.abspath(settings.TABLE_STORE_PATH)
+    if read_only:
+        # mode=ro makes SQLite itself refuse writes, independent of the authorizer
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+def _load_dataframes(file_path: str) -> Dict[Optional[str], Any]:
+    """Loads a CSV/Excel file into DataFrames keyed by sheet name (None for CSV)."""
+    import pandas as pd
+
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".csv":
+        return {None: pd.read_csv(file_path, encoding='utf-8-sig')}
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(file_path, sheet_name=None)
+    raise ValueError(f"Unsupported file type for table store: {ext}")
+
+
+def store_file_tables(file_path: str, table_name: str) -> List[Dict[str, Any]]:
+    """
+    Stores every sheet of a file as a SQLite table, replacing earlier versions.
+    Single-sheet files use `table_name` directly; multi-sheet workbooks get one
+    `<table_name>_<sheet>` table per sheet. Returns the stored table schemas.
+    """
+    frames = _load_dataframes(file_path)
+    stored = []
+    conn = _connect()
+    try:
+        # Drop whatever an earlier version of this file left behind (e.g. removed sheets)
+        _ensure_registry(conn)
+        for name in _owned_tables(conn, [table_name]):
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.execute(f"DELETE FROM {_REGISTRY_TABLE} WHERE owner = ?", (table_name,))
+
+        for sheet_name, df in frames.items():
+            name = table_name if len(frames) == 1 else f"{table_name}_{clean_identifier(sheet_name)}"
+
+            # Deduplicate cleaned column names so the LLM can reference them unquoted
+            columns, seen = [], {}
+            for col in df.columns:
+                base = clean_identifier(col)
+                seen[base] = seen.get(base, 0) + 1
+                columns.append(base if seen[base] == 1 else f"{base}_{seen[base]}")
+            df.columns = columns
+
+            df.to_sql(name, conn, if_exists="replace", index=False, chunksize=10_000)
+            conn.execute(f"INSERT OR REPLACE INTO {_REGISTRY_TABLE} (owner, name) VALUES (?, ?)", (table_name, name))
+            logger.info(f"Stored table '{name}' with {len(df)} rows and {len(columns)} columns.")
+            stored.append(_describe_table(conn, name))
+        conn.commit()
+    finally:
+        conn.close()
+    return stored
+
+
+def delete_tables(table_name: str) -> int:
+    """Drops the table(s) stored for a file. Returns the number of tables dropped."""
+    if not os.path.exists(settings.TABLE_STORE_PATH):
+        return 0
+    conn = _connect()
+    try:
+        _ensure_registry(conn)
+        names = _owned_tables(conn, [table_name])
+        for name in names:
+            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+        conn.execute(f"DELETE FROM {_REGISTRY_TABLE} WHERE owner = ?", (table_name,))
+        conn.commit()
+        return len(names)
+    finally:
+        conn.close()
+
+
+def _ensure_registry(conn: sqlite3.Connection):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {_REGISTRY_TABLE} (owner TEXT NOT NULL, name TEXT PRIMARY KEY)")
+
+
+def _owned_tables(conn: sqlite3.Connection, owners: Optional[List[str]] = None) -> List[str]:
+    """Lists stored data tables, optionally restricted to the given files."""
+    if owners:
+        placeholders = ", ".join("?" for _ in owners)
+        rows = conn.execute(f"SELECT name FROM {_REGISTRY_TABLE} WHERE owner IN ({placeholders}) ORDER BY name", owners)
+    else:
+        rows = conn.execute(f"SELECT name FROM {_REGISTRY_TABLE} ORDER BY name")
+    return [row[0] for row in rows]
+
+
+def _describe_table(conn: sqlite3.Connection, name: str) -> Dict[str, Any]:
+    columns = [{"name": row[1], "type": row[2] or "TEXT"} for row in conn.execute(f'PRAGMA table_info("{name}")')]
+    row_count = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+    return {"table": name, "columns": columns, "row_count": row_count}
+
+
+def get_table_schemas(table_names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Returns schemas for the stored tables. When `table_names` is given, only the
+    tables stored for those files (including per-sheet tables) are returned.
+    """
+    if not os.path.exists(settings.TABLE_STORE_PATH):
+        return []
+    conn = _connect()
+    try:
+        _ensure_registry(conn)
+        return [_describe_table(conn, name) for name in _owned_tables(conn, table_names)]
+    finally:
+        conn.close()
+
+
+def format_schema_for_prompt(schemas: List[Dict[str, Any]]) -> str:
+    """Renders table schemas as compact CREATE TABLE statements for the LLM prompt."""
+    parts = []
+    for schema in schemas:
+        cols = ",\n  ".join(f'{c["name"]} {c["type"]}' for c in schema["columns"])
+        parts.append(f'-- {schema["row_count"]} rows\nCREATE TABLE {schema["table"]} (\n  {cols}\n);')
+    return "\n\n".join(parts)
+
+
+def run_read_only_query(sql: str, timeout_seconds: Optional[float] = None, max_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Executes a single read-only SQL statement against the table store.
+    Writes, schema changes, ATTACH and PRAGMA are rejected by the authorizer,
+    execution is interrupted after `timeout_seconds` and at most `max_rows` rows
+    are returned. Raises ValueError if the query is rejected or fails.
+    """
+    timeout_seconds = timeout_seconds or settings.SQL_QUERY_TIMEOUT_SECONDS
+    max_rows = max_rows or settings.SQL_QUERY_MAX_ROWS
+
+    statement = sql.strip().rstrip(';').strip()
+    if not statement:
+        raise ValueError("SQL query is empty.")
+    if not os.path.exists(settings.TABLE_STORE_PATH):
+        raise ValueError("No tables have been stored yet.")
+
+    conn = _connect(read_only=True)
+    deadline = time.monotonic() + timeout_seconds
+    conn.set_authorizer(lambda action, *args: sqlite3.SQLITE_OK if action in _READ_ONLY_ACTIONS else sqlite3.SQLITE_DENY)
+    conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, _PROGRESS_HANDLER_OPCODES)
+    try:
+        # sqlite3 refuses to execute more than one statement per call
+        cursor = conn.execute(statement)
+        columns = [d[0] for d in cursor.description or []]
+        rows = cursor.fetchmany(max_rows + 1)
+    except sqlite3.OperationalError as e:
+        if time.monotonic() > deadline:
+            raise ValueError(f"SQL query exceeded the {timeout_seconds}s time limit.") from e
+        raise ValueError(f"SQL query failed: {e}") from e
+    except (sqlite3.DatabaseError, sqlite3.ProgrammingError, sqlite3.Warning) as e:
+        raise ValueError(f"SQL query rejected: {e}") from e
+    finally:
+        conn.close()
+
+    truncated = len(rows) > max_rows
+    return {
+        "columns": columns,
+        "rows": [list(r) for r in rows[:max_rows]],
+        "truncated": truncated,
+    }
+
+
+def format_result_for_prompt(result: Dict[str, Any]) -> str:
+    """Renders a query result as a pipe-separated table for the answer prompt."""
+    lines = [" | ".join(result["columns"])]
+    lines.extend(" | ".join("" if v is None else str(v) for v in row) for row in result["rows"])
+    if result["truncated"]:
+        lines.append(f"(result truncated to the first {len(result['rows'])} rows)")
+    return "\n".join(lines)
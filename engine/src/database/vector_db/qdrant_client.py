@@ -1,28 +1,45 @@
-from qdrant_client import QdrantClient, models
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
 import os
 import uuid
 import logging
+from typing import TYPE_CHECKING, Optional
 from dotenv import load_dotenv
 from src.config.settings import settings  # Import settings
+from src.utils.tracing import span
 
 # Load environment variables
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', '.env')
 load_dotenv(dotenv_path=dotenv_path)
 
+if TYPE_CHECKING:
+    from qdrant_client import models
+
 logger = logging.getLogger(__name__)
 
+# Payload fields used to find a file's points; indexed so filters don't scan the collection
+FILE_PAYLOAD_FIELDS = ("metadata.source", "metadata.filename")
+
 # Global Qdrant client instance (consider FastAPI dependency injection for production)
 _qdrant_client = None
 
 def initialize_qdrant_client():
     global _qdrant_client
+    if _qdrant_client is None and settings.QDRANT_LOCAL_PATH:
+        from qdrant_client import QdrantClient
+
+        # Embedded (local mode) Qdrant, e.g. for benchmarks and offline development
+        logger.info(f"Initializing in-process Qdrant client at {settings.QDRANT_LOCAL_PATH}")
+        if settings.QDRANT_LOCAL_PATH == ":memory:":
+            _qdrant_client = QdrantClient(location=":memory:")
+        else:
+            _qdrant_client = QdrantClient(path=settings.QDRANT_LOCAL_PATH)
     if _qdrant_client is None:
         qdrant_url = settings.QDRANT_ENDPOINT
         qdrant_api_key = settings.QDRANT_API_KEY
         if not qdrant_url:
             raise ValueError("QDRANT_ENDPOINT environment variable not set.")
         logger.info(f"Initializing Qdrant client with URL: {qdrant_url}")
+        from qdrant_client import QdrantClient  # qdrant_client (and grpc) load on first connection
+
         try:
             _qdrant_client = QdrantClient(
                 url=qdrant_url,
@@ -44,9 +61,19 @@ def get_qdrant_client():
         return initialize_qdrant_client()
     return _qdrant_client
 
-def setup_collection(collection_name: str, vector_size: int = 3072, distance_metric: Distance = Distance.COSINE):
-    """Creates or recreates a Qdrant collection with the specified configuration."""
+def close_qdrant_client():
+    """Closes the shared client's connections (on application shutdown)."""
+    global _qdrant_client
+    if _qdrant_client is not None:
+        _qdrant_client.close()
+        _qdrant_client = None
+
+def setup_collection(collection_name: str, vector_size: int = 3072, distance_metric: Optional["models.Distance"] = None):
+    """Creates or recreates a Qdrant collection with the specified configuration (cosine distance by default)."""
+    from qdrant_client.http.models import Distance, VectorParams
+
     client = get_qdrant_client()
+    distance_metric = distance_metric or Distance.COSINE
     try:
         collections = client.get_collections().collections
         collection_names = [c.name for c in collections]
@@ -64,14 +91,62 @@ def setup_collection(collection_name: str, vector_size: int = 3072, distance_met
                 collection_name=collection_name,
                 vectors_config=VectorParams(size=vector_size, distance=distance_metric)
             )
+        ensure_payload_indexes(collection_name)
         logger.info(f"Collection '{collection_name}' setup complete with vector size {vector_size}.")
 
     except Exception as e:
         logger.error(f"Failed to setup collection '{collection_name}': {e}")
         raise
 
+def ensure_payload_indexes(collection_name: str):
+    """Creates keyword indexes on the file payload fields (a no-op if they already exist)."""
+    from qdrant_client import models
+
+    client = get_qdrant_client()
+    for field_name in FILE_PAYLOAD_FIELDS:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=models.PayloadSchemaType.KEYWORD,
+            wait=True
+        )
+
+def file_filter(filename: str) -> "models.Filter":
+    """Matches the points of a file by its source or filename metadata."""
+    from qdrant_client import models
+
+    return models.Filter(should=[
+        models.FieldCondition(key=field_name, match=models.MatchValue(value=filename))
+        for field_name in FILE_PAYLOAD_FIELDS
+    ])
+
+def count_file_points(collection_name: str, filename: str) -> int:
+    client = get_qdrant_client()
+    return client.count(collection_name=collection_name, count_filter=file_filter(filename), exact=True).count
+
+def delete_file_points(collection_name: str, filename: str, wait: bool = True) -> int:
+    """
+    Deletes every point of a file with a server-side filter selector, so no IDs
+    are listed or transferred. Returns the number of points that matched.
+    """
+    from qdrant_client import models
+
+    client = get_qdrant_client()
+    ensure_payload_indexes(collection_name)  # Collections created before indexing was added
+    matched = count_file_points(collection_name, filename)
+    if matched:
+        client.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(filter=file_filter(filename)),
+            wait=wait
+        )
+        logger.info(f"Deleted {matched} points for '{filename}' from collection '{collection_name}'.")
+    return matched
+
 async def upsert_vectors(collection_name: str, texts: list[str], metadatas: list[dict], embeddings: list[list[float]]):
     """Upserts vectors into Qdrant."""
+    from qdrant_client.http.models import PointStruct
+
     client = get_qdrant_client()
     points_to_upsert = []
     skipped_count = 0
@@ -84,7 +159,7 @@ async def upsert_vectors(collection_name: str, texts: list[str], metadatas: list
             logger.warning(f"Skipping point {i} in {collection_name}: Empty or non-string content.")
             skipped_count += 1
             continue
-        if not vector or len(vector) != 3072: # Assuming 3072 from AZURE_EMBEDDING_DEPLOYMENT
+        if not vector or len(vector) != settings.EMBEDDING_DIMENSION:
              logger.warning(f"Skipping point {i} in {collection_name}: Invalid vector (size {len(vector) if vector else 0}). Text: {text[:50]}...")
              skipped_count += 1
              continue
@@ -108,11 +183,12 @@ async def upsert_vectors(collection_name: str, texts: list[str], metadatas: list
 
     try:
         # Use batch upsert for efficiency
-        client.upsert(
-            collection_name=collection_name,
-            points=points_to_upsert,
-            wait=True # Wait for operation to complete
-        )
+        with span("upsert_vectors", collection=collection_name, points=len(points_to_upsert), skipped=skipped_count):
+            client.upsert(
+                collection_name=collection_name,
+                points=points_to_upsert,
+                wait=True # Wait for operation to complete
+            )
         logger.info(f"Successfully upserted {len(points_to_upsert)} points to '{collection_name}'.")
         return len(points_to_upsert)
     except Exception as e:
@@ -0,0 +1,171 @@
+# src/lifespan.py
+"""
+Application lifespan: builds and warms the shared clients before the app reports
+ready, and closes them on shutdown.
+
+Warm-up runs in the background so the server accepts connections (and /healthz
+answers) straight away; /readyz reports 503 until every component is warm.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Per-component readiness, read by /readyz
+WARMUP_COMPONENTS = ("database", "qdrant", "catalog", "llm")
+readiness: Dict[str, dict] = {name: {"status": "pending"} for name in WARMUP_COMPONENTS}
+WARMUP_RETRY_INITIAL_SECONDS = 1.0
+WARMUP_RETRY_MAX_SECONDS = 60.0
+
+
+def is_ready() -> bool:
+    return all(state["status"] == "ready" for state in readiness.values())
+
+
+async def _warm(name: str, step):
+    """
+    Runs one warm-up step until it succeeds, retrying with exponential backoff,
+    so a transient error at boot doesn't keep /readyz at 503 for good.
+    """
+    delay = WARMUP_RETRY_INITIAL_SECONDS
+    attempt = 0
+    while True:
+        attempt += 1
+        readiness[name] = {"status": "warming", "attempt": attempt}
+        start = time.perf_counter()
+        try:
+            await step()
+            readiness[name] = {"status": "ready", "seconds": round(time.perf_counter() - start, 3), "attempts": attempt}
+            logger.info(f"Warm-up of {name} finished in {readiness[name]['seconds']}s.")
+            return
+        except Exception as e:
+            readiness[name] = {"status": "failed", "error": str(e), "attempts": attempt, "retry_in": delay}
+            logger.critical(f"CRITICAL: Failed to warm up {name} (attempt {attempt}, retrying in {delay:g}s): {e}", exc_info=attempt == 1)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
+
+# --- Warm-up steps ---
+async def _warm_database():
+    from sqlalchemy import text
+    from src.database.relational.init_db import init_database
+    from src.database.relational.connection import get_engine, get_user_engine
+
+    def create_and_ping():
+        init_database()
+        # Opens the first pooled connection of each engine
+        for engine in (get_engine(), get_user_engine()):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+    await asyncio.to_thread(create_and_ping)
+
+
+async def _warm_qdrant():
+    from src.database.vector_db.qdrant_client import initialize_qdrant_client
+    from src.api.services.thread_service import ensure_thread_collections
+
+    def connect_and_prepare():
+        client = initialize_qdrant_client()
+        ensure_thread_collections(client)
+
+    await asyncio.to_thread(connect_and_prepare)
+
+
+async def _warm_catalog():
+    """Catalogs collections ingested before the file catalog existed (needs the database and Qdrant)."""
+    from src.database.vector_db.qdrant_client import get_qdrant_client
+    from src.processing.file_catalog import backfill_catalog
+
+    await asyncio.to_thread(lambda: backfill_catalog(get_qdrant_client()))
+
+
+async def _warm_llm():
+    from src.llm.providers.azure_openai import get_azure_provider
+    from src.llm.scheduler import Priority
+
+    # Building the provider creates the pooled HTTP clients; one tiny embedding opens the connection
+    provider = await asyncio.to_thread(get_azure_provider)
+    await provider.generate_query_embedding("warmup", Priority.INTERACTIVE)
+
+
+async def _warm_search():
+    """Runs one embedding plus vector search end to end once Qdrant and the LLM are warm."""
+    from src.database.vector_db.qdrant_client import get_qdrant_client
+    from src.api.services.thread_service import THREAD_COLLECTION
+    from src.llm.providers.azure_openai import generate_query_embedding
+
+    vector = await generate_query_embedding("warmup")
+    await asyncio.to_thread(get_qdrant_client().search, collection_name=THREAD_COLLECTION, query_vector=vector, limit=1)
+
+
+async def _backfill_threads():
+    """Makes threads created before message search searchable (needs the database, Qdrant and the LLM)."""
+    from src.database.vector_db.qdrant_client import get_qdrant_client
+    from src.api.services.thread_service import backfill_thread_messages
+
+    await backfill_thread_messages(get_qdrant_client())
+
+
+async def _warm_storage():
+    await asyncio.gather(_warm("database", _warm_database), _warm("qdrant", _warm_qdrant))
+    # The catalog table only exists once init_database has run
+    await _warm("catalog", _warm_catalog)
+
+
+async def warm_up():
+    """Builds and warms all shared clients in parallel; once they are ready, backfills thread search."""
+    logger.info("Application warm-up initiated...")
+    start = time.perf_counter()
+    await asyncio.gather(_warm_storage(), _warm("llm", _warm_llm))
+    try:
+        await _warm_search()
+    except Exception as e:
+        # The clients themselves are up; a failed probe search is not worth holding readiness back
+        logger.warning(f"Warm-up search failed: {e}", exc_info=True)
+    logger.info(f"Application warm-up finished in {time.perf_counter() - start:.2f}s (ready: {is_ready()}).")
+    try:
+        # Runs once per start after readiness; already indexed threads cost one count each
+        await _backfill_threads()
+    except Exception as e:
+        logger.warning(f"Thread search backfill failed: {e}", exc_info=True)
+
+
+# --- Shutdown ---
+async def close_clients():
+    """Closes the shared clients that were created and flushes pending trace spans."""
+    from src.llm import llm_service
+    from src.database.vector_db.qdrant_client import close_qdrant_client
+    from src.database.relational.connection import dispose_engines, dispose_async_engines
+    from src.utils.tracing import shutdown_exporter
+    from src.api.services.google_oauth import close_google_clients
+
+    if llm_service._llm_service_instance is not None:
+        await llm_service._llm_service_instance.aclose()
+    await close_google_clients()
+    await dispose_async_engines()
+    for close in (close_qdrant_client, dispose_engines, shutdown_exporter):
+        try:
+            close()
+        except Exception as e:
+            logger.warning(f"Error during {close.__name__}: {e}", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """FastAPI lifespan: warm up in the background, close everything on shutdown."""
+    warmup_task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        logger.info("Application shutdown sequence initiated...")
+        warmup_task.cancel()
+        try:
+            await warmup_task
+        except asyncio.CancelledError:
+            pass
+        await close_clients()
+        logger.info("Application shutdown complete.")
@@ -0,0 +1,352 @@
+"""
+Shared LLM client layer.
+
+Owns one pooled keep-alive HTTP client per deployment, builds the langchain
+Azure models on top of them with explicit timeouts and retries, and caches the
+compiled RAG chain for every (deployment, system prompt) pair so requests do
+not rebuild prompt templates and LCEL pipelines on each call.
+
+Chat calls go through an LLMRouter that ranks the configured backends (Azure
+deployments, Anthropic, Gemini) by observed time-to-first-token and hedges
+slow requests: if the primary has not produced its first token within its
+p95, a backup is started and whichever answers first wins.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import httpx
+from src.config.settings import settings
+from src.llm.scheduler import Priority, estimate_tokens, get_scheduler
+from src.utils.metrics import record_cache
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+    from langchain_openai import AzureOpenAIEmbeddings, AzureChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_CHAINS = 128
+
+RAG_TEMPLATE = """{system_prompt}
+
+Context:
+{{context}}
+
+Question: {{question}}
+Answer (markdown supported):"""
+
+
+class LatencyTracker:
+    """Rolling window of time-to-first-token samples for one backend."""
+
+    MIN_SAMPLES = 20  # Below this the hedge delay falls back to the configured default
+
+    def __init__(self):
+        self.samples = deque(maxlen=settings.LLM_LATENCY_WINDOW)
+        self.ewma: Optional[float] = None
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self.ewma = seconds if self.ewma is None else 0.8 * self.ewma + 0.2 * seconds
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def hedge_delay(self) -> float:
+        """How long to wait for a first token before firing a backup request."""
+        if len(self.samples) < self.MIN_SAMPLES:
+            return settings.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+        return max(self.percentile(95), settings.LLM_HEDGE_MIN_DELAY_SECONDS)
+
+
+class ChatBackend:
+    """A chat model the router can send RAG requests to (one provider deployment)."""
+
+    def __init__(self, name: str, chat_model, order: int):
+        self.name = name
+        self.chat_model = chat_model
+        self.order = order  # Position in LLM_PROVIDERS, used until latencies are known
+        self.latency = LatencyTracker()
+        self.wins = 0
+        self.failures = 0
+
+    def rank_key(self) -> Tuple[float, int]:
+        expected = self.latency.ewma if self.latency.ewma is not None else settings.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+        return (expected, self.order)
+
+
+class LLMRouter:
+    """Latency-aware routing with hedged requests across chat backends."""
+
+    def __init__(self, service: "LLMService", backends: List[ChatBackend]):
+        self.service = service
+        self.backends = backends
+        self.scheduler = get_scheduler()
+        self.hedged_requests = 0
+        self.backup_wins = 0
+
+    async def _first_chunk(self, backend: ChatBackend, inputs: dict, system_prompt: str, priority: Priority,
+                           admitted: Optional[asyncio.Event] = None):
+        """Starts streaming from a backend and returns (first chunk, remaining stream).
+
+        `admitted` is set once the scheduler lets the request through, so hedge
+        timers measure the backend's latency rather than time spent queued.
+        """
+        chain = self.service.get_rag_chain(backend.name, backend.chat_model, system_prompt)
+        estimated = estimate_tokens([system_prompt, inputs["context"], inputs["question"]]) + settings.LLM_ESTIMATED_COMPLETION_TOKENS
+        await self.scheduler.acquire(backend.name, estimated, priority)
+        if admitted is not None:
+            admitted.set()
+
+        started = time.monotonic()
+        stream = chain.astream(inputs)
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = ""
+        except asyncio.CancelledError:
+            # Lost a hedge race: the elapsed time is still a lower bound on its latency
+            backend.latency.record(time.monotonic() - started)
+            await self._close_stream(backend, stream)
+            raise
+        except Exception:
+            backend.failures += 1
+            # Count the failure as a slow sample so a failing backend drops in the ranking
+            backend.latency.record(time.monotonic() - started + settings.LLM_HEDGE_DEFAULT_DELAY_SECONDS)
+            raise
+        backend.latency.record(time.monotonic() - started)
+        return first, stream
+
+    @staticmethod
+    async def _close_stream(backend: ChatBackend, stream):
+        """Closes a stream that won't be read, releasing its HTTP connection."""
+        try:
+            await stream.aclose()
+        except Exception as e:
+            logger.debug(f"[Router] Closing the stream of '{backend.name}' failed: {e}")
+
+    async def ask(self, query: str, context: str, system_prompt: str, priority: Priority = Priority.INTERACTIVE) -> str:
+        inputs = {"context": context, "question": query}
+        ranked = sorted(self.backends, key=ChatBackend.rank_key)
+        primary, candidates = ranked[0], ranked[1:]
+
+        admitted = asyncio.Event()
+        primary_task = asyncio.create_task(self._first_chunk(primary, inputs, system_prompt, priority, admitted))
+        tasks = {primary_task: primary}
+        if candidates and settings.LLM_HEDGING_ENABLED:
+            # The hedge timer starts once the scheduler admits the primary request
+            admission = asyncio.create_task(admitted.wait())
+            await asyncio.wait({primary_task, admission}, return_when=asyncio.FIRST_COMPLETED)
+            admission.cancel()
+            if not primary_task.done():
+                await asyncio.wait({primary_task}, timeout=primary.latency.hedge_delay())
+            if not primary_task.done():
+                backup = candidates.pop(0)
+                self.hedged_requests += 1
+                logger.info(f"[Router] '{primary.name}' has no first token after {primary.latency.hedge_delay():.2f}s; hedging with '{backup.name}'.")
+                tasks[asyncio.create_task(self._first_chunk(backup, inputs, system_prompt, priority))] = backup
+
+        winner, first, stream, last_error = None, None, None, None
+        pending = set(tasks)
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        logger.warning(f"[Router] Backend '{tasks[task].name}' failed: {last_error}")
+                    elif winner is None:
+                        winner = tasks[task]
+                        first, stream = task.result()
+                    else:
+                        await self._close_stream(tasks[task], task.result()[1])  # Both answered at once; drop the slower stream
+                # Every started backend failed: fail over to the next untried one
+                if not pending and winner is None and candidates:
+                    backend = candidates.pop(0)
+                    logger.info(f"[Router] Failing over to '{backend.name}'.")
+                    task = asyncio.create_task(self._first_chunk(backend, inputs, system_prompt, priority))
+                    tasks[task] = backend
+                    pending = {task}
+        finally:
+            for task in pending:
+                task.cancel()
+            # Let the cancelled backends record their latency and close their streams
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        if winner is None:
+            raise last_error
+        winner.wins += 1
+        if winner is not primary and len(tasks) > 1:
+            self.backup_wins += 1
+
+        parts = [first]
+        async for chunk in stream:
+            parts.append(chunk)
+        return "".join(parts).strip()
+
+    def stats(self) -> Dict:
+        return {
+            "hedged_requests": self.hedged_requests,
+            "backup_wins": self.backup_wins,
+            "backends": {
+                b.name: {
+                    "ttft_p50_seconds": b.latency.percentile(50),
+                    "ttft_p95_seconds": b.latency.percentile(95),
+                    "hedge_delay_seconds": b.latency.hedge_delay(),
+                    "wins": b.wins,
+                    "failures": b.failures,
+                }
+                for b in self.backends
+            },
+        }
+
+
+class LLMService:
+    def __init__(self):
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._sync_clients: Dict[str, httpx.Client] = {}
+        self._chains: "OrderedDict[Tuple[str, str], Runnable]" = OrderedDict()
+        self.router: Optional[LLMRouter] = None
+
+    # --- Pooled HTTP clients ---
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+        )
+
+    @staticmethod
+    def _timeout() -> httpx.Timeout:
+        return httpx.Timeout(settings.LLM_REQUEST_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS)
+
+    def get_async_http_client(self, deployment: str) -> httpx.AsyncClient:
+        """Returns the keep-alive async HTTP client shared by all calls to `deployment`."""
+        if deployment not in self._async_clients:
+            logger.info(f"Creating pooled async HTTP client for deployment '{deployment}'.")
+            self._async_clients[deployment] = httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+        return self._async_clients[deployment]
+
+    def get_sync_http_client(self, deployment: str) -> httpx.Client:
+        """Returns the keep-alive sync HTTP client shared by all calls to `deployment`."""
+        if deployment not in self._sync_clients:
+            logger.info(f"Creating pooled sync HTTP client for deployment '{deployment}'.")
+            self._sync_clients[deployment] = httpx.Client(limits=self._limits(), timeout=self._timeout())
+        return self._sync_clients[deployment]
+
+    # --- Model construction ---
+    def _client_kwargs(self, deployment: str, api_key: str, endpoint: str, api_version: str) -> dict:
+        # The openai SDK retries timeouts, connection errors, 429s and 5xx with
+        # jittered exponential backoff and honours Retry-After headers
+        return dict(
+            azure_deployment=deployment,
+            openai_api_key=api_key,
+            azure_endpoint=endpoint,
+            api_version=api_version,
+            timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=self.get_sync_http_client(deployment),
+            http_async_client=self.get_async_http_client(deployment),
+        )
+
+    def create_chat_model(self, deployment: str, api_key: str, endpoint: str, api_version: str,
+                          temperature: float = 0.7) -> "AzureChatOpenAI":
+        from langchain_openai import AzureChatOpenAI  # langchain loads on first model construction
+
+        return AzureChatOpenAI(temperature=temperature, **self._client_kwargs(deployment, api_key, endpoint, api_version))
+
+    def create_embeddings_model(self, deployment: str, api_key: str, endpoint: str, api_version: str) -> "AzureOpenAIEmbeddings":
+        from langchain_openai import AzureOpenAIEmbeddings
+
+        return AzureOpenAIEmbeddings(**self._client_kwargs(deployment, api_key, endpoint, api_version))
+
+    # --- Compiled chains ---
+    def get_rag_chain(self, deployment: str, chat_model, system_prompt: str) -> "Runnable":
+        """
+        Returns the compiled prompt | model | parser chain for a system prompt,
+        building it on first use. Expects {"context": ..., "question": ...} input.
+        """
+        key = (deployment, system_prompt)
+        chain = self._chains.get(key)
+        record_cache("rag_chain", hit=chain is not None)
+        if chain is not None:
+            self._chains.move_to_end(key)
+            return chain
+
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+
+        # Braces in the system prompt (e.g. JSON examples) are literal text, not template variables
+        escaped_prompt = system_prompt.replace("{", "{{").replace("}", "}}")
+        prompt_template = ChatPromptTemplate.from_template(RAG_TEMPLATE.format(system_prompt=escaped_prompt))
+        chain = prompt_template | chat_model | StrOutputParser()
+
+        self._chains[key] = chain
+        if len(self._chains) > MAX_CACHED_CHAINS:
+            self._chains.popitem(last=False)
+        logger.debug(f"Compiled RAG chain for deployment '{deployment}' ({len(self._chains)} cached).")
+        return chain
+
+    # --- Provider routing ---
+    def build_router(self, primary_deployment: str, primary_chat_model, api_key: str, endpoint: str,
+                     api_version: str) -> LLMRouter:
+        """
+        Builds the chat router from LLM_PROVIDERS, a comma separated list of
+        `azure` (the primary deployment), `azure:<deployment>` (another Azure
+        deployment on the same endpoint), `anthropic` and `gemini`.
+        Backends that cannot be configured are skipped with a warning.
+        """
+        from src.llm.providers.anthropic import create_anthropic_chat_model
+        from src.llm.providers.gemini import create_gemini_chat_model
+
+        backends = []
+        for order, entry in enumerate(e.strip() for e in settings.LLM_PROVIDERS.split(",") if e.strip()):
+            kind, _, deployment = entry.partition(":")
+            try:
+                if kind == "azure" and not deployment:
+                    backends.append(ChatBackend(primary_deployment, primary_chat_model, order))
+                elif kind == "azure":
+                    chat_model = self.create_chat_model(deployment, api_key, endpoint, api_version)
+                    get_scheduler().register(deployment, settings.LLM_CHAT_RPM, settings.LLM_CHAT_TPM)
+                    backends.append(ChatBackend(deployment, chat_model, order))
+                elif kind == "anthropic":
+                    backends.append(ChatBackend(f"anthropic:{settings.ANTHROPIC_MODEL}", create_anthropic_chat_model(), order))
+                elif kind == "gemini":
+                    backends.append(ChatBackend(f"gemini:{settings.GEMINI_MODEL}", create_gemini_chat_model(), order))
+                else:
+                    logger.warning(f"Unknown LLM provider '{entry}' in LLM_PROVIDERS; skipping.")
+            except (ImportError, ValueError) as e:
+                logger.warning(f"LLM provider '{entry}' is not available: {e}")
+
+        if not backends:
+            backends.append(ChatBackend(primary_deployment, primary_chat_model, 0))
+        logger.info(f"LLM router configured with backends: {[b.name for b in backends]}")
+        self.router = LLMRouter(self, backends)
+        return self.router
+
+    async def aclose(self):
+        """Closes all pooled HTTP clients."""
+        for client in self._async_clients.values():
+            await client.aclose()
+        for client in self._sync_clients.values():
+            client.close()
+        self._async_clients.clear()
+        self._sync_clients.clear()
+        self._chains.clear()
+
+
+# --- Global Instance Management ---
+_llm_service_instance = None
+
+def get_llm_service() -> LLMService:
+    """Returns the process-wide LLM service."""
+    global _llm_service_instance
+    if _llm_service_instance is None:
+        _llm_service_instance = LLMService()
+    return _llm_service_instance
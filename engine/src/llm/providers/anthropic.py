@@ -0,0 +1,27 @@
+"""
+Anthropic chat models for the LLM router (requires the optional langchain-anthropic package)
+"""
+import logging
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def create_anthropic_chat_model(temperature: float = 0.7):
+    """Creates a Claude chat model with the shared timeout and retry settings."""
+    try:
+        from langchain_anthropic import ChatAnthropic
+    except ImportError as e:
+        raise ImportError("The 'anthropic' LLM provider requires langchain-anthropic (pip install langchain-anthropic).") from e
+
+    if not settings.ANTHROPIC_API_KEY:
+        raise ValueError("ANTHROPIC_API_KEY is not set.")
+
+    logger.info(f"Initializing Anthropic chat model ({settings.ANTHROPIC_MODEL})...")
+    return ChatAnthropic(
+        model=settings.ANTHROPIC_MODEL,
+        api_key=settings.ANTHROPIC_API_KEY,
+        temperature=temperature,
+        timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+    )
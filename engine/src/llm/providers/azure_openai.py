@@ -1,11 +1,9 @@
 import os
 import logging
 from dotenv import load_dotenv
-from langchain_openai import AzureOpenAIEmbeddings, AzureChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
-from langchain.schema.output_parser import StrOutputParser
 from src.config.settings import settings  # Import settings
+from src.llm.llm_service import get_llm_service
+from src.llm.scheduler import Priority, estimate_tokens, get_scheduler
 
 # Configure logging for this module
 logger = logging.getLogger(__name__)
@@ -60,24 +58,24 @@ class AzureOpenAIProvider:
             logger.error(error_message)
             raise ValueError(error_message) # Raise error with specific missing vars
 
+        self.llm_service = get_llm_service()
+        # Every call is admitted through the quota scheduler for its deployment
+        self.scheduler = get_scheduler()
+        self.scheduler.register(self.chat_deployment, settings.LLM_CHAT_RPM, settings.LLM_CHAT_TPM)
+        self.scheduler.register(self.embedding_deployment, settings.LLM_EMBEDDINGS_RPM, settings.LLM_EMBEDDINGS_TPM)
         try:
-            # Initialize models safely
+            # Initialize models on the shared pooled clients (timeouts and retries are set there)
             logger.info(f"Initializing Embeddings model (Deployment: {self.embedding_deployment})...")
-            self.embeddings_model = AzureOpenAIEmbeddings(
-                azure_deployment=self.embedding_deployment,
-                openai_api_key=self.api_key,
-                azure_endpoint=self.endpoint,
-                api_version=self.api_version,
-                # Add retry logic if needed
+            self.embeddings_model = self.llm_service.create_embeddings_model(
+                self.embedding_deployment, self.api_key, self.endpoint, self.api_version
             )
             logger.info(f"Initializing Chat model (Deployment: {self.chat_deployment})...")
-            self.chat_model = AzureChatOpenAI(
-                azure_deployment=self.chat_deployment,
-                openai_api_key=self.api_key,
-                azure_endpoint=self.endpoint,
-                api_version=self.api_version,
-                temperature=0.7,
-                # Add retry logic if needed
+            self.chat_model = self.llm_service.create_chat_model(
+                self.chat_deployment, self.api_key, self.endpoint, self.api_version, temperature=0.7
+            )
+            # Chat requests are routed (and hedged) across all configured backends
+            self.router = self.llm_service.build_router(
+                self.chat_deployment, self.chat_model, self.api_key, self.endpoint, self.api_version
             )
             logger.info("AzureOpenAIProvider initialized successfully.")
         except Exception as e:
@@ -90,17 +88,18 @@ class AzureOpenAIProvider:
     def get_chat_model(self):
         return self.chat_model
 
-    async def generate_query_embedding(self, query: str):
+    async def generate_query_embedding(self, query: str, priority: Priority = Priority.INTERACTIVE):
         if not isinstance(query, str) or not query.strip():
              logger.warning("generate_query_embedding received empty or invalid query.")
              return None # Or handle appropriately
         try:
+             await self.scheduler.acquire(self.embedding_deployment, estimate_tokens([query]), priority)
              return await self.embeddings_model.aembed_query(query)
         except Exception as e:
              logger.error(f"Error generating query embedding: {e}", exc_info=True)
              raise
 
-    async def generate_document_embeddings(self, texts: list[str]):
+    async def generate_document_embeddings(self, texts: list[str], priority: Priority = Priority.INGESTION):
         valid_texts = [text for text in texts if isinstance(text, str) and text.strip()]
         if not valid_texts:
              logger.warning("generate_document_embeddings received no valid texts.")
@@ -108,30 +107,18 @@ class AzureOpenAIProvider:
         if len(valid_texts) < len(texts):
              logger.warning(f"Filtered out {len(texts) - len(valid_texts)} invalid/empty texts.")
         try:
-            return await self.embeddings_model.aembed_documents(valid_texts)
+            return await self.scheduler.embed_in_batches(
+                self.embedding_deployment, valid_texts, priority, self.embeddings_model.aembed_documents
+            )
         except Exception as e:
             logger.error(f"Error generating document embeddings: {e}", exc_info=True)
             raise
 
-    async def ask_with_context(self, query: str, context: str, system_prompt: str):
-        prompt_template = ChatPromptTemplate.from_template(f"""{system_prompt}
-
-        Context:
-        {{context}}
-
-        Question: {{question}}
-        Answer (markdown supported):""")
-
-        rag_chain = (
-            {"context": RunnablePassthrough(), "question": RunnablePassthrough()}
-            | prompt_template
-            | self.chat_model
-            | StrOutputParser()
-        )
-
+    async def ask_with_context(self, query: str, context: str, system_prompt: str,
+                               priority: Priority = Priority.INTERACTIVE):
         try:
-            response = await rag_chain.ainvoke({"context": context, "question": query})
-            return response.strip()
+            # The router runs the cached chain on the fastest backend, hedging slow first tokens
+            return await self.router.ask(query, context, system_prompt, priority)
         except Exception as e:
             logger.error(f"Error invoking RAG chain: {e}", exc_info=True)
             raise
@@ -145,8 +132,13 @@ def get_azure_provider():
     """Dependency function to get the provider instance."""
     global _azure_provider_instance
     if _azure_provider_instance is None:
-        logger.info("Creating new AzureOpenAIProvider instance.")
-        _azure_provider_instance = AzureOpenAIProvider()
+        if settings.LLM_PROVIDER == "fake":
+            from src.llm.providers.fake import FakeLLMProvider
+            logger.info("LLM_PROVIDER=fake: creating offline FakeLLMProvider instance.")
+            _azure_provider_instance = FakeLLMProvider()
+        else:
+            logger.info("Creating new AzureOpenAIProvider instance.")
+            _azure_provider_instance = AzureOpenAIProvider()
     return _azure_provider_instance
 
 # --- Convenience Functions using Dependency ---
@@ -160,17 +152,17 @@ def get_embeddings():
     provider = get_azure_provider()
     return provider.get_embeddings_model()
 
-async def generate_query_embedding(query: str):
+async def generate_query_embedding(query: str, priority: Priority = Priority.INTERACTIVE):
     provider = get_azure_provider()
-    return await provider.generate_query_embedding(query)
+    return await provider.generate_query_embedding(query, priority)
 
-async def generate_document_embeddings(texts: list[str]):
+async def generate_document_embeddings(texts: list[str], priority: Priority = Priority.INGESTION):
     provider = get_azure_provider()
     # This needs adjustment - the original function expected Document chunks
     # Assuming the calling code now passes strings:
-    return await provider.generate_document_embeddings(texts)
+    return await provider.generate_document_embeddings(texts, priority)
 
-async def ask_llm_with_context(query: str, context: str, system_prompt: str):
+async def ask_llm_with_context(query: str, context: str, system_prompt: str, priority: Priority = Priority.INTERACTIVE):
     provider = get_azure_provider()
-    return await provider.ask_with_context(query, context, system_prompt)
+    return await provider.ask_with_context(query, context, system_prompt, priority)
 
@@ -0,0 +1,182 @@
+"""
+Offline, deterministic LLM and embedding provider.
+
+Selected with LLM_PROVIDER=fake. Embeddings are unit vectors seeded from a hash
+of the text (identical text -> identical vector), chat answers come from
+templates, and latency, jitter, error rate and 429 behaviour follow a
+configurable latency profile. Used for load tests and benchmarks without Azure.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import List, Optional
+import numpy as np
+from src.config.settings import settings
+from src.llm.scheduler import Priority, estimate_tokens, get_scheduler
+from src.prompts.system.system_prompt import FOLLOWUP_MARKER
+
+logger = logging.getLogger(__name__)
+
+FAKE_CHAT_DEPLOYMENT = "fake-chat"
+FAKE_EMBEDDINGS_DEPLOYMENT = "fake-embeddings"
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    embedding_latency: float  # Seconds per embeddings call
+    chat_latency: float       # Seconds per chat call
+    jitter: float             # +/- uniform jitter applied to every call, in seconds
+    error_rate: float         # Probability a call fails with a server error
+    rate_limit_rate: float    # Probability a call fails with a 429
+
+
+LATENCY_PROFILES = {
+    "instant": LatencyProfile(0.0, 0.0, 0.0, 0.0, 0.0),
+    "azure": LatencyProfile(0.15, 1.5, 0.3, 0.0, 0.0),
+    "degraded": LatencyProfile(0.5, 6.0, 3.0, 0.02, 0.05),
+}
+
+
+class FakeRateLimitError(Exception):
+    """Simulated HTTP 429 from the provider."""
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Simulated rate limit (429); retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class FakeServerError(Exception):
+    """Simulated HTTP 5xx from the provider."""
+    status_code = 500
+
+
+def _profile_from_settings() -> LatencyProfile:
+    if settings.FAKE_LLM_PROFILE not in LATENCY_PROFILES:
+        raise ValueError(f"Unknown FAKE_LLM_PROFILE '{settings.FAKE_LLM_PROFILE}'. Choose from: {', '.join(LATENCY_PROFILES)}")
+    overrides = {
+        "embedding_latency": settings.FAKE_LLM_EMBEDDING_LATENCY_SECONDS,
+        "chat_latency": settings.FAKE_LLM_CHAT_LATENCY_SECONDS,
+        "jitter": settings.FAKE_LLM_JITTER_SECONDS,
+        "error_rate": settings.FAKE_LLM_ERROR_RATE,
+        "rate_limit_rate": settings.FAKE_LLM_RATE_LIMIT_RATE,
+    }
+    return replace(LATENCY_PROFILES[settings.FAKE_LLM_PROFILE], **{k: v for k, v in overrides.items() if v is not None})
+
+
+def fake_embedding(text: str, dimension: int) -> List[float]:
+    """Deterministic unit vector seeded from the SHA-256 of the text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeEmbeddings:
+    """Drop-in for the langchain embeddings model returned by get_embeddings_model()."""
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def embed_query(self, text: str) -> List[float]:
+        return fake_embedding(text, self.dimension)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [fake_embedding(t, self.dimension) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+
+class FakeLLMProvider:
+    """Same interface as AzureOpenAIProvider, with no network access."""
+
+    def __init__(self, profile: Optional[LatencyProfile] = None):
+        self.profile = profile or _profile_from_settings()
+        self.embedding_deployment = FAKE_EMBEDDINGS_DEPLOYMENT
+        self.chat_deployment = FAKE_CHAT_DEPLOYMENT
+        self.embeddings_model = FakeEmbeddings(settings.EMBEDDING_DIMENSION)
+        self._random = random.Random(settings.FAKE_LLM_SEED)
+        # Token usage in the trailing minute, for the simulated TPM quota
+        self._usage = deque()
+
+        # Calls still go through the scheduler so its behaviour can be profiled offline
+        self.scheduler = get_scheduler()
+        self.scheduler.register(self.chat_deployment, settings.LLM_CHAT_RPM, settings.LLM_CHAT_TPM)
+        self.scheduler.register(self.embedding_deployment, settings.LLM_EMBEDDINGS_RPM, settings.LLM_EMBEDDINGS_TPM)
+        logger.info(f"FakeLLMProvider initialized with profile {self.profile}.")
+
+    def get_embeddings_model(self):
+        return self.embeddings_model
+
+    def get_chat_model(self):
+        return None  # There is no langchain chat model offline; use ask_with_context
+
+    async def _simulate_call(self, base_latency: float, tokens: int):
+        """Sleeps for the profile latency and raises simulated 429s and server errors."""
+        now = time.monotonic()
+        while self._usage and now - self._usage[0][0] > 60:
+            self._usage.popleft()
+        if settings.FAKE_LLM_TPM_QUOTA and sum(t for _, t in self._usage) + tokens > settings.FAKE_LLM_TPM_QUOTA:
+            raise FakeRateLimitError(retry_after=60 - (now - self._usage[0][0]) if self._usage else 1.0)
+        if self._random.random() < self.profile.rate_limit_rate:
+            raise FakeRateLimitError(retry_after=1.0)
+
+        latency = max(0.0, base_latency + self._random.uniform(-self.profile.jitter, self.profile.jitter))
+        if latency:
+            await asyncio.sleep(latency)
+        if self._random.random() < self.profile.error_rate:
+            raise FakeServerError("Simulated provider error (500)")
+        self._usage.append((time.monotonic(), tokens))
+
+    async def generate_query_embedding(self, query: str, priority: Priority = Priority.INTERACTIVE):
+        if not isinstance(query, str) or not query.strip():
+             logger.warning("generate_query_embedding received empty or invalid query.")
+             return None
+        tokens = estimate_tokens([query])
+        await self.scheduler.acquire(self.embedding_deployment, tokens, priority)
+        await self._simulate_call(self.profile.embedding_latency, tokens)
+        return self.embeddings_model.embed_query(query)
+
+    async def generate_document_embeddings(self, texts: list[str], priority: Priority = Priority.INGESTION):
+        valid_texts = [text for text in texts if isinstance(text, str) and text.strip()]
+        if not valid_texts:
+             logger.warning("generate_document_embeddings received no valid texts.")
+             return []
+
+        async def embed(batch: list[str]):
+            await self._simulate_call(self.profile.embedding_latency, estimate_tokens(batch))
+            return self.embeddings_model.embed_documents(batch)
+
+        return await self.scheduler.embed_in_batches(self.embedding_deployment, valid_texts, priority, embed)
+
+    async def ask_with_context(self, query: str, context: str, system_prompt: str,
+                               priority: Priority = Priority.INTERACTIVE):
+        tokens = estimate_tokens([system_prompt, context, query]) + settings.LLM_ESTIMATED_COMPLETION_TOKENS
+        await self.scheduler.acquire(self.chat_deployment, tokens, priority)
+        await self._simulate_call(self.profile.chat_latency, tokens)
+        return self._render_answer(query, context, system_prompt)
+
+    @staticmethod
+    def _render_answer(query: str, context: str, system_prompt: str) -> str:
+        """Picks a response template from the kind of output the system prompt asks for."""
+        if "SELECT" in system_prompt and "SQL" in system_prompt:
+            table = re.search(r"CREATE TABLE (\w+)", context)
+            return f"SELECT COUNT(*) AS row_count FROM {table.group(1) if table else 'sqlite_master'}"
+        if '"question"' in system_prompt:
+            return json.dumps([{"question": f"What are the key trends in question {i + 1}?", "context": "Generated offline"} for i in range(5)])
+        if "array of strings" in system_prompt:
+            return json.dumps(["Can you break this down by month?", "Which segment grew fastest?", "What are the outliers?"])
+        sources = context.count("Source: ")
+        answer = f"**Offline answer** to \"{query.strip()}\" based on {sources} context source(s) ({len(context):,} characters)."
+        if FOLLOWUP_MARKER in system_prompt:
+            answer += f"\n{FOLLOWUP_MARKER}\n" + json.dumps(["Can you break this down by month?", "Which segment grew fastest?", "What are the outliers?"])
+        return answer
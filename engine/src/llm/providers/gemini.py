@@ -0,0 +1,27 @@
+"""
+Google Gemini chat models for the LLM router (requires the optional langchain-google-genai package)
+"""
+import logging
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def create_gemini_chat_model(temperature: float = 0.7):
+    """Creates a Gemini chat model with the shared timeout and retry settings."""
+    try:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+    except ImportError as e:
+        raise ImportError("The 'gemini' LLM provider requires langchain-google-genai (pip install langchain-google-genai).") from e
+
+    if not settings.GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY is not set.")
+
+    logger.info(f"Initializing Gemini chat model ({settings.GEMINI_MODEL})...")
+    return ChatGoogleGenerativeAI(
+        model=settings.GEMINI_MODEL,
+        google_api_key=settings.GEMINI_API_KEY,
+        temperature=temperature,
+        timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+    )
@@ -0,0 +1,221 @@
+"""
+Quota-aware scheduler for LLM and embedding calls.
+
+Every call to a deployment first acquires capacity from that deployment's
+token buckets (requests per minute and tokens per minute, using pre-estimated
+token counts). Callers that cannot be served immediately wait in priority
+lanes, so interactive queries are always admitted before thread titles,
+thread summaries, recommendations and bulk ingestion embeddings.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from src.config.settings import settings
+from src.utils.metrics import LLM_TOKENS
+from src.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # Rough average for English text with OpenAI tokenizers
+
+
+class Priority(IntEnum):
+    """Priority lanes; lower values are admitted first."""
+    INTERACTIVE = 0
+    THREAD_TITLE = 1
+    THREAD_SUMMARY = 2
+    RECOMMENDATION = 3
+    INGESTION = 4
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    """Cheap token estimate used for TPM accounting before a call is made."""
+    return sum(len(t) // CHARS_PER_TOKEN + 1 for t in texts if t)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute: int, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be consumed (0 if available now)."""
+        self._refill()
+        missing = amount - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+
+class LaneStats:
+    __slots__ = ("queue_depth", "admitted", "total_wait_seconds", "max_wait_seconds")
+
+    def __init__(self):
+        self.queue_depth = 0
+        self.admitted = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "avg_wait_seconds": self.total_wait_seconds / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+class DeploymentLimiter:
+    """RPM/TPM limits for one deployment with a priority queue of waiting callers."""
+
+    def __init__(self, deployment: str, rpm: int, tpm: int, burst_seconds: float):
+        self.deployment = deployment
+        self.request_bucket = TokenBucket(rpm, burst_seconds) if rpm > 0 else None
+        self.token_bucket = TokenBucket(tpm, burst_seconds) if tpm > 0 else None
+        self._queue: List = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self.lanes: Dict[Priority, LaneStats] = {p: LaneStats() for p in Priority}
+
+    async def acquire(self, tokens: int, priority: Priority):
+        if self.token_bucket is not None:
+            # A single call larger than the burst capacity would otherwise never be admitted
+            tokens = min(tokens, self.token_bucket.capacity)
+        future = asyncio.get_running_loop().create_future()
+        enqueued_at = time.monotonic()
+        heapq.heappush(self._queue, (priority, next(self._sequence), tokens, future))
+        self.lanes[priority].queue_depth += 1
+        self._dispatch()
+        try:
+            await future
+        finally:
+            lane = self.lanes[priority]
+            if not future.done():
+                future.cancel()  # Caller went away; _dispatch drops the entry
+            elif not future.cancelled():
+                waited = time.monotonic() - enqueued_at
+                lane.admitted += 1
+                lane.total_wait_seconds += waited
+                lane.max_wait_seconds = max(lane.max_wait_seconds, waited)
+                if waited > 1.0:
+                    logger.info(f"[Scheduler] {priority.name} call to '{self.deployment}' waited {waited:.2f}s for quota.")
+
+    def _dispatch(self):
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._queue:
+            priority, _, tokens, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                self.lanes[priority].queue_depth -= 1
+                continue
+
+            wait = max(
+                self.request_bucket.wait_time(1) if self.request_bucket else 0.0,
+                self.token_bucket.wait_time(tokens) if self.token_bucket else 0.0,
+            )
+            if wait > 0:
+                # Strict priority: lower lanes stay queued behind the head until it is admitted
+                self._wakeup = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            if self.request_bucket:
+                self.request_bucket.consume(1)
+            if self.token_bucket:
+                self.token_bucket.consume(tokens)
+            heapq.heappop(self._queue)
+            self.lanes[priority].queue_depth -= 1
+            future.set_result(None)
+
+    @property
+    def limited(self) -> bool:
+        return self.request_bucket is not None or self.token_bucket is not None
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": sum(l.queue_depth for l in self.lanes.values()),
+            "lanes": {p.name.lower(): l.as_dict() for p, l in self.lanes.items()},
+        }
+
+
+class LLMScheduler:
+    """Central admission point for all LLM and embedding calls, keyed by deployment."""
+
+    def __init__(self):
+        self._limiters: Dict[str, DeploymentLimiter] = {}
+
+    def register(self, deployment: str, rpm: int, tpm: int):
+        """Configures limits for a deployment (0 disables a limit). Re-registering is a no-op."""
+        if deployment not in self._limiters:
+            logger.info(f"[Scheduler] Registering deployment '{deployment}' (rpm={rpm or 'unlimited'}, tpm={tpm or 'unlimited'}).")
+            self._limiters[deployment] = DeploymentLimiter(deployment, rpm, tpm, settings.LLM_RATE_LIMIT_BURST_SECONDS)
+
+    async def acquire(self, deployment: str, tokens: int, priority: Priority = Priority.INTERACTIVE):
+        """Waits until `deployment` has quota for one request of roughly `tokens` tokens."""
+        limiter = self._limiters.get(deployment)
+        if limiter is None:
+            self.register(deployment, 0, 0)
+            limiter = self._limiters[deployment]
+        await limiter.acquire(tokens, priority)
+        LLM_TOKENS.labels(deployment=deployment, lane=priority.name.lower()).inc(tokens)
+
+    def is_limited(self, deployment: str) -> bool:
+        """Whether an RPM or TPM limit is configured for `deployment`."""
+        limiter = self._limiters.get(deployment)
+        return limiter is not None and limiter.limited
+
+    async def embed_in_batches(self, deployment: str, texts: List[str], priority: Priority,
+                               embed: Callable[[List[str]], Awaitable[List[List[float]]]]) -> List[List[float]]:
+        """
+        Embeds `texts` with `embed(batch)`, returning vectors in input order.
+        Without limits on the deployment all texts go out in one call (the client
+        splits them into request-sized chunks itself). With limits they are split
+        into EMBEDDING_BATCH_SIZE batches, each admitted separately so higher
+        priority calls can be scheduled in between, with up to EMBEDDING_CONCURRENCY
+        batches in flight.
+        """
+        batch_size = len(texts) if not self.is_limited(deployment) else max(1, settings.EMBEDDING_BATCH_SIZE)
+        semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_CONCURRENCY))
+
+        async def run_batch(start: int) -> List[List[float]]:
+            batch = texts[start:start + batch_size]
+            tokens = estimate_tokens(batch)
+            async with semaphore:
+                with span("embedding_batch", deployment=deployment, texts=len(batch), tokens=tokens, offset=start):
+                    await self.acquire(deployment, tokens, priority)
+                    return await embed(batch)
+
+        results = await asyncio.gather(*(run_batch(start) for start in range(0, len(texts), batch_size)))
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def stats(self) -> Dict:
+        """Queue depth and wait-time metrics per deployment and lane."""
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+
+# --- Global Instance Management ---
+_scheduler_instance = None
+
+def get_scheduler() -> LLMScheduler:
+    """Returns the process-wide scheduler."""
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        _scheduler_instance = LLMScheduler()
+    return _scheduler_instance
@@ -1,18 +1,27 @@
 # src/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import os
 # Import router modules directly
 from src.api.routers import router as api_router
-from src.database.vector_db.qdrant_client import initialize_qdrant_client # For startup check
-from src.database.relational.init_db import init_database # For database initialization
+from src.lifespan import lifespan, readiness, is_ready # Warm-up and shutdown of shared clients
+from src.utils.metrics import render_metrics
+from src.utils.tracing import TRACE_HEADER, install_log_trace_ids, span
+from src.utils.profiling import profile_request, profiling_requested, require_profiling_admin
+from src.utils.responses import (
+    EngineResponse, NegotiateEncodingMiddleware, http_exception_handler, validation_exception_handler
+)
 
-# Configure basic logging
+# Configure basic logging (records carry the active trace ID)
+install_log_trace_ids()
 log_level = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(
     level=log_level,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - [trace=%(trace_id)s] %(message)s'
 )
 logger = logging.getLogger(__name__)
 
@@ -20,11 +29,51 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Chat4BA Engine API",
     description="API for uploading documents and querying them using Azure OpenAI and Qdrant.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=EngineResponse  # orjson, or msgpack when the client asks for it
 )
 
+# --- Response Encoding ---
+# `Accept: application/msgpack` switches EngineResponses of the request, errors included, to msgpack
+app.add_middleware(NegotiateEncodingMiddleware)
+app.add_exception_handler(StarletteHTTPException, http_exception_handler)
+app.add_exception_handler(RequestValidationError, validation_exception_handler)
+
+# --- Profiling Middleware ---
+# Opt-in per request (X-Profile: 1 or ?profile=1), admins only
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if not profiling_requested(request):
+        return await call_next(request)
+    try:
+        require_profiling_admin(request)
+    except HTTPException as e:
+        return EngineResponse(status_code=e.status_code, content={"detail": e.detail})
+    return await profile_request(request, call_next)
+
+# --- Tracing Middleware ---
+# Wraps every other middleware but CORS; background tasks of the request join its trace
+UNTRACED_PATHS = {"/healthz", "/readyz", "/metrics"}  # Probes and scrapes would drown out real requests
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    if request.url.path in UNTRACED_PATHS:
+        return await call_next(request)
+    with span(f"{request.method} {request.url.path}", traceparent=request.headers.get("traceparent"),
+              method=request.method, path=request.url.path) as request_span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        if route is not None:
+            request_span.name = f"{request.method} {route.path}"
+        request_span.set(status_code=response.status_code)
+        response.headers[TRACE_HEADER] = request_span.trace_id
+        return response
+
 # --- CORS Middleware ---
-# Allow requests from frontend with proper preflight handling
+# Allow requests from frontend with proper preflight handling.
+# Added last so it is the outermost layer: responses that middlewares return
+# early (e.g. profiling's 401/403) still carry CORS headers and reach the browser.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],       # Allow all origins for development
@@ -34,32 +83,6 @@ app.add_middleware(
     expose_headers=["*"]       # Expose all headers
 )
 
-# --- Event Handlers ---
-@app.on_event("startup")
-async def startup_event():
-    """Initialize resources on startup."""
-    logger.info("Application startup sequence initiated...")
-    try:
-        # Initialize database tables
-        init_database()
-        logger.info("Database tables initialized successfully on startup.")
-        
-        # Initialize Qdrant client and check connection
-        initialize_qdrant_client()
-        logger.info("Qdrant client connection checked successfully on startup.")
-        # Note: AzureOpenAIProvider is initialized lazily via dependency injection
-    except Exception as e:
-         logger.critical(f"CRITICAL: Failed to initialize resources on startup: {e}", exc_info=True)
-         # Depending on policy, you might exit or just log the error
-         # raise RuntimeError("Failed to initialize critical resources.") from e
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Clean up resources on shutdown (if necessary)."""
-    logger.info("Application shutdown sequence initiated...")
-    # Add cleanup logic here if needed (e.g., closing database connections)
-    logger.info("Application shutdown complete.")
-
 # --- Root Endpoint ---
 @app.get("/", tags=["Root"])
 async def read_root():
@@ -70,6 +93,26 @@ async def read_root():
         "redoc_url": "/redoc"
     }
 
+# --- Probes ---
+@app.get("/healthz", tags=["Root"])
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["Root"])
+async def readyz():
+    """Readiness: 503 until the database, Qdrant and LLM clients are warm."""
+    return EngineResponse(
+        status_code=200 if is_ready() else 503,
+        content={"ready": is_ready(), "components": readiness}
+    )
+
+@app.get("/metrics", tags=["Root"])
+async def metrics():
+    """Prometheus metrics: per-stage latency, token counts, throughput, cache hits and in-flight requests."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # --- Include API Routers ---
 # Use the main router that includes all sub-routers
 app.include_router(api_router, prefix="/api")
@@ -0,0 +1,129 @@
+# src/processing/file_catalog.py
+"""
+Catalog of ingested files kept in the main SQL database.
+
+Maps each filename to its Qdrant collection, point and row counts, table schema
+and content hash, so endpoints can find a file without listing and probing every
+collection. Maintained by FileProcessor at ingest time and by the delete endpoint.
+"""
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional
+from src.database.relational.connection import SessionLocal
+from src.database.relational.crud.file_catalog import (
+    upsert_file_entry, get_file_entry, get_file_entries, delete_file_entry, delete_entries_for_collection
+)
+from src.database.relational import table_store
+from src.utils.metrics import add_known_collection, discard_known_collection, set_known_collections
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_COLLECTION_PREFIX = "chat4ba_"  # Thread collections, never part of the catalog
+
+
+def hash_file(file_path: str) -> str:
+    """SHA-256 of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _entry_to_dict(entry) -> Dict:
+    return {
+        "filename": entry.filename,
+        "collection_name": entry.collection_name,
+        "point_count": entry.point_count,
+        "row_count": entry.row_count,
+        "schema": json.loads(entry.table_schema) if entry.table_schema else [],
+        "content_hash": entry.content_hash,
+        "ingested_at": entry.ingested_at.isoformat() if entry.ingested_at else None,
+    }
+
+
+def catalog_file(filename: str, collection_name: str, point_count: int,
+                 tables: List[Dict], content_hash: Optional[str]) -> Dict:
+    """Records (or replaces) the catalog entry of an ingested file."""
+    db = SessionLocal()
+    try:
+        entry = upsert_file_entry(
+            db, filename, collection_name,
+            point_count=point_count,
+            row_count=sum(t["row_count"] for t in tables) if tables else None,
+            table_schema=json.dumps(tables) if tables else None,
+            content_hash=content_hash,
+        )
+        add_known_collection(collection_name)
+        return _entry_to_dict(entry)
+    finally:
+        db.close()
+
+
+def lookup_file(name: str) -> Optional[Dict]:
+    """Finds a file by filename or collection name; None if it is not catalogued."""
+    db = SessionLocal()
+    try:
+        entry = get_file_entry(db, name)
+        return _entry_to_dict(entry) if entry else None
+    finally:
+        db.close()
+
+
+def list_files() -> List[Dict]:
+    db = SessionLocal()
+    try:
+        return [_entry_to_dict(entry) for entry in get_file_entries(db)]
+    finally:
+        db.close()
+
+
+def catalog_collections() -> List[str]:
+    """Distinct collections holding catalogued files, in name order."""
+    collections = sorted({f["collection_name"] for f in list_files()})
+    set_known_collections(collections)
+    return collections
+
+
+def remove_file(filename: str) -> int:
+    db = SessionLocal()
+    try:
+        return delete_file_entry(db, filename)
+    finally:
+        db.close()
+
+
+def remove_collection(collection_name: str) -> int:
+    db = SessionLocal()
+    try:
+        removed = delete_entries_for_collection(db, collection_name)
+        discard_known_collection(collection_name)
+        return removed
+    finally:
+        db.close()
+
+
+def backfill_catalog(client) -> int:
+    """
+    Adds catalog entries for collections ingested before the catalog existed, so
+    the catalog can be used as the list of files. Returns the number of entries added.
+    """
+    catalogued = set(catalog_collections())
+    added = 0
+    for collection in client.get_collections().collections:
+        name = collection.name
+        if name.startswith(SYSTEM_COLLECTION_PREFIX) or name in catalogued:
+            continue
+        try:
+            points = client.scroll(collection_name=name, limit=1, with_payload=True, with_vectors=False)[0]
+            metadata = points[0].payload.get("metadata", {}) if points else {}
+            filename = metadata.get("source") or metadata.get("filename") or name
+            point_count = client.count(collection_name=name, exact=True).count
+            catalog_file(filename, name, point_count, table_store.get_table_schemas([name]), content_hash=None)
+            added += 1
+        except Exception as e:
+            logger.warning(f"Could not add collection '{name}' to the file catalog: {e}")
+    if added:
+        logger.info(f"Backfilled {added} file catalog entries from existing collections.")
+    return added
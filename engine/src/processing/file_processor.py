@@ -1,35 +1,56 @@
 # src/processing/file_processor.py
 import os
+import asyncio
+import time
 import logging
 import uuid
-from langchain_community.document_loaders import UnstructuredCSVLoader, UnstructuredExcelLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 # Import the provider TYPE for type hinting
 from src.llm.providers.azure_openai import AzureOpenAIProvider
 # Import the database functions
 from src.database.vector_db.qdrant_client import setup_collection, upsert_vectors
+from src.database.relational import table_store
+from src.config.settings import settings
+from src.processing.recommendations import build_data_profile, generate_file_recommendations, store_file_recommendations
+from src.processing.file_catalog import hash_file, catalog_file
+from src.utils.metrics import IN_FLIGHT, INGEST_POINTS, INGEST_POINTS_PER_SECOND, collection_label, observe_ingest_stage
+from src.utils.tracing import span, traced
+from src.utils.profiling import memory_profile
 
 logger = logging.getLogger(__name__)
 
-EXPECTED_VECTOR_SIZE = 3072  # Define this constant for embedding vector size
-
 class FileProcessor:
     @staticmethod
-    def _load_and_chunk_file(file_path: str) -> list:
+    def _collection_name(original_file_name: str) -> str:
+        """Derives the Qdrant collection name from the uploaded file name."""
+        collection_base_name = os.path.splitext(original_file_name)[0]
+        # Clean the name: replace non-alphanumeric with underscore, lowercase, remove leading/trailing underscores
+        collection_name = "".join(c if c.isalnum() else '_' for c in collection_base_name).lower().strip('_')
+        if not collection_name: # Handle cases where name becomes empty (e.g., filename was just '.')
+             collection_name = f"file_{uuid.uuid4().hex[:8]}" # Generate a fallback name
+        return collection_name
+
+    @staticmethod
+    @traced("_load_and_chunk_file")
+    def _load_and_chunk_file(file_path: str, collection_name: str = "") -> list:
         """Loads and chunks documents from a file path. Returns list of LangChain Document objects."""
+        # The unstructured/langchain parsing stack is only loaded when a file is processed
+        from langchain_community.document_loaders import UnstructuredCSVLoader, UnstructuredExcelLoader
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         ext = os.path.splitext(file_path)[1].lower()
         logger.info(f"Loading and chunking file: {file_path} with extension {ext}")
 
         docs = [] # Initialize docs list
         try:
-            if ext == ".csv":
-                loader = UnstructuredCSVLoader(file_path, mode="elements", encoding='utf-8-sig')
-                docs = loader.load()
-            elif ext in (".xlsx", ".xls"):
-                loader = UnstructuredExcelLoader(file_path, mode="elements")
-                docs = loader.load()
-            else:
-                raise ValueError(f"Unsupported file type: {ext}")
+            with observe_ingest_stage("parse", collection_name):
+                if ext == ".csv":
+                    loader = UnstructuredCSVLoader(file_path, mode="elements", encoding='utf-8-sig')
+                    docs = loader.load()
+                elif ext in (".xlsx", ".xls"):
+                    loader = UnstructuredExcelLoader(file_path, mode="elements")
+                    docs = loader.load()
+                else:
+                    raise ValueError(f"Unsupported file type: {ext}")
 
             if not docs:
                  logger.warning(f"No documents loaded from {file_path}. The file might be empty or unparseable.")
@@ -47,7 +68,8 @@ class FileProcessor:
                 chunk_size=1000, chunk_overlap=150, length_function=len,
                 separators=["\n\n", "\n", ". ", ", ", " ", ""], add_start_index=True
             )
-            chunks = text_splitter.split_documents(docs)
+            with observe_ingest_stage("chunk", collection_name):
+                chunks = text_splitter.split_documents(docs)
             logger.info(f"Split into {len(chunks)} final chunks.")
         except Exception as e:
              logger.error(f"Error splitting documents from {file_path}: {e}", exc_info=True)
@@ -77,15 +99,31 @@ class FileProcessor:
         logger.info(f"Returning {len(valid_chunks)} valid chunks for '{original_filename}'.")
         return valid_chunks
 
-    async def process_and_store(self, file_path: str, original_file_name: str, azure_provider: AzureOpenAIProvider):
+    async def process_and_store(self, file_path: str, original_file_name: str, azure_provider: AzureOpenAIProvider,
+                                memory_snapshots: bool = False):
         """
         Processes a single file: loads, chunks, generates embeddings, and stores in Qdrant.
-        Requires the AzureOpenAIProvider instance to be passed.
+        Requires the AzureOpenAIProvider instance to be passed. With `memory_snapshots`,
+        a tracemalloc snapshot is stored after every stage and its ID returned.
         """
+        with IN_FLIGHT.labels(endpoint="process_and_store").track_inprogress(), \
+                span("process_and_store", file=original_file_name, bytes=os.path.getsize(file_path) if os.path.exists(file_path) else 0) as ingest_span:
+            if not memory_snapshots:
+                result = await self._process_and_store(file_path, original_file_name, azure_provider)
+            else:
+                with memory_profile(f"process_and_store {original_file_name}") as profile:
+                    result = await self._process_and_store(file_path, original_file_name, azure_provider)
+                result["memory_profile_id"] = profile.profile_id
+            ingest_span.set(chunks=result["chunks_processed"], points=result["points_stored"])
+            return result
+
+    async def _process_and_store(self, file_path: str, original_file_name: str, azure_provider: AzureOpenAIProvider):
         logger.info(f"Starting process_and_store for '{original_file_name}'...")
+        # Known up front so every stage can be labelled with it
+        collection_name = self._collection_name(original_file_name)
         try:
             # 1. Load and Chunk using the static method
-            chunks = self._load_and_chunk_file(file_path) # Returns list of LangChain Document objects
+            chunks = self._load_and_chunk_file(file_path, collection_name) # Returns list of LangChain Document objects
             if not chunks:
                 # If loading/chunking failed or produced nothing, return early
                 logger.warning(f"No valid chunks generated for {original_file_name}. Aborting storage.")
@@ -101,35 +139,66 @@ class FileProcessor:
 
             # 2. Generate Embeddings using the passed provider instance
             logger.info(f"Generating embeddings for {len(texts)} chunks for {original_file_name}...")
-            vectors = await azure_provider.generate_document_embeddings(texts)
+            store_start = time.perf_counter()
+            with observe_ingest_stage("embed", collection_name) as embed_span:
+                embed_span.set(texts=len(texts), characters=sum(len(t) for t in texts))
+                vectors = await azure_provider.generate_document_embeddings(texts)
             logger.info(f"Generated {len(vectors)} vectors for {original_file_name}.")
 
             # Validate embedding count
             if len(vectors) != len(texts):
                 raise RuntimeError(f"Embedding count mismatch for {original_file_name}: {len(texts)} texts vs {len(vectors)} vectors.")
 
-            # 3. Prepare Qdrant Collection Name
-            collection_base_name = os.path.splitext(original_file_name)[0]
-            # Clean the name: replace non-alphanumeric with underscore, lowercase, remove leading/trailing underscores
-            collection_name = "".join(c if c.isalnum() else '_' for c in collection_base_name).lower().strip('_')
-            if not collection_name: # Handle cases where name becomes empty (e.g., filename was just '.')
-                 collection_name = f"file_{uuid.uuid4().hex[:8]}" # Generate a fallback name
+            # 3. Qdrant Collection Name (derived from the file name above)
             logger.info(f"Target collection for {original_file_name}: {collection_name}")
 
             # 4. Setup Qdrant Collection (ensure size matches embedding model)
             # Pass the expected vector size explicitly
-            setup_collection(collection_name, vector_size=EXPECTED_VECTOR_SIZE)
+            setup_collection(collection_name, vector_size=settings.EMBEDDING_DIMENSION)
 
             # 5. Upsert Vectors into Qdrant
             # Pass texts, metadatas, and vectors
-            num_stored = await upsert_vectors(collection_name, texts, metadatas, vectors)
+            with observe_ingest_stage("upsert", collection_name):
+                num_stored = await upsert_vectors(collection_name, texts, metadatas, vectors)
+            INGEST_POINTS.labels(collection=collection_label(collection_name)).inc(num_stored)
+            INGEST_POINTS_PER_SECOND.labels(collection=collection_label(collection_name)).set(num_stored / max(time.perf_counter() - store_start, 1e-9))
             logger.info(f"Storage process complete for {original_file_name}. Stored {num_stored} points in '{collection_name}'.")
 
+            # 6. Keep the raw table in the local SQL store for structured (SQL) queries
+            # A failure here should not fail the vector ingestion that already succeeded
+            tables = []
+            try:
+                with observe_ingest_stage("tables", collection_name):
+                    tables = await asyncio.to_thread(table_store.store_file_tables, file_path, collection_name)
+            except Exception as e:
+                logger.warning(f"Could not store SQL table(s) for {original_file_name}: {e}", exc_info=True)
+
+            # 7. Precompute recommended questions from the data profile (replaces earlier ones for this file)
+            recommendations_stored = 0
+            try:
+                with observe_ingest_stage("recommendations", collection_name):
+                    data_profile = build_data_profile(tables, texts)
+                    questions = await generate_file_recommendations(original_file_name, data_profile, azure_provider)
+                    recommendations_stored = await asyncio.to_thread(store_file_recommendations, original_file_name, collection_name, questions)
+                logger.info(f"Stored {recommendations_stored} recommended questions for {original_file_name}.")
+            except Exception as e:
+                logger.warning(f"Could not generate recommended questions for {original_file_name}: {e}", exc_info=True)
+
+            # 8. Record the file in the catalog so endpoints can find it without scanning collections
+            try:
+                with observe_ingest_stage("catalog", collection_name):
+                    content_hash = await asyncio.to_thread(hash_file, file_path)
+                    await asyncio.to_thread(catalog_file, original_file_name, collection_name, num_stored, tables, content_hash)
+            except Exception as e:
+                logger.warning(f"Could not record {original_file_name} in the file catalog: {e}", exc_info=True)
+
             # Return success details
             return {
                 "collection_name": collection_name,
                 "chunks_processed": len(chunks),
                 "points_stored": num_stored,
+                "tables": [t["table"] for t in tables],
+                "recommendations_stored": recommendations_stored,
                 "status": "Success"
             }
         except Exception as e:
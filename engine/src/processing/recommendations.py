@@ -0,0 +1,79 @@
+# src/processing/recommendations.py
+"""
+Recommended questions generated once per file at ingest time from its data profile
+"""
+import re
+import json
+import random
+import logging
+from typing import Dict, List
+from src.database.relational.connection import SessionLocal
+from src.database.relational.crud.recommendation import replace_file_recommendations, get_all_recommendations
+from src.llm.scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS_PER_FILE = 5
+
+RECOMMENDATION_SYSTEM_PROMPT = """You are a helpful AI assistant that generates relevant questions for data analysis.
+Always respond with valid JSON in the format: [{"question": "...", "context": "..."}]"""
+
+
+def build_data_profile(tables: List[Dict], sample_texts: List[str]) -> str:
+    """Summarizes a file for the prompt: table schemas when available, otherwise sample chunks."""
+    if tables:
+        return "\n".join(
+            f"Table {t['table']} ({t['row_count']:,} rows): " + ", ".join(f"{c['name']} {c['type']}" for c in t['columns'])
+            for t in tables
+        )
+    return "\n---\n".join(text[:500] for text in sample_texts[:3])
+
+
+async def generate_file_recommendations(filename: str, data_profile: str, provider, count: int = QUESTIONS_PER_FILE) -> List[Dict]:
+    """Asks the LLM for `count` questions about one file, grounded in its data profile."""
+    prompt = f"""Based on the data profile of the file '{filename}',
+generate {count} relevant questions that a user might want to ask about this data.
+The questions should be diverse, reference real columns and cover different aspects of the data.
+Format your response as a JSON array of objects with 'question' and 'context' fields."""
+
+    response_text = await provider.ask_with_context(prompt, data_profile, RECOMMENDATION_SYSTEM_PROMPT, Priority.RECOMMENDATION)
+    json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
+    if not json_match:
+        raise ValueError("LLM response did not contain a JSON array.")
+    questions = [q for q in json.loads(json_match.group()) if isinstance(q, dict) and q.get('question')]
+    return [{"question": str(q['question']), "context": str(q.get('context', ''))} for q in questions[:count]]
+
+
+def store_file_recommendations(filename: str, collection_name: str, questions: List[Dict]) -> int:
+    db = SessionLocal()
+    try:
+        return replace_file_recommendations(db, filename, collection_name, questions)
+    finally:
+        db.close()
+
+
+def sample_recommendations(count: int) -> List[Dict]:
+    """
+    Samples `count` stored questions, spreading them across files round-robin so
+    every file is represented before any file contributes a second question.
+    """
+    db = SessionLocal()
+    try:
+        rows = get_all_recommendations(db)
+    finally:
+        db.close()
+
+    by_file: Dict[str, List[Dict]] = {}
+    for row in rows:
+        by_file.setdefault(row.filename, []).append({"question": row.question, "context": row.context or ""})
+    for questions in by_file.values():
+        random.shuffle(questions)
+
+    files = list(by_file)
+    random.shuffle(files)
+    merged = []
+    while len(merged) < count and any(by_file.values()):
+        for filename in files:
+            if by_file[filename] and len(merged) < count:
+                merged.append(by_file[filename].pop())
+    return merged
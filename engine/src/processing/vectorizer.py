@@ -2,6 +2,7 @@ import uuid
 from qdrant_client.models import PointStruct, VectorParams, Distance
 from src.database.vector_db.qdrant_client import get_qdrant_client
 from src.llm.providers.azure_openai import get_embeddings
+from src.config.settings import settings
 import numpy as np
 
 def store_texts_in_qdrant(texts, metadatas, collection_name):
@@ -26,7 +27,7 @@ def store_texts_in_qdrant(texts, metadatas, collection_name):
     if collection_name not in collection_names:
         client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=3072, distance=Distance.COSINE)
+            vectors_config=VectorParams(size=settings.EMBEDDING_DIMENSION, distance=Distance.COSINE)
         )
     
     # Create points with embeddings
@@ -51,8 +52,8 @@ def store_texts_in_qdrant(texts, metadatas, collection_name):
             embedding = embeddings.embed_query(text)
             
             # Validate embedding dimension
-            if len(embedding) != 3072:
-                print(f"[Vectorizer] Skipping point {i}: Unexpected embedding dimension {len(embedding)} (expected 3072). Text: {text[:100]}...")
+            if len(embedding) != settings.EMBEDDING_DIMENSION:
+                print(f"[Vectorizer] Skipping point {i}: Unexpected embedding dimension {len(embedding)} (expected {settings.EMBEDDING_DIMENSION}). Text: {text[:100]}...")
                 skipped_count += 1
                 continue
                 
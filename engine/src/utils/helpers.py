@@ -0,0 +1,88 @@
+import asyncio
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+from src.utils.metrics import SINGLE_FLIGHT_IN_FLIGHT, record_cache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight computation.
+    The first caller starts the work; callers arriving while it runs await the
+    same task and receive its result (or exception). The computation runs as its
+    own task, so a leader that disconnects does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.executed_count = 0
+        self.coalesced_count = 0
+        SINGLE_FLIGHT_IN_FLIGHT.labels(name=name).set_function(lambda: len(self._inflight))
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.executed_count += 1
+            record_cache(f"single_flight:{self.name}", hit=False)
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.coalesced_count += 1
+            record_cache(f"single_flight:{self.name}", hit=True)
+            logger.debug(f"[{self.name}] Coalesced request onto in-flight computation for key {key!r}")
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every waiter went away
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "executed": self.executed_count,
+            "coalesced": self.coalesced_count,
+            "in_flight": len(self._inflight),
+        }
+
+
+class TTLCache:
+    """
+    Small in-process cache whose entries expire `ttl` seconds after being set.
+    When full, expired entries are dropped first, then the oldest ones.
+    """
+
+    def __init__(self, name: str, ttl: float, max_size: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: Dict[Hashable, Any] = {}  # key -> (expires_at, value), in insertion order
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            record_cache(self.name, hit=True)
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        record_cache(self.name, hit=False)
+        return None
+
+    def set(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.max_size:
+            for k in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[k]
+            while len(self._entries) >= self.max_size:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (now + self.ttl, value)
+
+    def pop(self, key: Hashable):
+        self._entries.pop(key, None)
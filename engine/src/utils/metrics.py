@@ -0,0 +1,97 @@
+"""
+Prometheus metrics, exposed on /metrics.
+
+Stage histograms split a query or an ingestion into its parts (embedding,
+Qdrant search, context building, LLM; parse, chunk, embed, upsert) so a slow
+request can be attributed to one of them. Labels: `endpoint` is the pipeline
+(process_query, cross_collection_query, process_and_store) and `collection` the
+Qdrant collection, or "*" for stages that span several collections. Collection
+names come from clients, so only catalogued collections get their own series;
+anything else is recorded as "unknown".
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterable, Set
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from src.utils.tracing import span
+from src.utils.profiling import memory_checkpoint
+
+MULTI_COLLECTION = "*"
+UNKNOWN_COLLECTION = "unknown"
+
+# Query stages are dominated by network round trips; ingestion stages can take minutes
+QUERY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+INGEST_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_DURATION = Histogram(
+    "chat4ba_stage_duration_seconds", "Duration of one stage of a query or ingestion",
+    ["endpoint", "stage", "collection"], buckets=QUERY_BUCKETS,
+)
+INGEST_STAGE_DURATION = Histogram(
+    "chat4ba_ingest_stage_duration_seconds", "Duration of one stage of a file ingestion",
+    ["endpoint", "stage", "collection"], buckets=INGEST_BUCKETS,
+)
+IN_FLIGHT = Gauge("chat4ba_in_flight_requests", "Requests currently being processed", ["endpoint"])
+LLM_TOKENS = Counter(
+    "chat4ba_llm_tokens_total", "Estimated tokens admitted by the LLM scheduler", ["deployment", "lane"],
+)
+INGEST_POINTS = Counter("chat4ba_ingest_points_total", "Points upserted into Qdrant by ingestion", ["collection"])
+INGEST_POINTS_PER_SECOND = Gauge(
+    "chat4ba_ingest_points_per_second", "Embed and upsert throughput of the last ingestion", ["collection"],
+)
+CACHE_REQUESTS = Counter(
+    "chat4ba_cache_requests_total", "Cache lookups by cache and result (hit or miss)", ["cache", "result"],
+)
+SINGLE_FLIGHT_IN_FLIGHT = Gauge(
+    "chat4ba_single_flight_in_flight", "Coalesced computations currently running", ["name"],
+)
+
+
+# Collections in the file catalog, kept in sync by src.processing.file_catalog
+_known_collections: Set[str] = set()
+
+
+def set_known_collections(names: Iterable[str]):
+    _known_collections.clear()
+    _known_collections.update(names)
+
+
+def add_known_collection(name: str):
+    _known_collections.add(name)
+
+
+def discard_known_collection(name: str):
+    _known_collections.discard(name)
+
+
+def collection_label(collection: str) -> str:
+    """Bounded `collection` label value: the name if catalogued, else "unknown"."""
+    return collection if collection == MULTI_COLLECTION or collection in _known_collections else UNKNOWN_COLLECTION
+
+
+@contextmanager
+def observe_stage(endpoint: str, stage: str, collection: str = MULTI_COLLECTION, histogram: Histogram = STAGE_DURATION):
+    """Times the enclosed block into the stage histogram (also when it raises) and traces it as a span."""
+    start = time.perf_counter()
+    try:
+        with span(f"{endpoint}.{stage}", collection=collection) as stage_span:
+            yield stage_span
+    finally:
+        histogram.labels(endpoint=endpoint, stage=stage, collection=collection_label(collection)).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def observe_ingest_stage(stage: str, collection: str):
+    """Like observe_stage; also snapshots memory after the stage when the ingestion is memory-profiled."""
+    with observe_stage("process_and_store", stage, collection, INGEST_STAGE_DURATION) as stage_span:
+        yield stage_span
+    memory_checkpoint(stage)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render_metrics():
+    """Returns the exposition body and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,206 @@
+"""
+Opt-in, admin-only profiling (PROFILING_ENABLED).
+
+- CPU: a request sent with `X-Profile: 1` or `?profile=1` runs under the
+  pyinstrument sampling profiler; the HTML report is stored in PROFILE_DIR and
+  its ID returned in the X-Profile-Id header (fetch it from /api/monitoring/profiles).
+- Memory: an ingestion started with `memory_profile=true` takes a tracemalloc
+  snapshot after every process_and_store stage and stores the per-stage current
+  and peak traced memory with the top allocation sites as JSON. tracemalloc is
+  process-wide, so allocations of concurrent work land in the same snapshots.
+"""
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{16}$")
+PROFILE_EXTENSIONS = {".html": "cpu", ".json": "memory"}
+MEMORY_TRACE_FRAMES = 1  # Allocation sites are grouped by line, so one frame is enough
+MEMORY_TOP_ALLOCATIONS = 15
+
+
+def require_profiling_admin(request):
+    """Raises 403 unless profiling is enabled and the bearer token belongs to an admin."""
+    from src.api.services.session_service import get_admin_user
+
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (PROFILING_ENABLED).")
+    get_admin_user(request)
+
+
+def new_profile_id() -> str:
+    return secrets.token_hex(8)
+
+
+def _save(profile_id: str, extension: str, content: str) -> str:
+    """Writes a report to PROFILE_DIR, keeping only the newest PROFILE_HISTORY reports."""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILE_DIR, profile_id + extension)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    reports = sorted((e for e in os.scandir(settings.PROFILE_DIR) if e.is_file()), key=lambda e: e.stat().st_mtime)
+    for old in reports[:max(0, len(reports) - settings.PROFILE_HISTORY)]:
+        os.remove(old.path)
+    return path
+
+
+def list_profiles() -> List[Dict]:
+    """Stored reports, newest first."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.PROFILE_DIR):
+        profile_id, extension = os.path.splitext(entry.name)
+        if extension in PROFILE_EXTENSIONS and PROFILE_ID_RE.match(profile_id):
+            stat = entry.stat()
+            profiles.append({"profile_id": profile_id, "kind": PROFILE_EXTENSIONS[extension],
+                             "created_at": stat.st_mtime, "size_bytes": stat.st_size})
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+
+def get_profile_path(profile_id: str) -> Optional[str]:
+    """Path of a stored report, or None (IDs are validated so they cannot escape PROFILE_DIR)."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    for extension in PROFILE_EXTENSIONS:
+        path = os.path.join(settings.PROFILE_DIR, profile_id + extension)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+# --- CPU ---
+def profiling_requested(request) -> bool:
+    return request.headers.get(PROFILE_HEADER) == "1" or request.query_params.get("profile") in ("1", "true")
+
+
+async def profile_request(request, call_next):
+    """Runs one request under the sampling profiler and stores the HTML report."""
+    from pyinstrument import Profiler
+
+    profiler = Profiler(interval=settings.PROFILE_SAMPLE_INTERVAL_SECONDS, async_mode="enabled")
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    profile_id = new_profile_id()
+    _save(profile_id, ".html", profiler.output_html())
+    logger.info(f"Stored CPU profile {profile_id} for {request.method} {request.url.path} ({profiler.last_session.duration:.3f}s).")
+    response.headers[PROFILE_ID_HEADER] = profile_id
+    return response
+
+
+# --- Memory ---
+# tracemalloc is process-wide: tracing runs while any profile is active and is
+# only stopped by the last one to finish (and never if something else started it)
+_tracing_lock = threading.Lock()
+_active_profiles = 0
+_started_tracing = False
+
+
+def _acquire_tracing():
+    global _active_profiles, _started_tracing
+    with _tracing_lock:
+        if _active_profiles == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_TRACE_FRAMES)
+            _started_tracing = True
+        _active_profiles += 1
+
+
+def _release_tracing():
+    global _active_profiles, _started_tracing
+    with _tracing_lock:
+        _active_profiles -= 1
+        if _active_profiles == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+class MemoryProfile:
+    """tracemalloc snapshots taken at stage boundaries, diffed against the previous stage."""
+
+    def __init__(self, label: str):
+        self.profile_id = new_profile_id()
+        self.label = label
+        self.stages: List[Dict] = []
+        self._previous = None
+
+    def start(self):
+        _acquire_tracing()
+        self._previous = self._snapshot()
+        tracemalloc.reset_peak()
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def checkpoint(self, stage: str):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self._snapshot()
+        top = snapshot.compare_to(self._previous, "lineno")[:MEMORY_TOP_ALLOCATIONS]
+        self.stages.append({
+            "stage": stage,
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top_allocations": [
+                {"location": str(stat.traceback[0]), "size_bytes": stat.size, "size_diff_bytes": stat.size_diff,
+                 "count_diff": stat.count_diff}
+                for stat in top
+            ],
+        })
+        self._previous = snapshot
+        tracemalloc.reset_peak()  # The next stage's peak is its own
+
+    def finish(self) -> str:
+        """Releases tracing (stopped once no profile is active) and stores the report."""
+        _release_tracing()
+        self._previous = None
+        report = {"profile_id": self.profile_id, "label": self.label, "created_at": time.time(), "stages": self.stages}
+        _save(self.profile_id, ".json", json.dumps(report, indent=2))
+        logger.info(f"Stored memory profile {self.profile_id} for {self.label} ({len(self.stages)} stages).")
+        return self.profile_id
+
+
+_memory_profile: ContextVar[Optional[MemoryProfile]] = ContextVar("memory_profile", default=None)
+
+
+@contextmanager
+def memory_profile(label: str):
+    """Activates stage snapshots for the enclosed work (see memory_checkpoint)."""
+    profile = MemoryProfile(label)
+    profile.start()
+    token = _memory_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _memory_profile.reset(token)
+        try:
+            profile.finish()
+        except Exception as e:
+            logger.warning(f"Could not store memory profile {profile.profile_id}: {e}")
+
+
+def memory_checkpoint(stage: str):
+    """Records a snapshot for `stage` when a memory profile is active; a no-op otherwise."""
+    profile = _memory_profile.get()
+    if profile is not None:
+        try:
+            profile.checkpoint(stage)
+        except Exception as e:
+            # Profiling must never fail the work being profiled
+            logger.warning(f"Memory checkpoint '{stage}' of profile {profile.profile_id} failed: {e}")
@@ -0,0 +1,133 @@
+"""
+Response encoding: orjson by default, msgpack on request.
+
+EngineResponse is the app's default response class and the class routers use
+when they build responses themselves. It renders with orjson, or with msgpack
+when the client's Accept header prefers application/msgpack. Response classes
+never see the request, so the negotiation result is set once per request by
+NegotiateEncodingMiddleware and read from a context variable. HTTP and
+validation errors go through handlers that render with EngineResponse as well.
+"""
+import datetime
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import msgpack
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from fastapi.utils import is_body_allowed_for_status_code
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+JSON_MEDIA_RANGES = ("application/json", "application/*", "*/*")
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+_use_msgpack: ContextVar[bool] = ContextVar("use_msgpack", default=False)
+
+
+def encode_default(obj):
+    """Fallback for values the encoders don't handle natively (msgpack has no dates or numpy types)."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "tolist"):  # numpy arrays and scalars
+        return obj.tolist()
+    return str(obj)
+
+
+def dumps_json(content) -> bytes:
+    return orjson.dumps(content, default=encode_default, option=ORJSON_OPTIONS)
+
+
+def dumps_ndjson_line(content) -> bytes:
+    """One line of an application/x-ndjson stream."""
+    return orjson.dumps(content, default=encode_default, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+
+def dumps_msgpack(content) -> bytes:
+    return msgpack.packb(content, default=encode_default, use_bin_type=True)
+
+
+def prefers_msgpack(accept: Optional[str]) -> bool:
+    """True when Accept ranks a msgpack type at least as high as JSON (a bare */* keeps JSON)."""
+    if not accept or "msgpack" not in accept:
+        return False
+    msgpack_q = json_q = 0.0
+    for media_range in accept.split(","):
+        media_type, _, params = media_range.partition(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in JSON_MEDIA_RANGES:
+            json_q = max(json_q, q)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+@contextmanager
+def negotiated_encoding(accept: Optional[str]):
+    """Selects the encoding of EngineResponses created inside the block from an Accept header."""
+    token = _use_msgpack.set(prefers_msgpack(accept))
+    try:
+        yield
+    finally:
+        _use_msgpack.reset(token)
+
+
+class EngineResponse(JSONResponse):
+    """JSONResponse rendered by orjson, or msgpack when negotiated for the current request."""
+
+    def __init__(self, content, status_code: int = 200, headers=None, media_type: Optional[str] = None, background=None):
+        if media_type is None and _use_msgpack.get():
+            media_type = MSGPACK_MEDIA_TYPE
+        super().__init__(content, status_code=status_code, headers=headers, media_type=media_type, background=background)
+        self.headers.add_vary_header("Accept")
+
+    def render(self, content) -> bytes:
+        if self.media_type in MSGPACK_MEDIA_TYPES:
+            return dumps_msgpack(content)
+        return dumps_json(content)
+
+
+class NegotiateEncodingMiddleware:
+    """
+    Pure ASGI middleware that applies negotiated_encoding to each HTTP request.
+    Unlike @app.middleware("http") it adds no task or stream hop per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"accept"), None)
+        with negotiated_encoding(accept):
+            await self.app(scope, receive, send)
+
+
+# --- Exception handlers (FastAPI's defaults always answer with stdlib JSON) ---
+async def http_exception_handler(request, exc: StarletteHTTPException):
+    headers = getattr(exc, "headers", None)
+    if not is_body_allowed_for_status_code(exc.status_code):
+        return Response(status_code=exc.status_code, headers=headers)
+    return EngineResponse({"detail": exc.detail}, status_code=exc.status_code, headers=headers)
+
+
+async def validation_exception_handler(request, exc: RequestValidationError):
+    return EngineResponse({"detail": jsonable_encoder(exc.errors())}, status_code=422)
@@ -0,0 +1,259 @@
+"""
+Lightweight request and ingestion tracing.
+
+Spans are opened with `span(name, **attributes)` and nest through a context
+variable, so spans started in awaited coroutines, tasks and background tasks
+share the trace of the request that started them. Finished spans are exported
+by a background thread to a local JSON-lines file (TRACE_JSONL_PATH) or, when
+TRACE_OTLP_ENDPOINT is set, to an OTLP/HTTP collector using the OTLP JSON
+encoding. The JSON-lines file is rotated at TRACE_JSONL_MAX_BYTES and new
+traces are sampled at TRACE_SAMPLE_RATE. The active trace ID is added to every
+log record and returned to clients in the X-Trace-Id response header.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TRACE_HEADER = "X-Trace-Id"
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL_SECONDS = 2.0
+TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """One timed operation; attributes carry sizes (chunks, points, characters...)."""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any], sampled: bool = True):
+        self.name = name
+        self.trace_id = trace_id
+        self.sampled = sampled  # Unsampled spans still nest and carry the trace ID, but are not exported
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current_span.get()
+    return active.trace_id if active else None
+
+
+@contextmanager
+def span(name: str, traceparent: Optional[str] = None, **attributes):
+    """
+    Opens a child of the active span (or a new trace). `traceparent` continues
+    a W3C trace context received from a caller. Exceptions are recorded and re-raised.
+    """
+    parent = _current_span.get()
+    match = TRACEPARENT_RE.match(traceparent or "") if parent is None else None
+    if parent is not None:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    elif match:
+        trace_id, parent_id, flags = match.groups()
+        sampled = bool(int(flags, 16) & 1)
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+        sampled = random.random() < settings.TRACE_SAMPLE_RATE
+
+    active = Span(name, trace_id, parent_id, attributes, sampled)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        active.end_ns = time.time_ns()
+        if active.sampled and settings.TRACING_ENABLED:
+            get_exporter().export(active)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator that runs a sync or async function inside a span named after it."""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- Export ---
+def _otlp_value(value) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """Encodes finished spans as an OTLP/HTTP JSON ExportTraceServiceRequest."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": __name__},
+            "spans": [{
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            } for s in spans],
+        }],
+    }]}
+
+
+class SpanExporter:
+    """Batches finished spans on a daemon thread so request handling never waits on export I/O."""
+
+    def __init__(self, jsonl_path: str, otlp_endpoint: Optional[str], service_name: str,
+                 max_bytes: int = 0, backups: int = 0):
+        self.jsonl_path = jsonl_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.otlp_endpoint = otlp_endpoint.rstrip("/") + "/v1/traces" if otlp_endpoint else None
+        self.service_name = service_name
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=EXPORT_BATCH_SIZE * 40)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, finished: Span):
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1  # Never block a request on a slow sink
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    logger.warning(f"Could not export {len(batch)} span(s): {e}")
+
+    def _write(self, batch: List[Span]):
+        if self.otlp_endpoint:
+            import httpx
+            httpx.post(self.otlp_endpoint, json=to_otlp(batch, self.service_name), timeout=5.0).raise_for_status()
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+            self._rotate()
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(s.as_dict(), default=str) + "\n" for s in batch)
+
+    def _rotate(self):
+        """spans.jsonl -> spans.jsonl.1 -> ... once the file reaches max_bytes; the oldest backup is dropped."""
+        if not self.max_bytes or not os.path.exists(self.jsonl_path) or os.path.getsize(self.jsonl_path) < self.max_bytes:
+            return
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.jsonl_path}.{index}"):
+                os.replace(f"{self.jsonl_path}.{index}", f"{self.jsonl_path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.jsonl_path, f"{self.jsonl_path}.1")
+        else:
+            os.remove(self.jsonl_path)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Flushes queued spans and stops the export thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+_exporter_instance: Optional[SpanExporter] = None
+_exporter_lock = threading.Lock()
+
+def get_exporter() -> SpanExporter:
+    """Returns the process-wide span exporter, configured from settings on first use."""
+    global _exporter_instance
+    if _exporter_instance is None:
+        with _exporter_lock:
+            if _exporter_instance is None:
+                _exporter_instance = SpanExporter(
+                    settings.TRACE_JSONL_PATH, settings.TRACE_OTLP_ENDPOINT, settings.TRACE_SERVICE_NAME,
+                    settings.TRACE_JSONL_MAX_BYTES, settings.TRACE_JSONL_BACKUPS
+                )
+                logger.info(f"Exporting trace spans to {_exporter_instance.otlp_endpoint or _exporter_instance.jsonl_path}.")
+    return _exporter_instance
+
+def shutdown_exporter():
+    global _exporter_instance
+    if _exporter_instance is not None:
+        _exporter_instance.shutdown()
+        _exporter_instance = None
+
+
+# --- Logging ---
+def install_log_trace_ids():
+    """Adds `trace_id` to every log record ("-" outside a trace) for use in log formats."""
+    previous_factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = previous_factory(*args, **kwargs)
+        record.trace_id = current_trace_id() or "-"
+        return record
+
+    logging.setLogRecordFactory(record_factory)
@@ -9,13 +9,13 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from sqlalchemy import text
-from src.database.relational.connection import user_engine
+from src.database.relational.connection import get_user_engine
 
 def test_database_connection():
     """Test database connection and table access"""
     try:
         # Create a connection
-        with user_engine.connect() as connection:
+        with get_user_engine().connect() as connection:
             print("✅ Database connection successful")
             
             # Test if we can query the users table
@@ -0,0 +1,16 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Required settings without defaults; tests never reach these services
+for name, value in {
+    "QDRANT_API_KEY": "test",
+    "QDRANT_URL": "http://localhost:6333",
+    "QDRANT_ENDPOINT": "http://localhost:6333",
+    "GOOGLE_CLIENT_ID": "test",
+    "GOOGLE_CLIENT_SECRET": "test",
+    "GOOGLE_REDIRECT_URI": "http://localhost:8000/api/auth/callback",
+    "USER_DATABASE_URL": "sqlite:///:memory:",
+}.items():
+    os.environ.setdefault(name, value)
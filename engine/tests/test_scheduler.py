@@ -0,0 +1,99 @@
+"""Admission order and batching of the LLM scheduler, on a small RPM/TPM deployment."""
+import asyncio
+import pytest
+from src.config.settings import settings
+from src.llm.scheduler import DeploymentLimiter, LLMScheduler, Priority
+
+# 600 RPM with a 0.1s burst: one request fits in the bucket, the next is admitted ~0.1s later
+RPM = 600
+BURST_SECONDS = 0.1
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_higher_priority_is_admitted_first():
+    async def scenario():
+        limiter = DeploymentLimiter("chat", rpm=RPM, tpm=0, burst_seconds=BURST_SECONDS)
+        await limiter.acquire(1, Priority.INTERACTIVE)  # Empties the bucket
+        admitted = []
+
+        async def call(name, priority):
+            await limiter.acquire(1, priority)
+            admitted.append(name)
+
+        ingestion = asyncio.create_task(call("ingestion", Priority.INGESTION))
+        summary = asyncio.create_task(call("summary", Priority.THREAD_SUMMARY))
+        await asyncio.sleep(0)  # Both are queued before the interactive call arrives
+        interactive = asyncio.create_task(call("interactive", Priority.INTERACTIVE))
+        await asyncio.gather(ingestion, summary, interactive)
+        return admitted
+
+    assert run(scenario()) == ["interactive", "summary", "ingestion"]
+
+
+def test_cancelled_waiter_is_dropped():
+    async def scenario():
+        limiter = DeploymentLimiter("chat", rpm=RPM, tpm=0, burst_seconds=BURST_SECONDS)
+        await limiter.acquire(1, Priority.INTERACTIVE)
+        abandoned = asyncio.create_task(limiter.acquire(1, Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        await limiter.acquire(1, Priority.INGESTION)  # Must not wait behind the cancelled head
+        return limiter
+
+    limiter = run(scenario())
+    stats = limiter.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["lanes"]["interactive"]["admitted"] == 1
+    assert stats["lanes"]["ingestion"]["admitted"] == 1
+    assert stats["lanes"]["ingestion"]["max_wait_seconds"] < 1.0
+
+
+def test_call_larger_than_burst_capacity_is_clamped():
+    async def scenario():
+        limiter = DeploymentLimiter("embeddings", rpm=0, tpm=6000, burst_seconds=BURST_SECONDS)  # 10-token bucket
+        await limiter.acquire(1000, Priority.INGESTION)
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.token_bucket.tokens <= 0
+    assert limiter.stats()["lanes"]["ingestion"]["admitted"] == 1
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 3)
+    monkeypatch.setattr(settings, "EMBEDDING_CONCURRENCY", 4)
+
+
+def test_batches_return_vectors_in_input_order(small_batches):
+    texts = [f"text {i}" for i in range(10)]
+    batches = []
+
+    async def embed(batch):
+        batches.append(list(batch))
+        await asyncio.sleep(0.05 / len(batches))  # Later batches finish first
+        return [[float(t.split()[1])] for t in batch]
+
+    async def scenario():
+        scheduler = LLMScheduler()
+        scheduler.register("embeddings", rpm=0, tpm=6_000_000)
+        return await scheduler.embed_in_batches("embeddings", texts, Priority.INGESTION, embed)
+
+    assert run(scenario()) == [[float(i)] for i in range(10)]
+    assert sorted(len(b) for b in batches) == [1, 3, 3, 3]
+
+
+def test_unlimited_deployment_is_embedded_in_one_call(small_batches):
+    texts = [f"text {i}" for i in range(10)]
+    calls = []
+
+    async def embed(batch):
+        calls.append(len(batch))
+        return [[0.0] for _ in batch]
+
+    vectors = run(LLMScheduler().embed_in_batches("embeddings", texts, Priority.INGESTION, embed))
+    assert len(vectors) == 10
+    assert calls == [10]
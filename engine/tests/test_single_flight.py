@@ -0,0 +1,95 @@
+"""SingleFlight coalesces identical concurrent queries into one computation."""
+import asyncio
+import pytest
+from src.utils.helpers import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=5))
+
+
+def test_concurrent_identical_keys_run_once():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("q", compute) for _ in range(5)))
+
+    assert run(scenario()) == ["answer"] * 5
+    assert calls == 1
+    assert flight.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test")
+
+    async def scenario():
+        return await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0.01, "a")),
+                                    flight.do("b", lambda: asyncio.sleep(0.01, "b")))
+
+    assert run(scenario()) == ["a", "b"]
+    assert flight.stats()["executed"] == 2
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend down")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("q", fail) for _ in range(3)), return_exceptions=True)
+
+    results = run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(r, RuntimeError) and str(r) == "backend down" for r in results)
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight("test")
+
+    async def scenario():
+        done = asyncio.Event()
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            done.set()
+            return "answer"
+
+        leader = asyncio.create_task(flight.do("q", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("q", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower, done.is_set()
+
+    assert run(scenario()) == ("answer", True)
+
+
+def test_key_is_forgotten_after_completion():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def scenario():
+        first = await flight.do("q", compute)
+        await asyncio.sleep(0)  # Let the done callback run
+        in_flight = flight.stats()["in_flight"]
+        second = await flight.do("q", compute)
+        return first, in_flight, second
+
+    assert run(scenario()) == (1, 0, 2)
+    assert flight.stats()["executed"] == 2
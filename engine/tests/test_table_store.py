@@ -0,0 +1,81 @@
+"""run_read_only_query is the boundary for LLM-written SQL: only reads may run."""
+import sqlite3
+import pytest
+from src.config.settings import settings
+from src.database.relational import table_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = tmp_path / "tables.db"
+    monkeypatch.setattr(settings, "TABLE_STORE_PATH", str(path))
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE sales (region TEXT, revenue REAL)")
+    conn.executemany("INSERT INTO sales VALUES (?, ?)", [(f"r{i % 4}", float(i)) for i in range(20)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def row_count(path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_select_returns_columns_and_rows(store):
+    result = table_store.run_read_only_query("SELECT region, SUM(revenue) FROM sales GROUP BY region ORDER BY region;")
+    assert result["columns"] == ["region", "SUM(revenue)"]
+    assert result["rows"][0] == ["r0", 40.0]
+    assert not result["truncated"]
+
+
+@pytest.mark.parametrize("sql", [
+    "INSERT INTO sales VALUES ('x', 1)",
+    "UPDATE sales SET revenue = 0",
+    "DELETE FROM sales",
+    "DROP TABLE sales",
+    "CREATE TABLE other (x)",
+    "WITH gone AS (SELECT 1) DELETE FROM sales",
+])
+def test_writes_are_rejected(store, sql):
+    with pytest.raises(ValueError):
+        table_store.run_read_only_query(sql)
+    assert row_count(store) == 20
+
+
+def test_attach_is_rejected(store, tmp_path):
+    with pytest.raises(ValueError):
+        table_store.run_read_only_query(f"ATTACH DATABASE '{tmp_path / 'other.db'}' AS other")
+    assert not (tmp_path / "other.db").exists()
+
+
+@pytest.mark.parametrize("sql", ["PRAGMA table_info(sales)", "PRAGMA journal_mode=DELETE", "PRAGMA writable_schema=ON"])
+def test_pragma_is_rejected(store, sql):
+    with pytest.raises(ValueError):
+        table_store.run_read_only_query(sql)
+
+
+def test_only_one_statement_runs(store):
+    with pytest.raises(ValueError):
+        table_store.run_read_only_query("SELECT 1; DROP TABLE sales")
+    assert row_count(store) == 20
+
+
+def test_row_cap(store):
+    result = table_store.run_read_only_query("SELECT * FROM sales", max_rows=5)
+    assert len(result["rows"]) == 5
+    assert result["truncated"]
+
+
+def test_deadline_interrupts_long_queries(store):
+    endless = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n"
+    with pytest.raises(ValueError, match="time limit"):
+        table_store.run_read_only_query(endless, timeout_seconds=0.2)
+
+
+def test_empty_query_is_rejected(store):
+    with pytest.raises(ValueError):
+        table_store.run_read_only_query(" ; ")